@@ -2,6 +2,7 @@ from flask import Flask
 from config import Config
 from models import db, login_manager
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import os
 
@@ -10,6 +11,15 @@ load_dotenv()
 # Import models to ensure they are registered with SQLAlchemy
 from models.user_model import User, Patient, Doctor
 from models.appointment_model import Clinic, Appointment, DoctorAvailability, Review
+from models.stats_model import StatsSnapshot
+# Registers the listeners that keep the doctor search index in sync
+import search_index
+import llm_client
+import response_cache
+import chat_backends
+import rate_limit
+import page_cache
+import observability
 
 def create_app(config_class=Config):
     """
@@ -19,20 +29,65 @@ def create_app(config_class=Config):
     """
     app = Flask(__name__)
     app.config.from_object(config_class)
+    hops = app.config['PROXY_FIX_HOPS']
+    if hops:
+        # Client address and scheme from the X-Forwarded-* headers our own proxies set
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
 
-    db.init_app(app)
     from database_singleton import db_singleton
+    # Pool sizing for the configured database; explicit SQLALCHEMY_ENGINE_OPTIONS win
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **db_singleton.engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    # Read replicas are extra binds; RoutingSession sends SELECTs to them
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+        **db_singleton.replica_binds(app.config),
+    }
+    db.init_app(app)
+    # Replicas get their schema from the primary, never from create_all()
+    db_singleton.detach_replica_metadata(db)
+    # Schema changes ship as Alembic revisions under migrations/ (flask db upgrade).
+    # Batch mode lets SQLite apply ALTERs by copying the table.
+    Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'), render_as_batch=True)
     db_singleton.initialize(db)
+    # WAL, busy timeout and cache pragmas on each new SQLite connection
+    with app.app_context():
+        db_singleton.configure_connections(db.engine, app.config)
+        for replica in db_singleton.replica_engines():
+            db_singleton.configure_connections(replica, app.config, read_only=True)
+    # Statement counts and timings per request: Server-Timing, request log, /admin/debug
+    observability.init_app(app)
     login_manager.init_app(app)
+    # Shared, pooled client for the chat assistant's LLM provider
+    llm_client.init_app(app)
+    response_cache.init_app(app)
+    chat_backends.init_app(app)
+    rate_limit.init_app(app)
+    page_cache.init_app(app)
     
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
 
-    with app.app_context():
-        # Drop all tables and recreate to ensure schema is up to date
-        db.drop_all()
-        db.create_all()
+    @app.template_global()
+    def page_url(**overrides):
+        """URL of the current page with some query args replaced (used by pagination links)."""
+        from flask import request, url_for
+        args = request.args.to_dict()
+        args.update(overrides)
+        args = {k: v for k, v in args.items() if v is not None}
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @app.route('/healthz')
+    def healthz():
+        """Readiness probe: the app is imported and serving. Never touches the database."""
+        return {'status': 'ok'}
+
+    # The schema is managed out of band (flask init-db / flask db upgrade),
+    # so creating an app or forking a worker only sets up the connection.
+    register_commands(app)
 
     from controllers.auth_routes import auth_bp
     from controllers.doctor_routes import doctor_bp
@@ -50,6 +105,48 @@ def create_app(config_class=Config):
 
     return app
 
+def register_commands(app):
+    """Attach the database management commands to the flask CLI."""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create or upgrade the schema to the latest migration (safe to re-run)."""
+        from flask_migrate import upgrade, stamp
+        from sqlalchemy import inspect
+        tables = inspect(db.engine).get_table_names()
+        if 'users' in tables and 'alembic_version' not in tables:
+            # Database built by the old create_all() boot path: adopt it at the baseline revision
+            stamp(revision='0001')
+        upgrade()
+        print("Database schema is up to date.")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Recreate the doctor full-text index from the doctors, users and clinics tables."""
+        with db.engine.begin() as connection:
+            search_index.create_index(connection)
+        print("Search index rebuilt.")
+
+    @app.cli.command('recompute-ratings')
+    def recompute_ratings_command():
+        """Check doctors' rating aggregates against the reviews table and repair any drift."""
+        from repositories import DoctorRepository
+        fixed = DoctorRepository.recompute_ratings()
+        db.session.commit()
+        print(f"Rating aggregates checked; {fixed} doctor(s) corrected.")
+
+    @app.cli.command('refresh-stats')
+    def refresh_stats_command():
+        """Recompute the admin dashboard statistics snapshot (run from cron every few minutes)."""
+        import stats_service
+        stats = stats_service.refresh()
+        print(f"Statistics refreshed at {stats['taken_at']:%Y-%m-%d %H:%M:%S}.")
+
+    @app.cli.command('seed')
+    def seed_command():
+        """Insert the demo admin, clinics, doctors and patient (skipped if users exist)."""
+        seed_database()
+
 def seed_database():
     from models.user_model import User, Doctor, Patient
     from models.appointment_model import Clinic
@@ -100,7 +197,6 @@ def seed_database():
         db.session.rollback()
 
 if __name__ == '__main__':
+    # Run `flask init-db` (and `flask seed` for demo data) once before starting the server
     app = create_app()
-    with app.app_context():
-        seed_database()
     app.run(debug=True)
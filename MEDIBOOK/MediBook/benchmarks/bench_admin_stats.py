@@ -0,0 +1,77 @@
+"""
+Benchmark: admin dashboard statistics, live counts vs. the snapshot.
+
+Generates a synthetic dataset (datagen.py) and times, as the tables grow
+(--appointments is multiplied by each --scales factor):
+
+    counts     the three COUNT(*) queries the dashboard used to run
+    totals     StatsRepository.totals(), every counter (including cancelled
+               appointments, unverified doctors and reviews) in one SELECT
+    refresh    stats_service.refresh(), all aggregates into a new snapshot
+    snapshot   stats_service.current() on a fresh snapshot, what a page load costs
+
+    python benchmarks/bench_admin_stats.py --appointments 50000 --scales 1 4 16
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from config import Config
+from repositories import AppointmentRepository, DoctorRepository, PatientRepository, StatsRepository
+import datagen
+import stats_service
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.remove()
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_arguments(parser)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger('database_singleton').setLevel(logging.ERROR)  # the refresh's aggregates are slow by design
+
+    workdir = tempfile.mkdtemp(prefix='medibook-bench-')
+    print(f"{'appointments':>12}  {'counts':>9}  {'totals':>9}  {'refresh':>9}  {'snapshot':>9}   ({workdir})")
+    for scale in args.scales:
+        path = os.path.join(workdir, f'stats-{scale}.db')
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            counts = datagen.generate(clinics=args.clinics, doctors=args.doctors * scale,
+                                      patients=args.patients * scale, slots_per_doctor=args.slots_per_doctor,
+                                      appointments=args.appointments * scale, reviews=args.reviews * scale,
+                                      seed=args.seed)
+            old = timed(lambda: (PatientRepository.count(), DoctorRepository.count(), AppointmentRepository.count()),
+                        args.repeat)
+            totals = timed(StatsRepository.totals, args.repeat)
+            refresh = timed(stats_service.refresh, args.repeat)
+            snapshot = timed(lambda: stats_service.current(max_age=3600), args.repeat)
+            print(f"{counts['appointments']:>12}  {old:7.2f}ms  {totals:7.2f}ms  {refresh:7.2f}ms  {snapshot:7.2f}ms")
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
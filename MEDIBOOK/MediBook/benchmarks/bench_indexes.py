@@ -0,0 +1,132 @@
+"""
+Benchmark: availability lookups before and after the hot-path indexes.
+
+Seeds a throwaway SQLite file with --rows DoctorAvailability rows spread
+over --doctors doctors, times the repository lookups on the bare table,
+then creates the composite indexes declared on the model and times them
+again.
+
+    python benchmarks/bench_indexes.py --rows 1000000 --doctors 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, text
+
+from app import create_app, db
+from config import Config
+from models.appointment_model import DoctorAvailability
+from repositories import AvailabilityRepository
+
+SLOTS_PER_DAY = 16  # 09:00 - 17:00 in 30 minute slots
+BATCH = 50_000
+
+
+def seed(rows, doctors):
+    """Bulk insert `rows` slots, round-robin over doctors and consecutive days."""
+    start_day = date.today() - timedelta(days=180)
+    rng = random.Random(42)
+    batch = []
+    for i in range(rows):
+        doctor_id = i % doctors + 1
+        n = i // doctors
+        day = start_day + timedelta(days=n // SLOTS_PER_DAY)
+        minutes = 9 * 60 + (n % SLOTS_PER_DAY) * 30
+        batch.append({
+            'doctor_id': doctor_id,
+            'date': day,
+            'start_time': dtime(minutes // 60, minutes % 60),
+            'end_time': dtime((minutes + 30) // 60, (minutes + 30) % 60),
+            'is_booked': rng.random() < 0.3,
+        })
+        if len(batch) == BATCH:
+            db.session.execute(insert(DoctorAvailability), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(DoctorAvailability), batch)
+    db.session.commit()
+
+
+def measure(doctors, samples):
+    """Time each lookup for `samples` random doctors; returns {name: [ms, ...]}."""
+    rng = random.Random(7)
+    today = date.today()
+    lookups = {
+        'available_slots(from today)': lambda d: AvailabilityRepository.get_available_slots(d, today),
+        'page_by_doctor(upcoming)': lambda d: AvailabilityRepository.page_by_doctor(d),
+        'get_existing(date, time)': lambda d: AvailabilityRepository.get_existing(d, today, dtime(9, 0)),
+    }
+    results = {}
+    for name, lookup in lookups.items():
+        timings = []
+        for _ in range(samples):
+            doctor_id = rng.randint(1, doctors)
+            started = time.perf_counter()
+            lookup(doctor_id)
+            timings.append((time.perf_counter() - started) * 1000)
+            db.session.expunge_all()
+        results[name] = timings
+    return results
+
+
+def report(label, results):
+    print(f"\n{label}")
+    for name, timings in results.items():
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"  {name:<30} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--doctors', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        table = DoctorAvailability.__table__
+        for index in table.indexes:
+            index.drop(db.engine)
+
+        started = time.perf_counter()
+        seed(args.rows, args.doctors)
+        print(f"Seeded {args.rows:,} availability rows for {args.doctors:,} doctors "
+              f"in {time.perf_counter() - started:.1f}s ({path})")
+
+        before = measure(args.doctors, args.samples)
+        report("Without indexes", before)
+
+        started = time.perf_counter()
+        for index in table.indexes:
+            index.create(db.engine)
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        print(f"\nCreated {len(table.indexes)} indexes in {time.perf_counter() - started:.1f}s")
+
+        after = measure(args.doctors, args.samples)
+        report("With indexes", after)
+
+        print("\nSpeed-up (median)")
+        for name in before:
+            ratio = statistics.median(before[name]) / statistics.median(after[name])
+            print(f"  {name:<30} {ratio:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
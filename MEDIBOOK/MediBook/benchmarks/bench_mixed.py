@@ -0,0 +1,166 @@
+"""
+Benchmark: mixed read/write throughput on one SQLite file under concurrency.
+
+Generates a synthetic dataset (datagen.py), then for each connection
+setup runs --processes worker processes (like gunicorn workers) against
+a fresh copy of it for --duration seconds. Each worker drives the app
+through its test client: a --write-ratio share of its requests book a
+free slot (POST /booking/book/<id>, its own slots, so no two workers race
+for one), the rest are searches and doctor profiles. The page cache is
+off, so every read renders from the database.
+
+    before  SQLite defaults: rollback journal, synchronous=FULL, no pragmas
+    tuned   the SQLITE_* settings in config.py (WAL, synchronous=NORMAL,
+            busy timeout, mmap and a larger page cache)
+
+    python benchmarks/bench_mixed.py --processes 8 --write-ratio 0.2 --duration 15
+"""
+import argparse
+import datetime as dt
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+SEARCHES = [
+    {'q': 'card'}, {'q': 'derma', 'sort': 'price'}, {'specialization': 'Neurologist', 'location': 'Cairo'},
+    {'sort': 'rating'}, {'location': 'Giza', 'sort': 'next_available'},
+]
+VARIANTS = {
+    'before': {'SQLITE_JOURNAL_MODE': '', 'SQLITE_SYNCHRONOUS': '', 'SQLITE_BUSY_TIMEOUT_MS': '',
+               'SQLITE_MMAP_SIZE': '', 'SQLITE_CACHE_SIZE_KB': ''},
+    'tuned': {},
+}
+
+
+def make_app(path, settings):
+    from app import create_app
+    from config import Config
+
+    class MixedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        PAGE_CACHE_ENABLED = False
+        RATELIMIT_ENABLED = False
+        REQUEST_LOG = False
+
+    for key, value in settings.items():
+        setattr(MixedConfig, key, value)
+    app = create_app(MixedConfig)
+    app.logger.disabled = True  # failed requests are counted, not printed
+    return app
+
+
+def worker(index, path, settings, duration, write_ratio, doctors, patient, slots, seed):
+    """One worker process: returns ({'read': [ms], 'write': [ms]}, errors, lost slots)."""
+    app = make_app(path, settings)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'], sess['role'], sess['name'] = patient, 'patient', 'Bench patient'
+    rng = random.Random(seed + index)
+    client.get('/', query_string=SEARCHES[0])  # warm up templates and the connection pool
+    latencies, errors, lost = {'read': [], 'write': []}, 0, 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        if slots and rng.random() < write_ratio:
+            kind = 'write'
+            availability_id, doctor_id = slots.pop()
+            response = client.post(f'/booking/book/{doctor_id}', data={'availability_id': availability_id})
+            lost += response.status_code == 302 and not response.headers['Location'].endswith('/booking/dashboard')
+        else:
+            kind = 'read'
+            if rng.random() < 0.5:
+                response = client.get('/', query_string=rng.choice(SEARCHES))
+            else:
+                response = client.get(f'/doctor/{rng.randint(1, doctors)}')
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+        errors += response.status_code >= 500
+    return latencies, errors, lost
+
+
+def free_slots(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            "SELECT availability_id, doctor_id FROM doctor_availability WHERE is_booked = 0 AND date > ?",
+            (dt.date.today().isoformat(),)).fetchall()
+
+
+def run(variant, source, workdir, args, patient_user_ids):
+    path = os.path.join(workdir, f'{variant}.db')
+    shutil.copy(source, path)
+    with sqlite3.connect(path) as connection:
+        # journal_mode is stored in the file; start every variant from the rollback journal
+        connection.execute('PRAGMA journal_mode=DELETE')
+    slots = free_slots(path)
+    random.Random(args.seed).shuffle(slots)
+    jobs = [(i, path, VARIANTS[variant], args.duration, args.write_ratio, args.doctors,
+             patient_user_ids[i % len(patient_user_ids)], slots[i::args.processes], args.seed)
+            for i in range(args.processes)]
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.starmap(worker, jobs)
+    reads = sorted(t for r, _, _ in results for t in r['read'])
+    writes = sorted(t for r, _, _ in results for t in r['write'])
+    return {
+        'ops': (len(reads) + len(writes)) / args.duration,
+        'reads': len(reads) / args.duration,
+        'writes': len(writes) / args.duration,
+        'read_p95': percentile(reads, 0.95),
+        'write_p50': percentile(writes, 0.5),
+        'write_p95': percentile(writes, 0.95),
+        'errors': sum(e for _, e, _ in results),
+        'lost': sum(lost for _, _, lost in results),
+    }
+
+
+def percentile(samples, q):
+    if not samples:
+        return float('nan')
+    if q == 0.5:
+        return statistics.median(samples)
+    return samples[max(int(len(samples) * q) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_arguments(parser)
+    parser.add_argument('--processes', type=int, default=4, help="concurrent worker processes")
+    parser.add_argument('--write-ratio', type=float, default=0.2, help="share of requests that book a slot")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per variant")
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    args = parser.parse_args()
+    logging.getLogger('database_singleton').setLevel(logging.ERROR)  # slow-statement warnings
+
+    from models import db
+
+    workdir = tempfile.mkdtemp(prefix='medibook-bench-')
+    source = os.path.join(workdir, 'source.db')
+    app = make_app(source, {})
+    with app.app_context():
+        db.create_all()
+        counts = datagen.generate_from_args(args)
+        db.engine.dispose()
+    patient_user_ids = [args.doctors + j for j in range(1, args.patients + 1)]
+    print(f"Data: {counts} ({workdir})")
+    print(f"{args.processes} processes, {args.write_ratio:.0%} writes, {args.duration:.0f}s per variant\n")
+
+    for variant in args.variants:
+        r = run(variant, source, workdir, args, patient_user_ids)
+        print(f"  {variant:<7} {r['ops']:7.1f} req/s ({r['reads']:6.1f} reads, {r['writes']:5.1f} writes)"
+              f"   read p95 {r['read_p95']:7.2f} ms   write p50 {r['write_p50']:7.2f} ms"
+              f"  p95 {r['write_p95']:7.2f} ms   {r['errors']} errors, {r['lost']} lost slots")
+
+
+if __name__ == '__main__':
+    main()
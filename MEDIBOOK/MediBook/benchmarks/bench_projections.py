@@ -0,0 +1,105 @@
+"""
+Benchmark: list views as ORM entities vs. named-tuple projections.
+
+Generates --rows doctors (datagen.py), all awaiting verification, and gives
+a single patient --rows upcoming appointments, with --text-bytes of bio and
+medical history per row. Each listing is then loaded with all --rows rows
+in one page, both ways:
+
+    entities     what the pages loaded before: the view's eager-load
+                 profile, every column, objects in the identity map
+    projection   the row type the page uses now: the displayed columns
+                 only, plain tuples, nothing kept by the session
+
+For each it reports the median latency over --repeat runs (fresh session
+each time) and, with tracemalloc, the memory the result plus the session
+hold afterwards and the peak while loading.
+
+    python benchmarks/bench_projections.py --rows 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import update
+
+from app import create_app, db
+from config import Config
+from models.user_model import User, Patient, Doctor
+from repositories import AppointmentRepository, DoctorRepository
+import datagen
+
+
+def measure(fetch, repeat):
+    """(median ms, retained bytes, peak bytes, rows) for one way of loading a listing."""
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()
+        started = time.perf_counter()
+        rows = fetch()
+        timings.append((time.perf_counter() - started) * 1000)
+        del rows
+    db.session.remove()
+    tracemalloc.start()
+    rows = fetch()
+    retained, peak = tracemalloc.get_traced_memory()  # the result and whatever the session keeps for it
+    tracemalloc.stop()
+    count = len(rows)
+    del rows
+    db.session.remove()
+    return statistics.median(timings), retained, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--text-bytes', type=int, default=600, help="bio / medical history length per row")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'projections.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        # One patient, so every upcoming appointment is theirs
+        counts = datagen.generate(doctors=args.rows, patients=1, slots_per_doctor=2, appointments=2 * args.rows,
+                                  reviews=100)
+        filler = 'x' * args.text_bytes
+        db.session.execute(update(Doctor).values(bio=filler))
+        db.session.execute(update(Patient).values(medical_history=filler))
+        db.session.execute(update(User).where(User.role == 'doctor').values(verified=False))
+        db.session.commit()
+        print(f"Data: {counts}, {args.text_bytes}-byte texts ({path})\n")
+
+        listings = [
+            ('search results', lambda: DoctorRepository.search(limit=args.rows, sort='price'),
+             lambda: DoctorRepository.search_cards(limit=args.rows, sort='price')),
+            ('patient dashboard', lambda: AppointmentRepository.page_by_patient(
+                1, per_page=args.rows, profile='patient_dashboard').items,
+             lambda: AppointmentRepository.page_rows_by_patient(1, per_page=args.rows).items),
+            ('unverified doctors', DoctorRepository.get_unverified, DoctorRepository.get_unverified_rows),
+        ]
+        for name, entities, projection in listings:
+            print(name)
+            results = [('entities', measure(entities, args.repeat)), ('projection', measure(projection, args.repeat))]
+            for label, (ms, retained, peak, count) in results:
+                print(f"  {label:<11} {count:6d} rows  {ms:8.1f} ms   holds {retained / 2**20:6.1f} MiB"
+                      f"   peak {peak / 2**20:6.1f} MiB")
+            (before, held_before, _, _), (after, held_after, _, _) = (r for _, r in results)
+            print(f"  -> {before / after:.1f}x faster, {held_before / max(held_after, 1):.1f}x less memory held\n")
+
+
+if __name__ == '__main__':
+    main()
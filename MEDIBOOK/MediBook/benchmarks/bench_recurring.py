@@ -0,0 +1,111 @@
+"""
+Benchmark: publishing availability one slot at a time vs. a recurring schedule.
+
+Generates --slots slots (30 minute slots, 09:00-17:00 on weekdays) for
+one doctor on a throwaway SQLite file, first the way the single-slot
+form does it (existence check, insert and commit per slot), then through
+the recurring schedule path (one range query for conflicts, one
+executemany, one commit) for a second doctor.
+
+    python benchmarks/bench_recurring.py --slots 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from config import Config
+from models.user_model import User, Doctor
+from models.appointment_model import Clinic, DoctorAvailability
+from repositories import AvailabilityRepository, UserRepository
+import scheduling
+
+SLOTS_PER_DAY = 16
+
+
+def seed_doctors(count):
+    clinic = Clinic(name='Bench Clinic', address='1 Main St', city='Cairo', country='Egypt')
+    db.session.add(clinic)
+    db.session.flush()
+    ids = []
+    for i in range(count):
+        user = User(name=f'Dr. Bench {i}', email=f'bench{i}@bench.test', password_hash='x', role='doctor')
+        db.session.add(user)
+        db.session.flush()
+        doctor = Doctor(user_id=user.user_id, clinic_id=clinic.clinic_id, specialization='Cardiologist', price=100)
+        db.session.add(doctor)
+        db.session.flush()
+        ids.append(doctor.doctor_id)
+    db.session.commit()
+    return ids
+
+
+def schedule(slots):
+    """A weekday 09:00-17:00 schedule long enough to produce `slots` slots."""
+    weeks = -(-slots // (SLOTS_PER_DAY * 5))
+    start = date.today() + timedelta(days=1)
+    generated = scheduling.expand(start, start + timedelta(weeks=weeks), range(5), dtime(9), dtime(17), 30)
+    return start, start + timedelta(weeks=weeks), generated[:slots]
+
+
+def per_slot(doctor_id, slots):
+    """What add_availability does for each POST."""
+    for day, start, end in slots:
+        if AvailabilityRepository.get_existing(doctor_id, day, start, end):
+            continue
+        AvailabilityRepository.create(doctor_id, day, start, end)
+        UserRepository.commit()
+
+
+def recurring(doctor_id, first, last, slots):
+    """What add_recurring_availability does for the whole schedule."""
+    existing = AvailabilityRepository.get_in_range(doctor_id, first, last)
+    free, _ = scheduling.without_conflicts(slots, existing)
+    AvailabilityRepository.bulk_create(doctor_id, free)
+    UserRepository.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slots', type=int, default=10_000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'recurring.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        single, bulk, rerun = seed_doctors(3)
+        first, last, slots = schedule(args.slots)
+        print(f"{len(slots):,} slots from {first} to {last} ({path})")
+
+        started = time.perf_counter()
+        per_slot(single, slots)
+        legacy = time.perf_counter() - started
+        print(f"  one slot per request      {legacy * 1000:10.1f} ms")
+
+        started = time.perf_counter()
+        recurring(bulk, first, last, slots)
+        batched = time.perf_counter() - started
+        print(f"  recurring schedule        {batched * 1000:10.1f} ms   ({legacy / batched:.0f}x faster)")
+
+        # Publishing the same schedule twice only costs the conflict check
+        recurring(rerun, first, last, slots)
+        started = time.perf_counter()
+        recurring(rerun, first, last, slots)
+        print(f"  re-publish (all conflict) {(time.perf_counter() - started) * 1000:10.1f} ms")
+
+        counts = [DoctorAvailability.query.filter_by(doctor_id=d).count() for d in (single, bulk, rerun)]
+        assert counts == [len(slots)] * 3, counts
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: doctor search with the FTS5 index vs. the LIKE fallback.
+
+Seeds --doctors doctors (each with a user and one of --clinics clinics)
+into a throwaway SQLite file, builds the search index and times one page
+(20 rows, fully hydrated) of typical searches on both code paths.
+
+    python benchmarks/bench_search.py --doctors 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from config import Config
+from models.user_model import User, Doctor
+from models.appointment_model import Clinic
+from repositories import DoctorRepository
+import search_index
+
+FIRST = ['Ahmed', 'Mona', 'Omar', 'Sara', 'Youssef', 'Nour', 'Karim', 'Laila', 'Hassan', 'Mariam',
+         'Tarek', 'Dina', 'Mostafa', 'Heba', 'Khaled', 'Rania', 'Amr', 'Salma', 'Ibrahim', 'Yasmin']
+LAST = ['Hassan', 'Ali', 'Mahmoud', 'Fathy', 'Saleh', 'Nabil', 'Farouk', 'Adel', 'Samir', 'Kamal',
+        'Gaber', 'Hamdy', 'Ragab', 'Shawky', 'Zaki', 'Naguib', 'Osman', 'Lotfy', 'Sabry', 'Wahba']
+SPECIALIZATIONS = ['Cardiologist', 'Dermatologist', 'Neurologist', 'Pediatrician', 'Orthopedist',
+                   'Ophthalmologist', 'Dentist', 'Psychiatrist', 'Gynecologist', 'Urologist',
+                   'Endocrinologist', 'Gastroenterologist', 'Nephrologist', 'Oncologist', 'Rheumatologist']
+CITIES = ['Cairo', 'Giza', 'Alexandria', 'Mansoura', 'Tanta', 'Aswan', 'Luxor', 'Suez', 'Ismailia', 'Zagazig']
+BIO = ['Experienced in {s} care.', 'Focus on preventive {s} medicine.', 'Board certified, {n} years of practice.',
+       'Special interest in minimally invasive procedures.', 'Treats adults and children.']
+
+SEARCHES = [
+    ('prefix q="card"', dict(q='card')),
+    ('typo q="cardiolgist"', dict(q='cardiolgist')),
+    ('name="Mona Samir"', dict(name='Mona Samir')),
+    ('specialization + city', dict(specialization='Dermatologist', city='Alexandria')),
+    ('multi-field q="neuro giza"', dict(q='neuro giza')),
+    ('all by price, page 50', dict(sort='price', offset=980)),
+    ('q="card" by rating', dict(q='card', sort='rating')),
+    ('city + price range', dict(city='Cairo', min_price=200, max_price=400, sort='price')),
+]
+
+
+def seed(doctors, clinics):
+    rng = random.Random(42)
+    db.session.execute(insert(Clinic), [
+        {'name': f"{rng.choice(LAST)} Medical Center {i}", 'address': f"{i} Main St",
+         'city': CITIES[i % len(CITIES)], 'country': 'Egypt', 'phone': None}
+        for i in range(1, clinics + 1)
+    ])
+    db.session.execute(insert(User), [
+        {'name': f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}", 'email': f"doctor{i}@bench.test",
+         'password_hash': 'x', 'role': 'doctor', 'verified': True, 'profile_picture': 'default.png'}
+        for i in range(1, doctors + 1)
+    ])
+    rows = []
+    for i in range(1, doctors + 1):
+        specialization = rng.choice(SPECIALIZATIONS)
+        bio = ' '.join(b.format(s=specialization.lower(), n=rng.randint(2, 30)) for b in rng.sample(BIO, 2))
+        rows.append({'user_id': i, 'clinic_id': rng.randint(1, clinics), 'specialization': specialization,
+                     'bio': bio, 'price': rng.randint(100, 1000)})
+    db.session.execute(insert(Doctor), rows)
+    db.session.commit()
+
+
+def measure(samples):
+    results = {}
+    for label, kwargs in SEARCHES:
+        timings, hits = [], 0
+        for _ in range(samples):
+            started = time.perf_counter()
+            hits = len(DoctorRepository.search(limit=20, **kwargs))
+            timings.append((time.perf_counter() - started) * 1000)
+            db.session.expunge_all()
+        results[label] = (timings, hits)
+    return results
+
+
+def report(label, results):
+    print(f"\n{label}")
+    for name, (timings, hits) in results.items():
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"  {name:<28} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms   ({hits} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=100_000)
+    parser.add_argument('--clinics', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=30)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'search.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(args.doctors, args.clinics)
+        with db.engine.begin() as connection:
+            search_index.rebuild(connection)
+        print(f"Seeded and indexed {args.doctors:,} doctors in {time.perf_counter() - started:.1f}s ({path})")
+
+        fts = measure(args.samples)
+        report("FTS5 index", fts)
+
+        search_index._available[db.engine] = False
+        like = measure(max(3, args.samples // 5))
+        search_index._available[db.engine] = True
+        report("LIKE fallback", like)
+
+
+if __name__ == '__main__':
+    main()
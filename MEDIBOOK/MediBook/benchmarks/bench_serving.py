@@ -0,0 +1,138 @@
+"""
+Benchmark: requests per second on the search route, dev server vs. gunicorn.
+
+Generates a synthetic dataset (datagen.py) into a throwaway SQLite file,
+then for each server starts it as a subprocess on that file, waits for
+/healthz and drives GET / with a rotating set of searches from --clients
+client processes for --duration seconds:
+
+    flask     python -m flask run (werkzeug's threaded development server)
+    gunicorn  gunicorn -c gunicorn.conf.py wsgi:app (--workers, --threads)
+
+The page cache is off unless --page-cache is given, so every request
+renders the page.
+
+    python benchmarks/bench_serving.py --workers 4 --threads 4 --clients 8 --duration 15
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+import datagen
+
+SEARCHES = [
+    {'q': 'card'}, {'q': 'derma', 'sort': 'price'}, {'specialization': 'Neurologist', 'location': 'Cairo'},
+    {'q': 'mona'}, {'sort': 'rating'}, {'q': 'dent', 'page': 2}, {'location': 'Giza', 'sort': 'next_available'},
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(kind, port, db_path, args):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', FLASK_APP='app.py', REQUEST_LOG='0',
+               RATELIMIT_ENABLED='0', PAGE_CACHE_ENABLED='1' if args.page_cache else '0')
+    if kind == 'flask':
+        command = [sys.executable, '-m', 'flask', 'run', '--port', str(port)]
+    else:
+        env.update(GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(args.workers),
+                   GUNICORN_THREADS=str(args.threads), GUNICORN_LOGLEVEL='warning')
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/healthz', timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{kind} did not become ready on port {port}")
+
+
+def client(base, duration, offset):
+    """One client process: request searches back to back; returns (latencies in ms, errors)."""
+    http = requests.Session()
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    n = offset
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        response = http.get(f'{base}/', params=SEARCHES[n % len(SEARCHES)])
+        latencies.append((time.perf_counter() - started) * 1000)
+        errors += response.status_code != 200
+        n += 1
+    return latencies, errors
+
+
+def measure(base, clients, duration):
+    client(base, 1, 0)  # warm up imports, caches and connections
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(client, [(base, duration, i) for i in range(clients)])
+    latencies = sorted(t for samples, _ in results for t in samples)
+    errors = sum(e for _, e in results)
+    return {
+        'rps': len(latencies) / duration,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'requests': len(latencies),
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_arguments(parser)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count() * 2 + 1)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=8, help="concurrent client processes")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per server")
+    parser.add_argument('--page-cache', action='store_true')
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from config import Config
+
+    path = os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'serving.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        counts = datagen.generate_from_args(args)
+        db.engine.dispose()
+    print(f"Data: {counts} ({path})")
+    print(f"{args.clients} clients, {args.duration:.0f}s per server, page cache {'on' if args.page_cache else 'off'}\n")
+
+    for kind, label in [('flask', 'flask run (dev server)'),
+                        ('gunicorn', f'gunicorn {args.workers} workers x {args.threads} threads')]:
+        port = free_port()
+        process = start(kind, port, path, args)
+        try:
+            r = measure(f'http://127.0.0.1:{port}', args.clients, args.duration)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        print(f"  {label:<38} {r['rps']:8.1f} req/s   p50 {r['p50']:7.2f} ms   p95 {r['p95']:7.2f} ms"
+              f"   ({r['requests']} requests, {r['errors']} errors)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: create_app() start-up cost.
+
+Times the app factory against an already-migrated SQLite file, both
+in-process (imports warm, the cost a forked worker pays) and as a cold
+`python -c` subprocess. For comparison it also times the old boot path
+that dropped and recreated every table inside create_app().
+
+    python benchmarks/bench_startup.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from config import Config
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'startup.db')
+    url = f'sqlite:///{path}'
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+
+    app = create_app(BenchConfig)
+    app.test_cli_runner().invoke(args=['init-db'])
+
+    def factory():
+        instance = create_app(BenchConfig)
+        with instance.app_context():
+            db.session.execute(db.text('SELECT 1'))
+
+    def legacy_factory():
+        instance = create_app(BenchConfig)
+        with instance.app_context():
+            db.drop_all()
+            db.create_all()
+
+    cold_cmd = [sys.executable, '-c',
+                'from app import create_app, db\n'
+                'app = create_app()\n'
+                'with app.app_context(): db.session.execute(db.text("SELECT 1"))']
+    env = dict(os.environ, DATABASE_URL=url)
+
+    def cold():
+        subprocess.run(cold_cmd, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    rows = [
+        ('create_app() + first query (warm)', timed(factory, args.runs)),
+        ('old boot: create_app() + drop/create', timed(legacy_factory, args.runs)),
+        ('cold process start', timed(cold, max(3, args.runs // 4))),
+    ]
+    for name, timings in rows:
+        print(f"{name:<40} median {statistics.median(timings):8.2f} ms   max {max(timings):8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
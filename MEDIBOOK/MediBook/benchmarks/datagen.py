@@ -0,0 +1,196 @@
+"""
+Synthetic data generator for benchmarks.
+
+Fills an empty, migrated database with clinics, verified doctors,
+patients, free future slots, booked appointments (upcoming and past) and
+reviews on past appointments, then derives rating aggregates and builds
+the search index. Output is deterministic for a given --seed.
+
+Every account's password is PASSWORD, hashed with a cheap PBKDF2 cost so
+that logging in virtual users does not dominate a load test.
+
+    python benchmarks/datagen.py --db /tmp/medibook.db --doctors 2000 --patients 5000
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from models import db
+from models.user_model import User, Patient, Doctor
+from models.appointment_model import Clinic, Appointment, DoctorAvailability, Review
+from repositories import DoctorRepository
+import search_index
+
+PASSWORD = 'Bench!pass1'
+
+FIRST = ['Ahmed', 'Mona', 'Omar', 'Sara', 'Youssef', 'Nour', 'Karim', 'Laila', 'Hassan', 'Mariam',
+         'Tarek', 'Dina', 'Mostafa', 'Heba', 'Khaled', 'Rania', 'Amr', 'Salma', 'Ibrahim', 'Yasmin']
+LAST = ['Hassan', 'Ali', 'Mahmoud', 'Fathy', 'Saleh', 'Nabil', 'Farouk', 'Adel', 'Samir', 'Kamal',
+        'Gaber', 'Hamdy', 'Ragab', 'Shawky', 'Zaki', 'Naguib', 'Osman', 'Lotfy', 'Sabry', 'Wahba']
+SPECIALIZATIONS = ['Cardiologist', 'Dermatologist', 'Neurologist', 'Pediatrician', 'Orthopedist',
+                   'Ophthalmologist', 'Dentist', 'Psychiatrist', 'Gynecologist', 'Urologist',
+                   'Endocrinologist', 'Gastroenterologist', 'Pulmonologist', 'ENT Specialist', 'General Practitioner']
+CITIES = ['Cairo', 'Giza', 'Alexandria', 'Mansoura', 'Tanta', 'Aswan', 'Luxor', 'Suez', 'Ismailia', 'Zagazig']
+FEEDBACK = ['Very helpful.', 'Listened carefully and explained everything.', 'Long wait but good care.',
+            'Friendly staff.', 'Would recommend.', None]
+
+SLOTS_PER_DAY = 8
+CHUNK = 10_000
+
+
+def doctor_email(i):
+    return f"doctor{i}@bench.test"
+
+
+def patient_email(i):
+    return f"patient{i}@bench.test"
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model), rows[start:start + CHUNK])
+
+
+def _slot(day, k):
+    start = dt.datetime.combine(day, dt.time(9, 0)) + dt.timedelta(minutes=30 * (k % SLOTS_PER_DAY))
+    return start.time(), (start + dt.timedelta(minutes=30)).time()
+
+
+def generate(clinics=50, doctors=500, patients=1000, slots_per_doctor=40, appointments=5000, reviews=2000,
+             seed=42, today=None):
+    """
+    Populate the current app's (empty) database. Half of `appointments` are
+    upcoming bookings of free slots, the rest took place in the past;
+    `reviews` of the past ones are reviewed. Returns the row counts.
+    """
+    if User.query.first() is not None:
+        raise RuntimeError("datagen expects an empty database")
+    rng = random.Random(seed)
+    today = today or dt.date.today()
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+
+    _insert(Clinic, [
+        {'clinic_id': i, 'name': f"{rng.choice(LAST)} Medical Center {i}", 'address': f"{i} Main St",
+         'city': CITIES[i % len(CITIES)], 'country': 'Egypt', 'phone': None}
+        for i in range(1, clinics + 1)
+    ])
+    _insert(User, [
+        {'user_id': i, 'name': f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}", 'email': doctor_email(i),
+         'password_hash': password_hash, 'role': 'doctor', 'verified': True, 'profile_picture': 'default.png'}
+        for i in range(1, doctors + 1)
+    ] + [
+        {'user_id': doctors + j, 'name': f"{rng.choice(FIRST)} {rng.choice(LAST)}", 'email': patient_email(j),
+         'password_hash': password_hash, 'role': 'patient', 'verified': True, 'profile_picture': 'default.png'}
+        for j in range(1, patients + 1)
+    ])
+    doctor_rows = []
+    for i in range(1, doctors + 1):
+        specialization = rng.choice(SPECIALIZATIONS)
+        doctor_rows.append({'doctor_id': i, 'user_id': i, 'clinic_id': rng.randint(1, clinics),
+                            'specialization': specialization, 'price': rng.randint(10, 100) * 10,
+                            'bio': f"Experienced in {specialization.lower()} care, {rng.randint(2, 30)} years of practice."})
+    _insert(Doctor, doctor_rows)
+    _insert(Patient, [
+        {'patient_id': j, 'user_id': doctors + j, 'dob': dt.date(1960 + j % 45, 1 + j % 12, 1 + j % 28),
+         'phone': None, 'medical_history': ''}
+        for j in range(1, patients + 1)
+    ])
+
+    # Free slots from tomorrow; a random half of the upcoming appointments book some of them
+    slots = []
+    for i in range(1, doctors + 1):
+        for k in range(slots_per_doctor):
+            day = today + dt.timedelta(days=1 + k // SLOTS_PER_DAY)
+            start, end = _slot(day, k)
+            slots.append({'availability_id': len(slots) + 1, 'doctor_id': i, 'date': day,
+                          'start_time': start, 'end_time': end, 'is_booked': False})
+    upcoming = min(appointments // 2, len(slots))
+    appointment_rows = []
+    for n, slot in enumerate(rng.sample(slots, upcoming)):
+        slot['is_booked'] = True
+        appointment_rows.append({'patient_id': 1 + n % patients, 'doctor_id': slot['doctor_id'],
+                                 'datetime': dt.datetime.combine(slot['date'], slot['start_time']),
+                                 'status': 'confirmed', 'payment_method': 'at_clinic',
+                                 'availability_id': slot['availability_id']})
+
+    # Past appointments, each on its own booked slot
+    for n in range(appointments - upcoming):
+        doctor_id = rng.randint(1, doctors)
+        day = today - dt.timedelta(days=1 + rng.randint(0, 180))
+        start, end = _slot(day, rng.randrange(SLOTS_PER_DAY))
+        slots.append({'availability_id': len(slots) + 1, 'doctor_id': doctor_id, 'date': day,
+                      'start_time': start, 'end_time': end, 'is_booked': True})
+        appointment_rows.append({'patient_id': 1 + (upcoming + n) % patients, 'doctor_id': doctor_id,
+                                 'datetime': dt.datetime.combine(day, start), 'status': 'confirmed',
+                                 'payment_method': 'at_clinic', 'availability_id': len(slots)})
+    _insert(DoctorAvailability, slots)
+    for n, row in enumerate(appointment_rows, start=1):
+        row['appointment_id'] = n
+        row['created_at'] = row['datetime'] - dt.timedelta(days=rng.randint(1, 30))
+    _insert(Appointment, appointment_rows)
+
+    # A random subset of past appointments is reviewed, so every patient keeps some to review
+    past = rng.sample(appointment_rows[upcoming:], min(reviews, len(appointment_rows) - upcoming))
+    _insert(Review, [
+        {'patient_id': a['patient_id'], 'doctor_id': a['doctor_id'], 'appointment_id': a['appointment_id'],
+         'rating': rng.choice([3, 4, 4, 5, 5]), 'feedback': rng.choice(FEEDBACK),
+         'created_at': a['datetime'] + dt.timedelta(hours=rng.randint(2, 72))}
+        for a in past
+    ])
+    DoctorRepository.recompute_ratings()
+    db.session.commit()
+    with db.engine.begin() as connection:
+        search_index.rebuild(connection)
+    return {'clinics': clinics, 'doctors': doctors, 'patients': patients, 'slots': len(slots),
+            'appointments': len(appointment_rows), 'reviews': len(past)}
+
+
+def add_arguments(parser):
+    """The data-size options shared by the benchmarks built on this generator."""
+    parser.add_argument('--clinics', type=int, default=50)
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--patients', type=int, default=1000)
+    parser.add_argument('--slots-per-doctor', type=int, default=40)
+    parser.add_argument('--appointments', type=int, default=5000)
+    parser.add_argument('--reviews', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def generate_from_args(args):
+    return generate(clinics=args.clinics, doctors=args.doctors, patients=args.patients,
+                    slots_per_doctor=args.slots_per_doctor, appointments=args.appointments,
+                    reviews=args.reviews, seed=args.seed)
+
+
+def main():
+    from app import create_app
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help="SQLite file to create (must not exist yet)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+
+    class DataConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.abspath(args.db)}'
+
+    app = create_app(DataConfig)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        counts = generate_from_args(args)
+    print(f"Generated {counts} in {time.perf_counter() - started:.1f}s ({args.db})")
+
+
+if __name__ == '__main__':
+    main()
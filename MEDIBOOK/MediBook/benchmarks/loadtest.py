@@ -0,0 +1,407 @@
+"""
+Load test: the patient booking flow over HTTP.
+
+Generates a synthetic dataset (see datagen.py) in a throwaway SQLite
+file, serves the app from an in-process threaded WSGI server and runs
+each scenario with --concurrency virtual users, every one its own
+HTTP session (patients are signed in before timing starts):
+
+    search     GET /            random text, city, sort and page
+    profile    GET /doctor/<id>
+    dashboard  GET /booking/dashboard          (signed-in patient)
+    book       POST /booking/book/<doctor_id>  a distinct free slot per request
+    cancel     POST /booking/cancel/<id>       the patient's upcoming appointments
+    review     POST /booking/submit_review/<id> the patient's unreviewed past visits
+
+Per scenario it reports p50/p95/p99 latency, throughput, errors and SQL
+statements per request, and writes everything as JSON (--output) with
+the git commit, so two runs can be compared with --compare:
+
+    python benchmarks/loadtest.py --concurrency 8 --requests 400 --output before.json
+    python benchmarks/loadtest.py --concurrency 8 --requests 400 --compare before.json
+
+To load an already running server instead, point it at a database made by
+datagen.py and pass the same file and the server's URL:
+
+    python benchmarks/loadtest.py --db /tmp/medibook.db --base-url http://127.0.0.1:8000
+"""
+import argparse
+import datetime as dt
+import json
+import logging
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from sqlalchemy import select
+from werkzeug.serving import make_server
+
+from app import create_app, db
+from config import Config
+from models.appointment_model import Appointment, DoctorAvailability, Review
+import datagen
+
+# The in-process server's per-request access log would drown the report
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+SCENARIOS = ('search', 'profile', 'dashboard', 'book', 'cancel', 'review')
+SEARCH_TERMS = ['card', 'derma', 'neuro', 'pedia', 'dent', 'ortho', 'ahmed', 'mona', 'cairo giza', 'skin']
+SORTS = ['relevance', 'price', 'price_desc', 'rating', 'next_available']
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def query_count(response):
+    """Statements the request ran, from the app's Server-Timing header (None if absent)."""
+    match = QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class Server:
+    """The app on a threaded werkzeug server bound to a free local port."""
+
+    def __init__(self, app):
+        self._server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._thread.join()
+
+
+class Workload:
+    """Per-patient queues of the rows the write scenarios consume, read once before the run."""
+
+    def __init__(self, app, patients, seed):
+        rng = random.Random(seed)
+        self.patient_ids = list(range(1, patients + 1))
+        today = dt.date.today()
+        with app.app_context():
+            session = db.session
+            self.doctors = session.execute(select(DoctorAvailability.doctor_id).distinct()).scalars().all()
+            free = session.execute(select(DoctorAvailability.availability_id, DoctorAvailability.doctor_id).where(
+                DoctorAvailability.is_booked == False, DoctorAvailability.date > today)).all()
+            rng.shuffle(free)
+            self.free_slots = [tuple(row) for row in free]
+            self.upcoming = defaultdict(list)
+            self.reviewable = defaultdict(list)
+            reviewed = set(session.execute(select(Review.appointment_id)).scalars())
+            rows = session.execute(select(Appointment.appointment_id, Appointment.patient_id, Appointment.datetime).where(
+                Appointment.status == 'confirmed'))
+            for appointment_id, patient_id, when in rows:
+                if when.date() > today:
+                    self.upcoming[patient_id].append(appointment_id)
+                elif appointment_id not in reviewed:
+                    self.reviewable[patient_id].append(appointment_id)
+        self._lock = threading.Lock()
+
+    def take_slot(self):
+        with self._lock:
+            return self.free_slots.pop() if self.free_slots else None
+
+    def take(self, pool, patient_id):
+        with self._lock:
+            items = pool[patient_id]
+            return items.pop() if items else None
+
+
+# Returned by an action instead of (response, error) when it has nothing left to do
+EXHAUSTED = 'exhausted'        # the scenario's rows are used up: the virtual user stops
+NEXT_PATIENT = 'next_patient'  # this patient's rows are used up: switch to the user's next patient
+
+
+def _expect(response, status):
+    """(response, None) on the expected status, else (response, error label)."""
+    return response, None if response.status_code == status else str(response.status_code)
+
+
+def _search(http, base, rng, work, patient_id):
+    params = {'q': rng.choice(SEARCH_TERMS), 'sort': rng.choice(SORTS)}
+    if rng.random() < 0.3:
+        params['location'] = rng.choice(datagen.CITIES)
+    if rng.random() < 0.2:
+        params['page'] = rng.randint(2, 4)
+    return _expect(http.get(f'{base}/', params=params), 200)
+
+
+def _profile(http, base, rng, work, patient_id):
+    return _expect(http.get(f'{base}/doctor/{rng.choice(work.doctors)}'), 200)
+
+
+def _dashboard(http, base, rng, work, patient_id):
+    return _expect(http.get(f'{base}/booking/dashboard'), 200)
+
+
+def _book(http, base, rng, work, patient_id):
+    slot = work.take_slot()
+    if slot is None:
+        return EXHAUSTED
+    availability_id, doctor_id = slot
+    response = http.post(f'{base}/booking/book/{doctor_id}', data={'availability_id': availability_id},
+                         allow_redirects=False)
+    # Success redirects to the dashboard, a lost slot back to the profile
+    if response.status_code == 302 and not response.headers['Location'].endswith('/booking/dashboard'):
+        return response, 'lost_slot'
+    return _expect(response, 302)
+
+
+def _cancel(http, base, rng, work, patient_id):
+    appointment_id = work.take(work.upcoming, patient_id)
+    if appointment_id is None:
+        return NEXT_PATIENT
+    return _expect(http.post(f'{base}/booking/cancel/{appointment_id}', allow_redirects=False), 302)
+
+
+def _review(http, base, rng, work, patient_id):
+    appointment_id = work.take(work.reviewable, patient_id)
+    if appointment_id is None:
+        return NEXT_PATIENT
+    return _expect(http.post(f'{base}/booking/submit_review/{appointment_id}', allow_redirects=False,
+                             data={'rating': rng.randint(1, 5), 'feedback': 'Load test review.'}), 302)
+
+
+ACTIONS = {'search': _search, 'profile': _profile, 'dashboard': _dashboard,
+           'book': _book, 'cancel': _cancel, 'review': _review}
+ANONYMOUS = {'search', 'profile'}
+# Scenarios that use up a patient's own rows, so each virtual user works through several patients
+POOLS = {'cancel': 'upcoming', 'review': 'reviewable'}
+
+
+def login(http, base, patient_id):
+    response = http.post(f'{base}/auth/login', data={'email': datagen.patient_email(patient_id),
+                                                      'password': datagen.PASSWORD}, allow_redirects=False)
+    if response.status_code != 302 or 'session' not in http.cookies:
+        raise RuntimeError(f"Could not sign in patient {patient_id}: HTTP {response.status_code}")
+
+
+def sessions_for(name, user, base, work, concurrency, share):
+    """
+    The (HTTP session, patient_id) pairs one virtual user works through,
+    signed in before timing starts. Users split the patients between them.
+    """
+    patients = work.patient_ids[user::concurrency]
+    if name in ANONYMOUS:
+        return [(requests.Session(), None)]
+    if name not in POOLS:
+        patients = patients[:1]
+    pool = getattr(work, POOLS[name]) if name in POOLS else None
+    sessions, rows = [], 0
+    for patient_id in patients:
+        if pool is not None:
+            if not pool[patient_id]:
+                continue
+            rows += len(pool[patient_id])
+        http = requests.Session()
+        login(http, base, patient_id)
+        sessions.append((http, patient_id))
+        if pool is None or rows >= share:
+            break
+    return sessions
+
+
+def run_scenario(name, base, work, concurrency, total, seed):
+    action = ACTIONS[name]
+    share = math.ceil(total / concurrency)
+    users = [(sessions_for(name, user, base, work, concurrency, share), random.Random(seed * 1000 + user))
+             for user in range(concurrency)]
+
+    latencies, queries, errors = [], [], defaultdict(int)
+    lock = threading.Lock()
+    remaining = [total]
+
+    def ticket():
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def user_loop(sessions, rng):
+        queue = list(sessions)
+        while queue and ticket():
+            http, patient_id = queue[0]
+            started = time.perf_counter()
+            outcome = action(http, base, rng, work, patient_id)
+            elapsed = (time.perf_counter() - started) * 1000
+            if outcome == EXHAUSTED:
+                return
+            if outcome == NEXT_PATIENT:
+                queue.pop(0)
+                with lock:
+                    remaining[0] += 1  # the ticket was not used
+                continue
+            response, error = outcome
+            with lock:
+                latencies.append(elapsed)
+                count = query_count(response)
+                if count is not None:
+                    queries.append(count)
+                if error:
+                    errors[error] += 1
+
+    threads = [threading.Thread(target=user_loop, args=u) for u in users]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - started
+    for sessions, _ in users:
+        for http, _ in sessions:
+            http.close()
+
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': dict(errors),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 1) if duration else None,
+        'latency_ms': {
+            'p50': _round(percentile(ordered, 50)), 'p95': _round(percentile(ordered, 95)),
+            'p99': _round(percentile(ordered, 99)), 'max': _round(ordered[-1] if ordered else None),
+            'mean': _round(sum(ordered) / len(ordered) if ordered else None),
+        },
+        'queries_per_request': {
+            'mean': _round(sum(queries) / len(queries) if queries else None),
+            'max': max(queries) if queries else None,
+        },
+    }
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')})")
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before or not before['requests'] or not result['requests']:
+            continue
+        p95, old_p95 = result['latency_ms']['p95'], before['latency_ms']['p95']
+        rps, old_rps = result['throughput_rps'], before['throughput_rps']
+        print(f"  {name:<10} p95 {old_p95:8.2f} -> {p95:8.2f} ms ({(p95 / old_p95 - 1) * 100:+6.1f}%)"
+              f"   throughput {old_rps:7.1f} -> {rps:7.1f} rps ({(rps / old_rps - 1) * 100:+6.1f}%)")
+
+
+def report(results):
+    print(f"\n{'scenario':<10} {'reqs':>6} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}")
+    for name, r in results['scenarios'].items():
+        lat = r['latency_ms']
+        if not r['requests']:
+            print(f"{name:<10} {0:>6}   (no rows left to exercise)")
+            continue
+        queries = r['queries_per_request']['mean']
+        print(f"{name:<10} {r['requests']:>6} {sum(r['errors'].values()):>5} {r['throughput_rps']:>8.1f} "
+              f"{lat['p50']:>8.2f} {lat['p95']:>8.2f} {lat['p99']:>8.2f} "
+              + (f"{queries:>6.1f}" if queries is not None else f"{'-':>6}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_arguments(parser)
+    parser.add_argument('--concurrency', type=int, default=8, help="virtual users per scenario")
+    parser.add_argument('--requests', type=int, default=400, help="requests per scenario")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--no-page-cache', action='store_true', help="render every public page")
+    parser.add_argument('--request-log', action='store_true', help="print the app's JSON line per request")
+    parser.add_argument('--base-url', help="load this running server instead of an in-process one")
+    parser.add_argument('--db', help="with --base-url: the datagen.py SQLite file the server uses")
+    parser.add_argument('--output', help="write the JSON results here (default: stdout)")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if bool(args.base_url) != bool(args.db):
+        parser.error("--base-url and --db go together")
+    path = os.path.abspath(args.db) if args.db else os.path.join(tempfile.mkdtemp(prefix='medibook-bench-'), 'loadtest.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        PAGE_CACHE_ENABLED = not args.no_page_cache
+        RATELIMIT_ENABLED = False
+        REQUEST_LOG = args.request_log
+
+    app = create_app(BenchConfig)
+    if args.base_url:
+        counts = None  # whatever datagen.py was run with; --patients must not exceed it
+    else:
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            counts = datagen.generate_from_args(args)
+        print(f"Generated {counts} in {time.perf_counter() - started:.1f}s ({path})", file=sys.stderr)
+    work = Workload(app, args.patients, args.seed)
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'concurrency': args.concurrency,
+            'requests_per_scenario': args.requests,
+            'page_cache': None if args.base_url else not args.no_page_cache,
+            'data': counts,
+        },
+        'scenarios': {},
+    }
+    if args.base_url:
+        results['meta']['base_url'] = args.base_url
+        for name in scenarios:
+            results['scenarios'][name] = run_scenario(name, args.base_url.rstrip('/'), work, args.concurrency,
+                                                      args.requests, args.seed)
+    else:
+        with Server(app) as server:
+            for name in scenarios:
+                results['scenarios'][name] = run_scenario(name, server.url, work, args.concurrency,
+                                                          args.requests, args.seed)
+
+    report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Write-Driven Cache Invalidation
+Keeps a version number per model that is bumped whenever a committed
+transaction inserted, updated or deleted rows of that model. Cached values
+remember the versions they were computed from and are recomputed as soon
+as one of them moves, so readers never see data older than the last commit
+made through this process.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersions:
+    """Per-model write counters, bumped after commit."""
+
+    def __init__(self):
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def get(self, *models):
+        return tuple(self._versions[m.__name__] for m in models)
+
+    def bump(self, model_names):
+        with self._lock:
+            for name in model_names:
+                self._versions[name] += 1
+        for listener in list(self._listeners):
+            try:
+                listener(model_names)
+            except Exception:
+                # Runs after the commit: a listener outage (Redis down) must not fail the request that wrote
+                logger.exception("Model version listener failed for %s", ', '.join(sorted(model_names)))
+
+    def subscribe(self, listener):
+        """Call `listener(model_names)` after every bump, e.g. to share versions with other processes."""
+        self._listeners.append(listener)
+
+
+model_versions = ModelVersions()
+
+
+class VersionedCache:
+    """
+    In-process cache whose entries are tied to the versions of the models
+    they were built from. `ttl` bounds staleness for writes made by other
+    processes, which this process cannot observe.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = weakref.WeakKeyDictionary()  # engine -> {key: (stamp, expires, value)}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, engine, key, models, compute):
+        stamp = model_versions.get(*models)
+        now = time.monotonic()
+        entries = self._entries.get(engine)
+        entry = entries.get(key) if entries else None
+        if entry and entry[0] == stamp and entry[1] > now:
+            return entry[2]
+        value = compute()
+        with self._lock:
+            self._entries.setdefault(engine, {})[key] = (stamp, now + self.ttl, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries = weakref.WeakKeyDictionary()
+
+
+def _pending(session):
+    return session.info.setdefault('changed_models', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    changed = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        changed.add(type(obj).__name__)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _pending(orm_execute_state.session).add(mapper.class_.__name__)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish(session):
+    changed = session.info.pop('changed_models', None)
+    if changed:
+        model_versions.bump(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('changed_models', None)
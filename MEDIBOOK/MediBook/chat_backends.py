@@ -0,0 +1,238 @@
+"""
+Chat Assistant Backends
+The chat routes ask a chain of backends for an answer: the configured
+primary first (the Groq LLM by default), then the local responder, which
+always answers. The local responder runs offline on the CPU. It matches
+symptoms against an on-disk symptom -> specialization index with TF-IDF
+cosine similarity and links to the search page for specializations that
+have doctors registered. Set CHAT_BACKEND=local to skip the LLM entirely,
+e.g. for load tests.
+"""
+
+import json
+import math
+import re
+from collections import Counter, namedtuple
+
+from flask import current_app, url_for
+
+from llm_client import LLMError, UpstreamBusy
+from repositories import DoctorRepository
+from response_cache import namespace
+
+# A piece of an answer: text to show and (label, url) links to offer
+Reply = namedtuple('Reply', ['text', 'links'])
+Reply.__new__.__defaults__ = ((),)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+GREETINGS = {'hi', 'hello', 'hey', 'hiya', 'greeting', 'salam', 'salaam'}
+GREETING_PHRASES = ('good morning', 'good afternoon', 'good evening')
+THANKS = {'thanks', 'thank', 'thx'}
+
+# Generation settings sent with every completion request
+GENERATION = {"temperature": 0.7, "max_tokens": 250}
+
+SYSTEM_PROMPT = """You are MediBook AI Assistant — a friendly and concise medical advisor.
+
+Rules:
+- Be warm, empathetic, and brief
+- Reply to greetings simply (e.g., "Hi! How can I help?")
+- For symptoms: Give 3–4 short bullet points max
+- Always include safe home tips and red flags
+- End with a short recommendation to book a doctor
+- Keep total response under 150 words
+
+Example for back pain:
+• Common causes: muscle strain, poor posture, stress
+• Try: rest, gentle stretches, heat/ice, ibuprofen
+• See doctor if: pain down leg, numbness, or >2 weeks
+• Book an orthopedist via our Search feature!"""
+
+
+class BackendUnavailable(Exception):
+    """The backend cannot answer right now; the next one in the chain is tried."""
+
+
+class Overloaded(Exception):
+    """The backend is healthy but saturated; the request is refused (503) rather than degraded."""
+
+
+def tokenize(text):
+    """Lower-case word tokens with a plural 's' stripped (headaches -> headache)."""
+    tokens = []
+    for token in _WORD_RE.findall((text or '').lower()):
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def terms(text):
+    """Tokens plus adjacent pairs, so 'chest pain' weighs more than 'chest' and 'pain' apart."""
+    tokens = tokenize(text)
+    return tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+
+
+class ChatBackend:
+    """Interface every chat backend implements."""
+
+    name = None
+
+    @property
+    def available(self):
+        return True
+
+    def reply(self, message):
+        """Return the whole answer as a Reply; raise BackendUnavailable to defer to the next backend."""
+        raise NotImplementedError
+
+    def stream(self, message):
+        """Yield Reply chunks as they become available (by default, the whole reply at once)."""
+        yield self.reply(message)
+
+
+class LLMBackend(ChatBackend):
+    """The hosted LLM behind the pooled client, with the response cache in front of it."""
+
+    name = 'groq'
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    @property
+    def available(self):
+        return self.client.enabled
+
+    def _messages(self, message):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": message}
+        ]
+
+    def _scope(self):
+        return namespace(self.client.model, SYSTEM_PROMPT, GENERATION)
+
+    def reply(self, message):
+        cached = self.cache.get(self._scope(), message)
+        if cached is not None:
+            return Reply(cached)
+        try:
+            answer = self.client.complete(self._messages(message), **GENERATION)
+        except UpstreamBusy as e:
+            raise Overloaded(str(e)) from e
+        except LLMError as e:
+            raise BackendUnavailable(str(e)) from e
+        self.cache.put(self._scope(), message, answer)
+        return Reply(answer)
+
+    def stream(self, message):
+        cached = self.cache.get(self._scope(), message)
+        if cached is not None:
+            yield Reply(cached)
+            return
+        tokens = []
+        try:
+            for token in self.client.stream(self._messages(message), **GENERATION):
+                tokens.append(token)
+                yield Reply(token)
+        except UpstreamBusy as e:
+            raise Overloaded(str(e)) from e
+        except LLMError as e:
+            raise BackendUnavailable(str(e)) from e
+        self.cache.put(self._scope(), message, ''.join(tokens).strip())
+
+
+class SymptomIndex:
+    """TF-IDF vectors over each specialization's symptom keywords."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        documents = [Counter(terms(e['symptoms'])) for e in entries]
+        frequency = Counter(term for doc in documents for term in doc)
+        self.idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in frequency.items()}
+        self.vectors = [self._weigh(doc) for doc in documents]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['entries'])
+
+    def _weigh(self, counts):
+        vector = {t: (1 + math.log(n)) * self.idf[t] for t, n in counts.items() if t in self.idf}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {t: w / norm for t, w in vector.items()}
+
+    def match(self, text, limit=2, threshold=0.12):
+        """[(score, entry)] best first, cosine similarity of at least `threshold`."""
+        query = self._weigh(Counter(terms(text)))
+        scored = []
+        for entry, vector in zip(self.entries, self.vectors):
+            score = sum(w * vector.get(t, 0.0) for t, w in query.items())
+            if score >= threshold:
+                scored.append((score, entry))
+        scored.sort(key=lambda pair: -pair[0])
+        return scored[:limit]
+
+
+class LocalBackend(ChatBackend):
+    """Offline responder: greetings plus symptom -> specialization recommendations."""
+
+    name = 'local'
+
+    def __init__(self, index):
+        self.index = index
+
+    def _offered(self, entry, registered):
+        """The registered specialization names this index entry stands for."""
+        aliases = {entry['specialization'].lower(), *entry['aliases']}
+        return [name for name in registered if name.strip().lower() in aliases]
+
+    def reply(self, message):
+        tokens = set(tokenize(message))
+        lower = ' '.join(tokenize(message))
+        matches = self.index.match(message)
+        if not matches and (tokens & GREETINGS or lower.startswith(GREETING_PHRASES)):
+            return Reply("Hello! 👋 I'm the MediBook AI Assistant. Tell me your symptoms and "
+                         "I'll suggest the right kind of specialist.")
+        if not matches and tokens & THANKS:
+            return Reply("You're welcome! Take care, and book a doctor any time via Find Your Doctor.")
+        if not matches:
+            return Reply("I couldn't match that to a specialty. Try describing your symptoms "
+                         "(e.g. 'sore throat and fever'), or browse all doctors.",
+                         (('Find Your Doctor', url_for('doctor.search')),))
+
+        registered = DoctorRepository.get_specializations()
+        best = matches[0][1]
+        lines = [f"• {tip}" for tip in best['advice']]
+        lines.append(f"• See a doctor urgently if: {best['red_flags']}")
+        links, suggested = [], []
+        for _, entry in matches:
+            suggested.append(entry['specialization'])
+            for name in self._offered(entry, registered):
+                article = 'an' if name[:1].lower() in 'aeiou' else 'a'
+                links.append((f"Find {article} {name}", url_for('doctor.search', specialization=name)))
+        lines.append(f"• Suggested specialist: {' or '.join(suggested)}"
+                     + (" (book below)" if links else " via Find Your Doctor"))
+        if not links:
+            links.append(('Find Your Doctor', url_for('doctor.search')))
+        return Reply('\n'.join(lines), tuple(links))
+
+
+def init_app(app):
+    index = SymptomIndex.load(app.config['CHAT_SYMPTOM_INDEX'])
+    app.extensions['chat_backends'] = {
+        'groq': LLMBackend(app.extensions['llm_client'], app.extensions['chat_cache']),
+        'local': LocalBackend(index),
+    }
+
+
+def get_backends():
+    """Backends to try in order: the configured one if it is usable, then the local responder."""
+    backends = current_app.extensions['chat_backends']
+    primary = backends.get(current_app.config['CHAT_BACKEND'], backends['local'])
+    chain = [primary] if primary.available else []
+    if primary is not backends['local']:
+        chain.append(backends['local'])
+    return chain
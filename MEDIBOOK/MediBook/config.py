@@ -4,3 +4,90 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///medibook.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Explicit engine options win over the pool options derived from the DB_POOL_* settings below
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    # Connection pool for PostgreSQL/MySQL (a SQLite file takes its size from SQLITE_POOL_* below)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))     # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))     # reconnect before server-side idle timeouts
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') != '0'  # test connections on checkout
+
+    # SQLite pragmas run on every new connection (an empty value leaves SQLite's default).
+    # WAL lets readers continue while a booking commits; NORMAL syncs at checkpoints only, still safe in WAL.
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')  # wait for a writer instead of failing
+    # mmap maps up to this much of the file; the pages live in the OS page cache, shared by every
+    # connection and worker, so it costs address space rather than memory per connection
+    SQLITE_MMAP_SIZE = os.environ.get('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024))
+    # Private page cache of each connection: a worker can hold up to
+    # (SQLITE_POOL_SIZE + SQLITE_MAX_OVERFLOW) x this, 8 x 8 MiB = 64 MiB with the defaults
+    SQLITE_CACHE_SIZE_KB = os.environ.get('SQLITE_CACHE_SIZE_KB', '8192')
+
+    # Pool for a SQLite file: one writer at a time, so about one connection per thread
+    # (GUNICORN_THREADS) is enough; DB_POOL_TIMEOUT still applies
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 4))
+    SQLITE_MAX_OVERFLOW = int(os.environ.get('SQLITE_MAX_OVERFLOW', 4))
+
+    # Read replicas (comma-separated URLs); requests read from one of them until they write.
+    # A SQLite file can be "replicated" locally by opening it read-only: sqlite:///file:/path/medibook.db?mode=ro&uri=true
+    SQLALCHEMY_REPLICA_URIS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    # After a committed write the browser reads from the primary this long, to cover replication lag
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+    # Chat LLM (Groq, OpenAI-compatible). Without a key the assistant uses its offline fallback.
+    GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
+    GROQ_API_URL = os.environ.get('GROQ_API_URL') or 'https://api.groq.com/openai/v1/chat/completions'
+    GROQ_MODEL = os.environ.get('GROQ_MODEL') or 'llama-3.3-70b-versatile'
+    LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 10))            # kept-alive connections
+    LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))  # simultaneous upstream calls
+    LLM_MAX_WAITING = int(os.environ.get('LLM_MAX_WAITING', 16))        # queued callers beyond that get a 503
+    LLM_ACQUIRE_TIMEOUT = float(os.environ.get('LLM_ACQUIRE_TIMEOUT', 2))
+    LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 3.05))
+    LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', 20))
+    LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+    LLM_BREAKER_COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', 30))
+
+    # Cached chat answers: entries, seconds to live, trigram similarity for near-duplicates (0 = exact only)
+    CHAT_CACHE_SIZE = int(os.environ.get('CHAT_CACHE_SIZE', 1000))
+    CHAT_CACHE_TTL = float(os.environ.get('CHAT_CACHE_TTL', 3600))
+    CHAT_CACHE_SIMILARITY = float(os.environ.get('CHAT_CACHE_SIMILARITY', 0.85))
+
+    # Chat backend tried first: 'groq' (falls back to 'local' when unavailable) or 'local' (offline only)
+    CHAT_BACKEND = os.environ.get('CHAT_BACKEND') or 'groq'
+    CHAT_SYMPTOM_INDEX = os.environ.get('CHAT_SYMPTOM_INDEX') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'data', 'symptom_index.json')
+
+    # Chat throttling: token buckets per session and per client IP (per-minute rate, burst)
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL') or 'memory://'  # or redis://host:6379/0
+    CHAT_SESSION_PER_MINUTE = int(os.environ.get('CHAT_SESSION_PER_MINUTE', 10))
+    CHAT_SESSION_BURST = int(os.environ.get('CHAT_SESSION_BURST', 5))
+    CHAT_IP_PER_MINUTE = int(os.environ.get('CHAT_IP_PER_MINUTE', 60))
+    CHAT_IP_BURST = int(os.environ.get('CHAT_IP_BURST', 20))
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are trusted, so the
+    # per-IP limits see the client's address rather than the proxy's (0 = clients connect directly)
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', 0))
+
+    # Rendered public pages (search, doctor profiles) for anonymous visitors: entries, seconds to live.
+    # With several gunicorn workers the cache needs the shared Redis store and is off without it
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '1') != '0'
+    PAGE_CACHE_STORAGE_URL = os.environ.get('PAGE_CACHE_STORAGE_URL') or 'memory://'  # or redis://host:6379/0
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 512))
+    PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', 60))
+
+    # Request instrumentation: JSON request log lines, statements slower than SLOW_QUERY_MS kept and logged
+    REQUEST_LOG = os.environ.get('REQUEST_LOG', '1') != '0'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    # Opt-in cProfile for one endpoint (e.g. doctor.search), a fraction of its requests; .prof files go to PROFILE_DIR
+    PROFILE_ENDPOINT = os.environ.get('PROFILE_ENDPOINT') or None
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 1.0))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+
+    # Admin statistics snapshot (stats_service.py, refreshed by `flask refresh-stats` from cron):
+    # the dashboard flags it as out of date past STATS_MAX_AGE seconds but never recomputes it on a page load;
+    # per-day numbers, top specializations and busiest clinics cover the last STATS_WINDOW_DAYS days
+    STATS_MAX_AGE = int(os.environ.get('STATS_MAX_AGE', 300))
+    STATS_WINDOW_DAYS = int(os.environ.get('STATS_WINDOW_DAYS', 30))
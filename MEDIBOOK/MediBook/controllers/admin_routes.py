@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, redirect, url_for, session, flash, request
-from repositories import PatientRepository, DoctorRepository, AppointmentRepository, UserRepository
+from flask import Blueprint, render_template, redirect, url_for, session, flash, request, jsonify
+from repositories import DoctorRepository, UserRepository
+import observability
+import stats_service
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -10,20 +12,29 @@ def dashboard():
         flash('Access denied. Admin only.')
         return redirect(url_for('auth.login'))
         
-    # Stats
-    total_patients = PatientRepository.count()
-    total_doctors = DoctorRepository.count()
-    total_appointments = AppointmentRepository.count()
+    # Stats: the newest snapshot (one indexed read), even a stale one; cron or the Refresh button recompute it
+    stats = stats_service.current()
+    totals = stats['totals']
     
-    # Unverified doctors
-    unverified_doctors = DoctorRepository.get_unverified()
+    # Unverified doctors (live: the admin acts on them)
+    unverified_doctors = DoctorRepository.get_unverified_rows()
     
     return render_template('admin/dashboard.html', 
-                         total_patients=total_patients, 
-                         total_doctors=total_doctors, 
-                         total_appointments=total_appointments,
+                         total_patients=totals['patients'], 
+                         total_doctors=totals['doctors'], 
+                         total_appointments=totals['appointments'],
+                         stats=stats,
                          unverified_doctors=unverified_doctors)
 
+# Recompute the dashboard statistics now instead of waiting for the next scheduled refresh
+@admin_bp.route('/stats/refresh', methods=['POST'])
+def refresh_stats():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    stats_service.refresh()
+    flash('Statistics refreshed.')
+    return redirect(url_for('admin.dashboard'))
+
 #phase5: Verify Doctor Action
 @admin_bp.route('/verify_doctor/<int:doctor_id>', methods=['POST'])
 def verify_doctor(doctor_id):
@@ -55,3 +66,31 @@ def delete_user(user_id):
         UserRepository.commit()
     flash('User deleted.')
     return redirect(url_for('admin.dashboard'))
+
+# Request instrumentation for this worker: recent requests, per-endpoint aggregates, slow statements, profiles
+@admin_bp.route('/debug')
+def debug():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Admin only.'}), 403
+    recent, slow = observability.get_request_log().snapshot()
+    profiler = observability.get_profiler()
+    return jsonify({
+        'endpoints': observability.endpoint_summary(),
+        'recent_requests': recent,
+        'slow_statements': slow,
+        'profiler': {'endpoint': profiler.endpoint, 'sample_rate': profiler.sample_rate,
+                     'profiles': list(profiler.profiles)},
+    })
+
+# Turn cProfile on for one endpoint (e.g. doctor.search), or off with an empty endpoint
+@admin_bp.route('/debug/profile', methods=['POST'])
+def debug_profile():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Admin only.'}), 403
+    try:
+        observability.get_profiler().configure(request.form.get('endpoint'),
+                                               float(request.form.get('sample_rate', 1.0)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    profiler = observability.get_profiler()
+    return jsonify({'endpoint': profiler.endpoint, 'sample_rate': profiler.sample_rate})
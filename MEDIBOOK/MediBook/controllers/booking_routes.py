@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort
 from repositories import UserRepository, AppointmentRepository, AvailabilityRepository, DoctorRepository, PatientRepository, ReviewRepository
-from datetime import datetime
+from datetime import datetime, date
+import scheduling
 
 booking_bp = Blueprint('booking', __name__)
 
@@ -28,7 +29,13 @@ def book_appointment(doctor_id):
         return redirect(url_for('doctor.profile', doctor_id=doctor_id))
     
     availability = AvailabilityRepository.get_by_id(availability_id)
-    if not availability or availability.is_booked:
+    if not availability or availability.doctor_id != doctor_id or availability.is_booked:
+        flash('This time slot is no longer available.')
+        return redirect(url_for('doctor.profile', doctor_id=doctor_id))
+    
+    # Compare-and-set on the slot: of several concurrent requests only one can flip is_booked
+    if not AvailabilityRepository.claim(availability.availability_id):
+        UserRepository.rollback()
         flash('This time slot is no longer available.')
         return redirect(url_for('doctor.profile', doctor_id=doctor_id))
     
@@ -39,10 +46,9 @@ def book_appointment(doctor_id):
         doctor_id=doctor_id,
         datetime=appointment_datetime,
         status='confirmed',
-        payment_method=payment_method
+        payment_method=payment_method,
+        availability_id=availability.availability_id
     )
-    
-    availability.is_booked = True
     UserRepository.commit()
     
     flash('Appointment booked successfully!')
@@ -61,28 +67,37 @@ def dashboard():
         if not patient:
             flash('Patient profile not found.')
             return redirect(url_for('doctor.search'))
-        appointments = AppointmentRepository.get_by_patient(patient.patient_id)
-        return render_template('dashboard.html', appointments=appointments, role='patient', now=datetime.now())
+        window = request.args.get('window', 'upcoming')
+        try:
+            appointments_page = AppointmentRepository.page_rows_by_patient(
+                patient.patient_id, cursor=request.args.get('appt_cursor'), window=window
+            )
+        except ValueError:
+            abort(400)
+        return render_template('dashboard.html', appointments=appointments_page.items, appointments_page=appointments_page,
+                               window=window, role='patient', now=datetime.now())
         
     elif role == 'doctor':
-        doctor = DoctorRepository.get_by_user_id(user_id)
+        doctor = DoctorRepository.get_by_user_id(user_id, profile='dashboard')
         if not doctor:
             flash('Doctor profile not found.')
             return redirect(url_for('doctor.search'))
-        appointments = AppointmentRepository.get_by_doctor(doctor.doctor_id)
-        availability_slots = AvailabilityRepository.get_by_doctor(doctor.doctor_id)
+        # Patient name, phone and medical history arrive as plain rows in the same SELECT; both lists are keyset-paged
+        window = request.args.get('window', 'upcoming')
+        try:
+            appointments_page = AppointmentRepository.page_rows_by_doctor(
+                doctor.doctor_id, cursor=request.args.get('appt_cursor'), window=window
+            )
+            slots_page = AvailabilityRepository.page_by_doctor(doctor.doctor_id, cursor=request.args.get('slot_cursor'))
+        except ValueError:
+            abort(400)
         
-        # Add patient medical history to each appointment for doctor view
-        for appt in appointments:
-            if appt.patient and appt.patient.user and hasattr(appt.patient.user, 'patient') and appt.patient.user.patient:
-                appt.patient_medical_history = appt.patient.user.patient.medical_history or 'Not provided'
-            else:
-                appt.patient_medical_history = 'Not provided'
-        
-        return render_template('dashboard.html', appointments=appointments, availability_slots=availability_slots, role='doctor', doctor=doctor)
+        return render_template('dashboard.html', appointments=appointments_page.items, appointments_page=appointments_page,
+                               availability_slots=slots_page.items, slots_page=slots_page, window=window,
+                               role='doctor', doctor=doctor, weekday_names=scheduling.WEEKDAY_NAMES)
         
     elif role == 'admin':
-        unverified_doctors = DoctorRepository.get_unverified()
+        unverified_doctors = DoctorRepository.get_unverified_rows()
         return render_template('dashboard.html', unverified_doctors=unverified_doctors, role='admin')
         
     return redirect(url_for('doctor.search'))
@@ -123,6 +138,55 @@ def add_availability():
     
     return redirect(url_for('booking.dashboard'))
 
+@booking_bp.route('/add_recurring_availability', methods=['POST'])
+def add_recurring_availability():
+    if 'user_id' not in session or session.get('role') != 'doctor':
+        flash('Only doctors can add availability.')
+        return redirect(url_for('auth.login'))
+    
+    doctor = DoctorRepository.get_by_user_id(session['user_id'])
+    if not doctor:
+        flash('Doctor profile not found.')
+        return redirect(url_for('booking.dashboard'))
+    
+    fields = ('start_date', 'end_date', 'start_time', 'end_time', 'slot_minutes')
+    if not all(request.form.get(f) for f in fields) or not request.form.getlist('weekdays'):
+        flash('All fields are required.')
+        return redirect(url_for('booking.dashboard'))
+    
+    try:
+        start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
+        if start_date < date.today():
+            raise ValueError('The schedule cannot start in the past.')
+        scheduling.check_range(start_date, end_date)
+        slots = scheduling.expand(
+            start_date, end_date,
+            weekdays=[int(d) for d in request.form.getlist('weekdays')],
+            start_time=datetime.strptime(request.form['start_time'], '%H:%M').time(),
+            end_time=datetime.strptime(request.form['end_time'], '%H:%M').time(),
+            slot_minutes=int(request.form['slot_minutes']),
+            breaks=scheduling.parse_breaks(request.form.get('breaks'))
+        )
+    except ValueError as e:
+        flash(f'Invalid schedule: {e}')
+        return redirect(url_for('booking.dashboard'))
+    
+    if not slots:
+        flash('The schedule does not produce any slots.')
+        return redirect(url_for('booking.dashboard'))
+    
+    existing = AvailabilityRepository.get_in_range(doctor.doctor_id, start_date, end_date)
+    free, conflicting = scheduling.without_conflicts(slots, existing)
+    AvailabilityRepository.bulk_create(doctor.doctor_id, free)
+    UserRepository.commit()
+    
+    message = f'Added {len(free)} availability slots.'
+    if conflicting:
+        message += f' Skipped {len(conflicting)} that overlap existing slots.'
+    flash(message)
+    return redirect(url_for('booking.dashboard'))
+
 @booking_bp.route('/delete_availability/<int:availability_id>', methods=['POST'])
 def delete_availability(availability_id):
     if 'user_id' not in session or session.get('role') != 'doctor':
@@ -153,15 +217,19 @@ def cancel_appointment(appointment_id):
         flash('Appointment not found.')
         return redirect(url_for('booking.dashboard'))
     
-    availability = AvailabilityRepository.get_existing(
-        appointment.doctor_id,
-        appointment.datetime.date(),
-        appointment.datetime.time(),
-        None # End time not needed for match in this context if using start_time+date
-    )
-    
-    if availability:
-        availability.is_booked = False
+    if appointment.status != 'cancelled':
+        # A cancelled appointment's slot may already belong to someone else
+        if appointment.availability_id:
+            AvailabilityRepository.release(appointment.availability_id)
+        else:
+            # Legacy row the backfill could not link to a slot
+            availability = AvailabilityRepository.get_existing(
+                appointment.doctor_id,
+                appointment.datetime.date(),
+                appointment.datetime.time()
+            )
+            if availability:
+                availability.is_booked = False
     
     appointment.status = 'cancelled'
     UserRepository.commit()
@@ -189,6 +257,9 @@ def submit_review(appointment_id):
     if not rating:
         flash('Rating is required.')
         return redirect(url_for('booking.dashboard'))
+    if not rating.isdigit() or not 1 <= int(rating) <= 5:
+        flash('Rating must be between 1 and 5.')
+        return redirect(url_for('booking.dashboard'))
         
     ReviewRepository.create(
         patient_id=patient.patient_id,
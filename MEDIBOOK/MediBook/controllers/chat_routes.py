@@ -1,71 +1,157 @@
-from flask import Blueprint, request, jsonify
-import os
-import requests
+from flask import Blueprint, request, jsonify, Response, session, stream_with_context, current_app
+import json
+import logging
+import secrets
+import time
+from chat_backends import get_backends, BackendUnavailable, Overloaded
+from llm_client import get_client
+from metrics import registry
+from rate_limit import get_limiter, per_minute
 
 chat_bp = Blueprint('chat', __name__)
+logger = logging.getLogger(__name__)
 
-# Groq API configuration
-GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Endpoints that can reach the LLM and are therefore throttled
+THROTTLED = ('chat.chat_message', 'chat.chat_stream')
+
+def _sse(data, event=None):
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+def _links(links):
+    return [{'label': label, 'url': url} for label, url in links]
+
+def _overloaded():
+    registry.inc('chat.overloaded')
+    return jsonify({'response': 'The assistant is very busy right now. Please try again in a moment.',
+                    'error': 'overloaded'}), 503, {'Retry-After': '2'}
+
+@chat_bp.before_request
+def throttle():
+    """
+    Token buckets per chat session and per client IP; 429 with Retry-After when any is empty.
+    A request without a chat session also spends from its IP's new-session bucket, so a
+    client that drops the cookie to get a fresh session each time is held to one session's rate.
+    """
+    if request.endpoint not in THROTTLED:
+        return None
+    registry.inc('chat.requests')
+    config = current_app.config
+    session_limit = per_minute(config['CHAT_SESSION_PER_MINUTE'], config['CHAT_SESSION_BURST'])
+    ip = request.remote_addr or 'unknown'
+    if 'user_id' in session:
+        buckets = [('session', f"user:{session['user_id']}", session_limit)]
+    elif 'chat_id' in session:
+        buckets = [('session', session['chat_id'], session_limit)]
+    else:
+        session['chat_id'] = secrets.token_hex(8)
+        buckets = [('session', session['chat_id'], session_limit), ('new_session', ip, session_limit)]
+    buckets.append(('ip', ip, per_minute(config['CHAT_IP_PER_MINUTE'], config['CHAT_IP_BURST'])))
+    exhausted, retry_after = get_limiter().check(buckets)
+    if exhausted:
+        registry.inc(f'chat.rate_limited.{exhausted}')
+        return jsonify({'response': "You're sending messages too quickly. Please wait a moment and try again.",
+                        'error': 'rate_limited'}), 429, {'Retry-After': str(retry_after)}
+    return None
 
 @chat_bp.route('/message', methods=['POST'])
 def chat_message():
     data = request.get_json()
     user_message = data.get('message', '').strip()
-    
+
     if not user_message:
         return jsonify({'response': 'Please type a message 😊'})
-    
-    print(f"DEBUG: User message: {user_message}")
-    
-    if GROQ_API_KEY:
+
+    logger.debug("Chat message received (%d characters)", len(user_message))
+
+    with registry.in_flight('chat.message'):
+        # The last backend in the chain (the local responder) always answers
+        for backend in get_backends():
+            try:
+                reply = backend.reply(user_message)
+            except BackendUnavailable as e:
+                logger.warning("Chat backend %s unavailable: %s", backend.name, e)
+                continue
+            except Overloaded:
+                return _overloaded()
+            registry.inc(f'chat.backend.{backend.name}')
+            return jsonify({'response': reply.text, 'links': _links(reply.links)})
+
+def _open_stream(user_message):
+    """Start the first backend that can answer: (backend, first chunk or None, remaining chunks)."""
+    for backend in get_backends():
+        chunks = backend.stream(user_message)
         try:
-            system_prompt = """You are MediBook AI Assistant — a friendly and concise medical advisor.
-
-Rules:
-- Be warm, empathetic, and brief
-- Reply to greetings simply (e.g., "Hi! How can I help?")
-- For symptoms: Give 3–4 short bullet points max
-- Always include safe home tips and red flags
-- End with a short recommendation to book a doctor
-- Keep total response under 150 words
-
-Example for back pain:
-• Common causes: muscle strain, poor posture, stress
-• Try: rest, gentle stretches, heat/ice, ibuprofen
-• See doctor if: pain down leg, numbness, or >2 weeks
-• Book an orthopedist via our Search feature!"""
-
-            payload = {
-                "model": "llama-3.3-70b-versatile",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 250
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(GROQ_API_URL, json=payload, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                ai_reply = result['choices'][0]['message']['content'].strip()
-                return jsonify({'response': ai_reply})
-            
-            print(f"Groq error: {response.status_code} {response.text}")
-            
-        except Exception as e:
-            print(f"Groq exception: {e}")
-    
-    # Fallback when Groq is unavailable
-    lower = user_message.lower()
-    if any(g in lower for g in ['hi', 'hello', 'hey', 'good morning', 'good afternoon']):
-        return jsonify({'response': 'Hello! 👋 How can I help you today?'})
-    
-    return jsonify({'response': "I'm having trouble connecting right now. For health concerns, please book an appointment with a specialist using our 'Find Your Doctor' feature!"})
+            return backend, next(chunks), chunks
+        except StopIteration:
+            return backend, None, iter(())
+        except BackendUnavailable as e:
+            logger.warning("Chat backend %s stream error: %s", backend.name, e)
+            registry.inc('chat.stream.upstream_errors')
+
+@chat_bp.route('/stream', methods=['POST'])
+def chat_stream():
+    """
+    Server-Sent Events version of /message: relays each token as the
+    backend produces it, then an optional `links` event and a `done`
+    event. Frames are `data: {"token": ...}`. The first token is awaited
+    before responding, so an overloaded upstream still gets a real 503.
+    """
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '').strip()
+    received = time.perf_counter()
+    registry.inc('chat.stream.started')
+
+    if user_message:
+        try:
+            backend, first, chunks = _open_stream(user_message)
+        except Overloaded:
+            return _overloaded()
+        registry.observe('chat.stream.ttft_ms', (time.perf_counter() - received) * 1000)
+    else:
+        backend, first, chunks = None, None, iter(())
+
+    def frames(chunk):
+        if chunk.text:
+            yield _sse({'token': chunk.text})
+        if chunk.links:
+            yield _sse({'links': _links(chunk.links)}, event='links')
+
+    def generate():
+        registry.gauge('chat.stream.active', 1)
+        try:
+            if backend is None:
+                yield _sse({'token': 'Please type a message 😊'})
+            else:
+                if first is not None:
+                    yield from frames(first)
+                try:
+                    for chunk in chunks:
+                        yield from frames(chunk)
+                except (BackendUnavailable, Overloaded) as e:
+                    logger.warning("Chat backend %s stream error: %s", backend.name, e)
+                    registry.inc('chat.stream.upstream_errors')
+                    yield _sse({'error': 'The answer was interrupted.'}, event='error')
+                registry.inc(f'chat.backend.{backend.name}')
+            yield _sse({}, event='done')
+        finally:
+            # Also runs when the client disconnects and the server closes the generator
+            registry.gauge('chat.stream.active', -1)
+            registry.observe('chat.stream.duration_ms', (time.perf_counter() - received) * 1000)
+
+    # The generator runs after the view returns; the local backend needs url_for and the database
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@chat_bp.route('/metrics')
+def chat_metrics():
+    """Worker-local chat metrics: in-flight requests/streams, queueing, throttling, time to first token."""
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Admin only.'}), 403
+    snapshot = registry.snapshot()
+    counters = snapshot['counters']
+    requests_seen = counters.get('chat.requests', 0)
+    rejected = sum(v for k, v in counters.items() if k.startswith('chat.rate_limited.')) + counters.get('chat.overloaded', 0)
+    snapshot['rejection_rate'] = rejected / requests_seen if requests_seen else 0.0
+    snapshot['llm_breaker'] = get_client().breaker.state
+    return jsonify(snapshot)
@@ -1,37 +1,61 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, abort
 from repositories import DoctorRepository, ClinicRepository, AvailabilityRepository, ReviewRepository
-from datetime import date
+from datetime import date, timedelta
+from models.user_model import User, Doctor
+from models.appointment_model import Clinic, DoctorAvailability, Review
+from page_cache import cached_page
 
 doctor_bp = Blueprint('doctor', __name__)
 
+# Everything the public pages render; a committed write to any of these invalidates them
+PUBLIC_PAGE_MODELS = (Doctor, User, Clinic, DoctorAvailability, Review)
+
 @doctor_bp.route('/')
+@cached_page(*PUBLIC_PAGE_MODELS)
 def search():
     specialization = request.args.get('specialization')
     location = request.args.get('location')
     name_query = request.args.get('name')
+    text_query = request.args.get('q')
+    sort = request.args.get('sort') or 'relevance'
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    # "Available this week": a free slot within the next 7 days
+    available_by = date.today() + timedelta(days=6) if request.args.get('available') == 'week' else None
+    page_number = request.args.get('page', 1, type=int)
     
-    doctors = DoctorRepository.search(specialization=specialization, city=location, name=name_query)
-    
-    # Get unique specializations for filter dropdown
-    specializations = DoctorRepository.get_specializations()
+    try:
+        # Result cards are plain rows: only the columns the page shows, nothing tracked by the session
+        doctors_page = DoctorRepository.search_page(page=page_number, cards=True, specialization=specialization,
+                                                    city=location, name=name_query, q=text_query, sort=sort,
+                                                    min_price=min_price, max_price=max_price, available_by=available_by)
+    except ValueError:
+        abort(400)
+    doctors = doctors_page.items
+    next_slots = AvailabilityRepository.get_next_free_slots([d.doctor_id for d in doctors], date.today())
     
-    # Get unique cities for location filter
-    cities = ClinicRepository.get_cities()
+    # Specialization and city filters with doctor counts (cached until doctors/clinics change)
+    specializations = DoctorRepository.get_specialization_facets()
+    cities = ClinicRepository.get_city_facets()
     
-    return render_template('home.html', doctors=doctors, specializations=specializations, cities=cities)
+    return render_template('home.html', doctors=doctors, doctors_page=doctors_page, next_slots=next_slots,
+                           specializations=specializations, cities=cities)
 
 @doctor_bp.route('/doctor/<int:doctor_id>')
+@cached_page(*PUBLIC_PAGE_MODELS)
 def profile(doctor_id):
-    doctor = DoctorRepository.get_by_id(doctor_id)
+    doctor = DoctorRepository.get_by_id(doctor_id, profile='profile')
     if not doctor:
-        from flask import abort
         abort(404)
     
-    # Get available (not booked) slots for this doctor from today onwards
+    # Get available (not booked) slots for this doctor from today onwards, one page at a time
     today = date.today()
-    available_slots = AvailabilityRepository.get_available_slots(doctor_id, today)
-    
-    # Fetch reviews for the doctor
-    reviews = ReviewRepository.get_by_doctor(doctor_id)
+    try:
+        slots_page = AvailabilityRepository.page_available_slots(doctor_id, today, cursor=request.args.get('slot_cursor'))
+        # Fetch reviews for the doctor, newest first
+        reviews_page = ReviewRepository.page_by_doctor(doctor_id, cursor=request.args.get('review_cursor'))
+    except ValueError:
+        abort(400)
     
-    return render_template('doctor_profile.html', doctor=doctor, available_slots=available_slots, reviews=reviews)
+    return render_template('doctor_profile.html', doctor=doctor, available_slots=slots_page.items, slots_page=slots_page,
+                           reviews=reviews_page.items, reviews_page=reviews_page)
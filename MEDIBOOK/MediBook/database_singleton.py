@@ -1,11 +1,100 @@
 """
 Singleton Pattern for Database Connection
 Ensures only one database instance exists throughout the application lifecycle
+
+Besides the primary, the database may have read replicas
+(SQLALCHEMY_REPLICA_URIS, registered as SQLALCHEMY_BINDS "replica_N").
+The session sends a request's SELECTs to one of them until the request
+writes; after a committed write the same browser reads from the primary
+for READ_YOUR_WRITES_SECONDS, so a booking or a profile edit shows up on
+the page it redirects to even when the replicas lag behind.
 """
 
+import contextlib
+import itertools
+import logging
+import time
+import weakref
+
+from flask import current_app, g, has_app_context, has_request_context, session as browser_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# Longest statement text kept for a slow statement
+STATEMENT_PREVIEW = 500
+
+# PRAGMA name -> config key, in the order they are run on a new SQLite connection
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT_MS'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('cache_size', 'SQLITE_CACHE_SIZE_KB'),
+)
+
+# SQLALCHEMY_BINDS keys of the read replicas: replica_1, replica_2, ...
+REPLICA_BIND_PREFIX = 'replica_'
+# Browser-session key: until when (epoch seconds) this browser reads from the primary
+PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+
+class QueryStats:
+    """Statements run during one request (or app context): count, total time and the slow ones."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+        self.slow = []  # [(milliseconds, statement)]
+
+    def record(self, statement, milliseconds, slow_ms):
+        self.count += 1
+        self.duration_ms += milliseconds
+        if milliseconds >= slow_ms:
+            self.slow.append((round(milliseconds, 2), statement[:STATEMENT_PREVIEW]))
+
+
+def query_stats():
+    """The current app context's QueryStats (created on first use), or None outside one."""
+    if not has_app_context():
+        return None
+    if '_query_stats' not in g:
+        g._query_stats = QueryStats()
+    return g._query_stats
+
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs to the request's read replica and everything else to the
+    primary. Once the session has written (a flush or an INSERT, UPDATE or
+    DELETE) it stays on the primary until it is removed at the end of the
+    request, so a request always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif getattr(clause, 'is_select', False):
+                replica = db_singleton.replica_engine(self)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.get('wrote') and has_request_context() and db_singleton.replica_engines():
+        db_singleton.read_your_writes()
+
+
 class DatabaseSingleton:
     _instance = None
     _db = None
+    _instrumented = weakref.WeakSet()
+    _turns = itertools.count()  # round-robin over the replicas, one pick per request
     
     def __new__(cls):
         if cls._instance is None:
@@ -14,16 +103,164 @@ class DatabaseSingleton:
     
     def initialize(self, db_instance):
         """Initialize the database instance (called once from app.py)"""
-        print(f"DEBUG: Initializing singleton {id(self)} with db {id(db_instance)}")
+        logger.debug("Initializing database singleton %s with db %s", id(self), id(db_instance))
         DatabaseSingleton._db = db_instance
     
     def get_db(self):
         """Get the singleton database instance"""
         if DatabaseSingleton._db is None:
-            print(f"DEBUG: get_db failed for singleton {id(self)}. _db is None.")
             raise RuntimeError("Database not initialized. Call initialize() first.")
         return DatabaseSingleton._db
 
+    @staticmethod
+    def engine_options(config):
+        """
+        Pool options for the configured database. Server databases get the
+        full DB_POOL_* set; a SQLite file the smaller SQLITE_POOL_SIZE and
+        SQLITE_MAX_OVERFLOW plus DB_POOL_TIMEOUT (its connections are local,
+        nothing to recycle or ping); an in-memory SQLite database keeps the
+        single shared connection Flask-SQLAlchemy gives it.
+        """
+        url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+        if url.get_backend_name() == 'sqlite':
+            if url.database in (None, '', ':memory:'):
+                return {}
+            return {'pool_size': config['SQLITE_POOL_SIZE'], 'max_overflow': config['SQLITE_MAX_OVERFLOW'],
+                    'pool_timeout': config['DB_POOL_TIMEOUT']}
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        }
+
+    @classmethod
+    def replica_binds(cls, config):
+        """SQLALCHEMY_BINDS entries for SQLALCHEMY_REPLICA_URIS, pooled like the primary."""
+        return {
+            f'{REPLICA_BIND_PREFIX}{n}': {'url': uri, **cls.engine_options(dict(config, SQLALCHEMY_DATABASE_URI=uri))}
+            for n, uri in enumerate(config.get('SQLALCHEMY_REPLICA_URIS') or (), start=1)
+        }
+
+    @staticmethod
+    def detach_replica_metadata(db_instance):
+        """
+        Flask-SQLAlchemy registers an empty MetaData per bind on the shared
+        db object. Drop the replicas' so create_all()/drop_all() only touch
+        the primary, in this app and in apps created later without replicas.
+        """
+        for key in [k for k in db_instance.metadatas if k and k.startswith(REPLICA_BIND_PREFIX)]:
+            del db_instance.metadatas[key]
+
+    @staticmethod
+    def sqlite_pragmas(config):
+        """[(pragma, value)] from the SQLITE_* settings; empty settings are left at SQLite's default."""
+        pragmas = []
+        for pragma, key in SQLITE_PRAGMAS:
+            value = str(config.get(key) or '').strip()
+            if value:
+                # cache_size is given in KiB; SQLite takes a negative number for KiB
+                pragmas.append((pragma, f'-{value}' if pragma == 'cache_size' else value))
+        return pragmas
+
+    def configure_connections(self, engine, config, read_only=False):
+        """
+        Run the SQLITE_* pragmas on every new connection of a SQLite `engine`.
+        A `read_only` engine (a replica) cannot change its journal mode and
+        keeps whatever the file has.
+        """
+        if engine.dialect.name != 'sqlite':
+            return
+        pragmas = [(p, v) for p, v in self.sqlite_pragmas(config) if not (read_only and p == 'journal_mode')]
+        if not pragmas:
+            return
+
+        @event.listens_for(engine, 'connect')
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma, value in pragmas:
+                    # An in-memory database answers journal_mode=WAL with 'memory'; nothing to do
+                    cursor.execute(f'PRAGMA {pragma}={value}')
+            finally:
+                cursor.close()
+
+    def replica_engines(self):
+        """The current app's read replica engines, in bind order."""
+        engines = self.get_db().engines
+        return [engines[key] for key in sorted(k for k in engines if k and k.startswith(REPLICA_BIND_PREFIX))]
+
+    def replica_engine(self, session=None):
+        """
+        The replica the current request reads from, or None for the primary:
+        outside requests (CLI commands, scripts), inside primary(), once
+        `session` has written, or while this browser's read-your-writes
+        window is open.
+        """
+        if not has_request_context() or g.get('_db_primary'):
+            return None
+        if session is not None and session.info.get('wrote'):
+            return None
+        replicas = self.replica_engines()
+        if not replicas or browser_session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+            return None
+        if '_db_replica' not in g:
+            g._db_replica = replicas[next(DatabaseSingleton._turns) % len(replicas)]
+        return g._db_replica
+
+    def read_your_writes(self, seconds=None):
+        """Send this browser's reads to the primary for `seconds` (default READ_YOUR_WRITES_SECONDS)."""
+        if seconds is None:
+            seconds = current_app.config['READ_YOUR_WRITES_SECONDS']
+        browser_session[PRIMARY_UNTIL_KEY] = time.time() + seconds
+
+    @contextlib.contextmanager
+    def primary(self):
+        """Read from the primary inside the block, e.g. right before a decision that must not see stale rows."""
+        previous = g.get('_db_primary', False)
+        g._db_primary = True
+        try:
+            yield
+        finally:
+            g._db_primary = previous
+
+    def read_connection(self):
+        """The session's connection for raw SQL reads: the request's replica if it may use one, else the primary."""
+        session = self.session
+        replica = self.replica_engine(session)
+        return session.connection(bind_arguments={'bind': replica} if replica is not None else None)
+
+    def instrument(self, engine, slow_ms=100):
+        """
+        Time every statement `engine` executes and add it to the current
+        request's QueryStats; statements slower than `slow_ms` are kept
+        with their SQL and logged. Safe to call more than once per engine.
+        """
+        if engine in DatabaseSingleton._instrumented:
+            return
+        DatabaseSingleton._instrumented.add(engine)
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _start(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _finish(conn, cursor, statement, parameters, context, executemany):
+            milliseconds = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+            stats = query_stats()
+            if stats is not None:
+                stats.record(statement, milliseconds, slow_ms)
+            if milliseconds >= slow_ms:
+                logger.warning("Slow statement (%.1f ms): %s", milliseconds, statement[:STATEMENT_PREVIEW])
+
+        @event.listens_for(engine, 'handle_error')
+        def _failed(context):
+            # A failed statement never reaches after_cursor_execute
+            started = context.connection.info.get('query_started') if context.connection is not None else None
+            if started:
+                started.pop()
+
     
     @property
     def session(self):
@@ -32,4 +269,3 @@ class DatabaseSingleton:
 
 # Global singleton instance
 db_singleton = DatabaseSingleton()
-
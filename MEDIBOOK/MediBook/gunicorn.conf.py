@@ -0,0 +1,51 @@
+"""
+Gunicorn settings for production serving (gunicorn -c gunicorn.conf.py wsgi:app).
+
+Every value can be overridden from the environment:
+  PORT / GUNICORN_BIND     listen address (default 0.0.0.0:5000)
+  WEB_CONCURRENCY          worker processes (default 2 x CPUs + 1)
+  GUNICORN_THREADS         threads per worker; above 1 selects the gthread worker
+  GUNICORN_TIMEOUT         seconds a silent worker may take before it is replaced
+  GUNICORN_MAX_REQUESTS    recycle a worker after this many requests (0 = never)
+
+The app is imported once in the master (preload_app) and forked, so workers
+share its memory and start instantly. Signals: HUP replaces the workers
+gracefully, TERM drains in-flight requests for up to graceful_timeout
+seconds; with preload, deploy new code with USR2 (new master) then TERM
+to the old one. In-process state (rate limits, metrics) is per worker
+unless the Redis stores are configured; the page cache is switched off
+with more than one worker unless PAGE_CACHE_STORAGE_URL points at Redis.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycling bounds slow memory growth; the jitter keeps workers from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+# The app logs one JSON line per request (REQUEST_LOG); gunicorn only logs its own events
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Connections opened in the master before the fork must not be shared by workers
+    from models import db
+    import page_cache
+    app = worker.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    # Per-worker cached pages would miss other workers' writes
+    page_cache.require_shared_store(app, server.cfg.workers)
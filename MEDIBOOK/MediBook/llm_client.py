@@ -0,0 +1,253 @@
+"""
+Pooled Client for the Chat LLM
+One shared HTTP session per app keeps connections to the provider alive.
+A semaphore bounds concurrent upstream calls, and connect and read
+timeouts are separate. A circuit breaker fails fast while the provider is
+down, so chat requests drop to the canned fallback at once instead of
+each holding a worker until it times out.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from metrics import registry
+
+
+class LLMError(Exception):
+    """The upstream call did not produce an answer; callers use their fallback."""
+
+
+class CircuitOpen(LLMError):
+    """The breaker is open: recent calls failed, so this one was not attempted."""
+
+
+class UpstreamBusy(LLMError):
+    """No upstream slot: the wait queue is full, or no slot freed up within the acquire timeout."""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failures` consecutive failures; open -> half-open
+    after `cooldown` seconds, when a single trial call is let through. Its
+    success closes the breaker, its failure opens it for another cooldown.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failures=5, cooldown=30.0, clock=time.monotonic):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """True if a call may go upstream now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        """Give back a half-open trial that never reached the provider."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+class LLMClient:
+    """Chat-completions client for an OpenAI-compatible endpoint such as Groq."""
+
+    def __init__(self, url, api_key, model, pool_size=10, max_concurrency=8, max_waiting=16, acquire_timeout=2.0,
+                 connect_timeout=3.05, read_timeout=20.0, breaker=None):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Callers waiting for a slot; beyond max_waiting they are turned away at once
+        self.max_waiting = max_waiting
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    @property
+    def enabled(self):
+        return bool(self.api_key)
+
+    def _payload(self, messages, stream, params):
+        payload = {"model": self.model, "messages": messages, **params}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            registry.inc('llm.short_circuited')
+            raise CircuitOpen('LLM circuit breaker is open')
+        if not self._slots.acquire(blocking=False) and not self._wait_for_slot():
+            # Not the provider's fault: leave the breaker as it was
+            self.breaker.cancel_trial()
+            registry.inc('llm.busy')
+            raise UpstreamBusy('All upstream LLM slots are busy')
+        registry.gauge('llm.in_flight', 1)
+        registry.inc('llm.requests')
+
+    def _wait_for_slot(self):
+        """Queue for a slot for up to acquire_timeout; False if the queue is full or the wait runs out."""
+        with self._waiting_lock:
+            if self._waiting >= self.max_waiting:
+                registry.inc('llm.queue_rejected')
+                return False
+            self._waiting += 1
+            registry.set_gauge('llm.queue_depth', self._waiting)
+        try:
+            return self._slots.acquire(timeout=self.acquire_timeout)
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+                registry.set_gauge('llm.queue_depth', self._waiting)
+
+    def _release(self, error, abandoned=False):
+        registry.gauge('llm.in_flight', -1)
+        self._slots.release()
+        if abandoned:
+            # The caller left before the provider finished: no verdict either way
+            self.breaker.cancel_trial()
+        elif error is None:
+            self.breaker.record_success()
+        else:
+            registry.inc('llm.failures')
+            self.breaker.record_failure()
+
+    def complete(self, messages, **params):
+        """Return the full completion text; raises LLMError (or a subclass) on any failure."""
+        self._acquire()
+        error = None
+        started = time.perf_counter()
+        try:
+            response = self._session.post(self.url, json=self._payload(messages, False, params),
+                                          timeout=self.timeout)
+            if response.status_code != 200:
+                raise LLMError(f"{response.status_code} {response.text[:200]}")
+            return response.json()['choices'][0]['message']['content'].strip()
+        except LLMError as e:
+            error = e
+            raise
+        except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+            error = e
+            raise LLMError(str(e)) from e
+        finally:
+            registry.observe('llm.complete_ms', (time.perf_counter() - started) * 1000)
+            self._release(error)
+
+    def stream(self, messages, **params):
+        """
+        Yield content deltas as the provider streams them. The upstream slot
+        is held until the stream ends or the generator is closed; closing it
+        early (the browser went away) tells the breaker nothing.
+        """
+        self._acquire()
+        error = None
+        abandoned = False
+        try:
+            with self._session.post(self.url, json=self._payload(messages, True, params),
+                                    timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    raise LLMError(f"{response.status_code} {response.text[:200]}")
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        return
+                    delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        yield delta
+        except GeneratorExit:
+            # The consumer went away; neither an upstream failure nor a success
+            abandoned = True
+            raise
+        except LLMError as e:
+            error = e
+            raise
+        except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+            error = e
+            raise LLMError(str(e)) from e
+        finally:
+            self._release(error, abandoned)
+
+    async def acomplete(self, messages, **params):
+        """asyncio variant of complete(); the blocking call runs in a worker thread."""
+        return await asyncio.to_thread(self.complete, messages, **params)
+
+    def close(self):
+        self._session.close()
+
+
+def init_app(app):
+    """Create the app's shared client from its config."""
+    config = app.config
+    app.extensions['llm_client'] = LLMClient(
+        url=config['GROQ_API_URL'],
+        # config.py is imported before app.py loads .env, so look again now
+        api_key=config['GROQ_API_KEY'] or os.environ.get('GROQ_API_KEY'),
+        model=config['GROQ_MODEL'],
+        pool_size=config['LLM_POOL_SIZE'],
+        max_concurrency=config['LLM_MAX_CONCURRENCY'],
+        max_waiting=config['LLM_MAX_WAITING'],
+        acquire_timeout=config['LLM_ACQUIRE_TIMEOUT'],
+        connect_timeout=config['LLM_CONNECT_TIMEOUT'],
+        read_timeout=config['LLM_READ_TIMEOUT'],
+        breaker=CircuitBreaker(config['LLM_BREAKER_FAILURES'], config['LLM_BREAKER_COOLDOWN']),
+    )
+
+
+def get_client():
+    return current_app.extensions['llm_client']
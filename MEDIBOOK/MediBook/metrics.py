@@ -0,0 +1,85 @@
+"""
+In-Process Metrics
+Thread-safe counters, gauges and timing samples for one worker process.
+Timings keep the most recent samples only, so percentiles describe current
+behaviour and memory stays bounded.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Samples kept per timing series
+MAX_SAMPLES = 1000
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of numbers (q in 0..100)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Metrics:
+    """A named collection of counters, gauges and timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._gauges = defaultdict(int)
+        self._timings = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def gauge(self, name, delta):
+        with self._lock:
+            self._gauges[name] += delta
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, milliseconds):
+        with self._lock:
+            self._timings[name].append(milliseconds)
+
+    def counter(self, name):
+        return self._counters.get(name, 0)
+
+    @contextmanager
+    def in_flight(self, name):
+        """Count the block in the `name` gauge while it runs and record its duration under `name`."""
+        started = time.perf_counter()
+        self.gauge(name, 1)
+        try:
+            yield
+        finally:
+            self.gauge(name, -1)
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            timings = {name: list(samples) for name, samples in self._timings.items()}
+            result = {'counters': dict(self._counters), 'gauges': dict(self._gauges), 'timings': {}}
+        for name, samples in timings.items():
+            result['timings'][name] = {
+                'count': len(samples),
+                'p50': percentile(samples, 50),
+                'p95': percentile(samples, 95),
+                'p99': percentile(samples, 99),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+registry = Metrics()
@@ -0,0 +1,42 @@
+"""add hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 01:24:58.645431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # if_not_exists: databases adopted by `flask init-db` from the old
+    # create_all() boot path may already carry some of these indexes.
+    op.create_index('ix_appointments_doctor_datetime', 'appointments', ['doctor_id', 'datetime'], unique=False, if_not_exists=True)
+    op.create_index('ix_appointments_patient_created', 'appointments', ['patient_id', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_appointments_patient_datetime', 'appointments', ['patient_id', 'datetime'], unique=False, if_not_exists=True)
+    op.create_index('ix_clinics_city', 'clinics', ['city'], unique=False, if_not_exists=True)
+    op.create_index('ix_availability_doctor_booked_date', 'doctor_availability', ['doctor_id', 'is_booked', 'date', 'start_time'], unique=False, if_not_exists=True)
+    op.create_index('ix_availability_doctor_date', 'doctor_availability', ['doctor_id', 'date', 'start_time'], unique=False, if_not_exists=True)
+    op.create_index('ix_doctors_user_id', 'doctors', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_patients_user_id', 'patients', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_reviews_doctor_created', 'reviews', ['doctor_id', 'created_at'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_reviews_doctor_created', table_name='reviews')
+    op.drop_index('ix_patients_user_id', table_name='patients')
+    op.drop_index('ix_doctors_user_id', table_name='doctors')
+    op.drop_index('ix_availability_doctor_date', table_name='doctor_availability')
+    op.drop_index('ix_availability_doctor_booked_date', table_name='doctor_availability')
+    op.drop_index('ix_clinics_city', table_name='clinics')
+    op.drop_index('ix_appointments_patient_datetime', table_name='appointments')
+    op.drop_index('ix_appointments_patient_created', table_name='appointments')
+    op.drop_index('ix_appointments_doctor_datetime', table_name='appointments')
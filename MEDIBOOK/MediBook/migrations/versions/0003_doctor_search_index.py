@@ -0,0 +1,41 @@
+"""doctor full-text search index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:12:40.318224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other backends keep searching with LIKE filters
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_search USING fts5("
+        "name, specialization, bio, clinic_name, city, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS doctor_search_vocab USING fts5vocab(doctor_search, 'row')")
+    op.execute("DELETE FROM doctor_search")
+    op.execute(
+        "INSERT INTO doctor_search (rowid, name, specialization, bio, clinic_name, city) "
+        "SELECT d.doctor_id, u.name, d.specialization, COALESCE(d.bio, ''), c.name, c.city "
+        "FROM doctors d JOIN users u ON u.user_id = d.user_id JOIN clinics c ON c.clinic_id = d.clinic_id"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE IF EXISTS doctor_search_vocab")
+    op.execute("DROP TABLE IF EXISTS doctor_search")
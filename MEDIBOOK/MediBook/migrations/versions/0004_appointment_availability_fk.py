@@ -0,0 +1,86 @@
+"""link appointments to their availability slot
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:02:17.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH = 5000
+
+appointments = sa.table(
+    'appointments',
+    sa.column('appointment_id', sa.Integer),
+    sa.column('doctor_id', sa.Integer),
+    sa.column('datetime', sa.DateTime),
+    sa.column('availability_id', sa.Integer),
+)
+
+availability = sa.table(
+    'doctor_availability',
+    sa.column('availability_id', sa.Integer),
+    sa.column('doctor_id', sa.Integer),
+    sa.column('date', sa.Date),
+    sa.column('start_time', sa.Time),
+)
+
+
+def backfill(bind):
+    """
+    Match every unlinked appointment to the slot with the same doctor, date
+    and start time (the lowest id when a doctor has overlapping slots).
+    Done in Python because date/time column storage differs per backend.
+    """
+    slots = {}
+    for row in bind.execute(sa.select(availability).order_by(availability.c.availability_id.desc())):
+        slots[(row.doctor_id, row.date, row.start_time)] = row.availability_id
+
+    update = (
+        appointments.update()
+        .where(appointments.c.appointment_id == sa.bindparam('a_id'))
+        .values(availability_id=sa.bindparam('s_id'))
+    )
+    unlinked = bind.execute(
+        sa.select(appointments.c.appointment_id, appointments.c.doctor_id, appointments.c.datetime)
+        .where(appointments.c.availability_id.is_(None))
+    ).all()
+    batch = []
+    for appointment_id, doctor_id, when in unlinked:
+        slot_id = slots.get((doctor_id, when.date(), when.time()))
+        if slot_id is not None:
+            batch.append({'a_id': appointment_id, 's_id': slot_id})
+        if len(batch) == BATCH:
+            bind.execute(update, batch)
+            batch = []
+    if batch:
+        bind.execute(update, batch)
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Databases adopted by `flask init-db` from create_all() may already have the column
+    columns = {c['name'] for c in sa.inspect(bind).get_columns('appointments')}
+    if 'availability_id' not in columns:
+        with op.batch_alter_table('appointments', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('availability_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_appointments_availability_id', 'doctor_availability',
+                                        ['availability_id'], ['availability_id'])
+    op.create_index('ix_appointments_availability_id', 'appointments', ['availability_id'], unique=False,
+                    if_not_exists=True)
+    backfill(bind)
+
+
+def downgrade():
+    op.drop_index('ix_appointments_availability_id', table_name='appointments')
+    with op.batch_alter_table('appointments', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_appointments_availability_id', type_='foreignkey')
+        batch_op.drop_column('availability_id')
@@ -0,0 +1,50 @@
+"""doctor rating aggregates
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:37:51.220946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+doctors = sa.table(
+    'doctors',
+    sa.column('doctor_id', sa.Integer),
+    sa.column('rating_count', sa.Integer),
+    sa.column('rating_sum', sa.Integer),
+)
+
+reviews = sa.table(
+    'reviews',
+    sa.column('doctor_id', sa.Integer),
+    sa.column('rating', sa.Integer),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Databases adopted by `flask init-db` from create_all() may already have the columns
+    columns = {c['name'] for c in sa.inspect(bind).get_columns('doctors')}
+    if 'rating_count' not in columns:
+        with op.batch_alter_table('doctors', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+
+    count = sa.select(sa.func.count()).where(reviews.c.doctor_id == doctors.c.doctor_id).scalar_subquery()
+    total = sa.select(sa.func.coalesce(sa.func.sum(reviews.c.rating), 0)).where(
+        reviews.c.doctor_id == doctors.c.doctor_id).scalar_subquery()
+    op.execute(doctors.update().values(rating_count=count, rating_sum=total))
+
+
+def downgrade():
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')
@@ -0,0 +1,25 @@
+"""doctor price index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:02:13.480127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Search sorted by price (and price ranges) read doctors in index order
+    op.create_index('ix_doctors_price', 'doctors', ['price'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_doctors_price', table_name='doctors')
@@ -0,0 +1,35 @@
+"""stats snapshots
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 19:40:52.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases adopted by `flask init-db` from create_all() may already have the table
+    if 'stats_snapshots' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'stats_snapshots',
+        sa.Column('snapshot_id', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('snapshot_id'),
+    )
+    op.create_index('ix_stats_snapshots_taken_at', 'stats_snapshots', ['taken_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stats_snapshots_taken_at', table_name='stats_snapshots')
+    op.drop_table('stats_snapshots')
@@ -0,0 +1,43 @@
+"""doctor search trigram indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 10:21:37.604913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# (index, table, column) read by the search's ILIKE '%...%' filters
+TRIGRAM_INDEXES = (
+    ('ix_users_name_trgm', 'users', 'name'),
+    ('ix_doctors_specialization_trgm', 'doctors', 'specialization'),
+    ('ix_doctors_bio_trgm', 'doctors', 'bio'),
+    ('ix_clinics_name_trgm', 'clinics', 'name'),
+    ('ix_clinics_city_trgm', 'clinics', 'city'),
+)
+
+
+def upgrade():
+    # SQLite searches through the FTS5 index (0003); PostgreSQL serves the
+    # substring filters from pg_trgm GIN indexes instead of scanning
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(name, table, [column], unique=False, if_not_exists=True,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, _ in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -6,12 +6,19 @@ class Clinic(db.Model):
     #phase5: Custom clinic locations
     name = db.Column(db.String(150), nullable=False)
     address = db.Column(db.String(200), nullable=False)
-    city = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(100), nullable=False, index=True)
     country = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20))
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Doctor dashboard: WHERE doctor_id = ? ORDER BY datetime
+        db.Index('ix_appointments_doctor_datetime', 'doctor_id', 'datetime'),
+        # Patient history ordered by booking time, and the paged patient dashboard
+        db.Index('ix_appointments_patient_created', 'patient_id', 'created_at'),
+        db.Index('ix_appointments_patient_datetime', 'patient_id', 'datetime'),
+    )
     appointment_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.patient_id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), nullable=False)
@@ -19,13 +26,22 @@ class Appointment(db.Model):
     status = db.Column(db.Enum('pending', 'confirmed', 'cancelled', name='appointment_status'), default='pending')
     payment_method = db.Column(db.Enum('online', 'at_clinic', name='payment_methods'), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.now(), nullable=False)
+    # Slot the appointment was booked into; NULL only for rows that could not be matched when backfilled
+    availability_id = db.Column(db.Integer, db.ForeignKey('doctor_availability.availability_id'), index=True)
 
     # Relationships
     patient = db.relationship('Patient', backref='appointments')
     doctor = db.relationship('Doctor', backref='appointments')
+    availability = db.relationship('DoctorAvailability', backref='appointments')
 
 class DoctorAvailability(db.Model):
     __tablename__ = 'doctor_availability'
+    __table_args__ = (
+        # Free slots for a doctor from a date onwards (profile page, booking)
+        db.Index('ix_availability_doctor_booked_date', 'doctor_id', 'is_booked', 'date', 'start_time'),
+        # All slots for a doctor in calendar order (dashboard, duplicate check)
+        db.Index('ix_availability_doctor_date', 'doctor_id', 'date', 'start_time'),
+    )
     availability_id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -39,6 +55,9 @@ class DoctorAvailability(db.Model):
 class Review(db.Model):
     #phase5: Review system
     __tablename__ = 'reviews'
+    __table_args__ = (
+        db.Index('ix_reviews_doctor_created', 'doctor_id', 'created_at'),
+    )
     review_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.patient_id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), nullable=False)
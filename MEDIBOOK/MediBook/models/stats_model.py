@@ -0,0 +1,9 @@
+from . import db
+
+class StatsSnapshot(db.Model):
+    """Admin dashboard statistics as of `taken_at`, stored as JSON by stats_service.refresh()."""
+    __tablename__ = 'stats_snapshots'
+    snapshot_id = db.Column(db.Integer, primary_key=True)
+    # The dashboard reads the newest snapshot: ORDER BY taken_at DESC LIMIT 1
+    taken_at = db.Column(db.DateTime, nullable=False, index=True)
+    data = db.Column(db.Text, nullable=False)
@@ -1,3 +1,4 @@
+from sqlalchemy.ext.hybrid import hybrid_property
 from . import db
 
 class User(db.Model):
@@ -21,7 +22,7 @@ class User(db.Model):
 class Patient(db.Model):
     __tablename__ = 'patients'
     patient_id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
     dob = db.Column(db.Date, nullable=False)
     phone = db.Column(db.String(20))
     medical_history = db.Column(db.Text, default='', nullable=True)
@@ -29,14 +30,27 @@ class Patient(db.Model):
 class Doctor(db.Model):
     __tablename__ = 'doctors'
     doctor_id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
     clinic_id = db.Column(db.Integer, db.ForeignKey('clinics.clinic_id'), nullable=False)
     specialization = db.Column(db.String(100), nullable=False)
     bio = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
+    # Review aggregates, maintained by ReviewRepository.create (flask recompute-ratings re-derives them)
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationship to Clinic is defined in Appointment model or here? 
     # Usually defined where ForeignKey is.
     # Clinic model is in appointment_model.py, so we need to be careful with imports or string reference.
     # Using string reference 'Clinic' for relationship.
     clinic = db.relationship('Clinic', backref='doctors')
+
+    @hybrid_property
+    def average_rating(self):
+        """Mean review rating (1-5), or None without reviews."""
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @average_rating.expression
+    def average_rating(cls):
+        # The same mean in SQL (NULL without reviews), for sorting and projections
+        return db.cast(cls.rating_sum, db.Float) / db.func.nullif(cls.rating_count, 0)
@@ -0,0 +1,205 @@
+"""
+Request Observability
+Per-request timing built on the statement hook in DatabaseSingleton:
+every response carries a Server-Timing header (total and database time,
+statement count), every request is logged as one JSON line on the
+'medibook.request' logger, and the most recent requests, per-endpoint
+aggregates and slow statements are kept for the admin debug endpoint.
+
+An opt-in cProfile run can be switched on for one endpoint at a time
+(PROFILE_ENDPOINT, or at runtime from the debug endpoint), sampling a
+fraction of its requests; the hottest functions of recent runs are kept
+in memory and the full stats are written to PROFILE_DIR when it is set.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from flask import current_app, g, request
+
+from database_singleton import QueryStats, db_singleton, query_stats
+from metrics import registry
+
+logger = logging.getLogger('medibook.request')
+
+# Requests, slow statements and profiles kept for the debug endpoint
+RECENT_REQUESTS = 100
+RECENT_SLOW = 50
+RECENT_PROFILES = 10
+# Functions listed per profile, by cumulative time
+PROFILE_TOP = 25
+# Probes hit every few seconds; they are timed but not logged
+QUIET_ENDPOINTS = {'healthz'}
+
+
+class Profiler:
+    """cProfile for the requests of one endpoint, `sample_rate` of them."""
+
+    def __init__(self, endpoint=None, sample_rate=1.0, directory=None):
+        self.endpoint = endpoint
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.profiles = deque(maxlen=RECENT_PROFILES)
+        self._lock = threading.Lock()
+
+    def configure(self, endpoint, sample_rate=1.0):
+        """Profile `endpoint` from now on (None switches profiling off)."""
+        if not 0 < sample_rate <= 1:
+            raise ValueError("Sample rate must be in (0, 1]")
+        self.endpoint = endpoint or None
+        self.sample_rate = sample_rate
+
+    def start(self, endpoint):
+        """A running cProfile.Profile if this request is sampled, else None."""
+        if endpoint is None or endpoint != self.endpoint or random.random() >= self.sample_rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None  # another profiler is already active in this thread
+        return profile
+
+    def finish(self, profile, endpoint, path, duration_ms):
+        profile.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        taken = datetime.now(timezone.utc)
+        entry = {'endpoint': endpoint, 'path': path, 'duration_ms': round(duration_ms, 2),
+                 'at': taken.isoformat(timespec='seconds'), 'top': out.getvalue()}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            entry['file'] = os.path.join(self.directory, f"{endpoint}-{taken.strftime('%Y%m%dT%H%M%S%f')}.prof")
+            stats.dump_stats(entry['file'])
+        with self._lock:
+            self.profiles.append(entry)
+
+
+class RequestLog:
+    """The last requests and slow statements this worker served."""
+
+    def __init__(self):
+        self.requests = deque(maxlen=RECENT_REQUESTS)
+        self.slow_statements = deque(maxlen=RECENT_SLOW)
+        self._lock = threading.Lock()
+
+    def add(self, record, slow):
+        with self._lock:
+            self.requests.append(record)
+            for milliseconds, statement in slow:
+                self.slow_statements.append({'path': record['path'], 'ms': milliseconds, 'statement': statement})
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.requests), list(self.slow_statements)
+
+
+def server_timing(total_ms, stats):
+    return f'app;dur={total_ms:.1f}, db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"'
+
+
+def _before_request():
+    g._request_started = time.perf_counter()
+    # An app context pushed around several requests (tests, CLI) would otherwise add them up
+    g._query_stats = QueryStats()
+    g._profile = current_app.extensions['profiler'].start(request.endpoint)
+
+
+def _after_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    total_ms = (time.perf_counter() - started) * 1000
+    stats = query_stats()
+    endpoint = request.endpoint or 'unmatched'
+    profile = g.pop('_profile', None)
+    if profile is not None:
+        current_app.extensions['profiler'].finish(profile, endpoint, request.path, total_ms)
+
+    response.headers['Server-Timing'] = server_timing(total_ms, stats)
+    registry.observe(f'http.{endpoint}', total_ms)
+    registry.observe(f'http.{endpoint}.db', stats.duration_ms)
+    registry.inc(f'http.{endpoint}.requests')
+    registry.inc(f'http.{endpoint}.queries', stats.count)
+
+    record = {
+        'at': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'method': request.method,
+        'path': request.path,
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total_ms, 2),
+        'db_ms': round(stats.duration_ms, 2),
+        'queries': stats.count,
+        'slow_queries': len(stats.slow),
+    }
+    if endpoint not in QUIET_ENDPOINTS:
+        current_app.extensions['request_log'].add(record, stats.slow)
+        logger.info(json.dumps(record))
+    return response
+
+
+def _teardown_request(exc):
+    # A view that raised skips after_request; never leave the thread profiling
+    profile = g.pop('_profile', None)
+    if profile is not None:
+        profile.disable()
+
+
+def endpoint_summary():
+    """{endpoint: requests, p50/p95 latency, p95 database time, mean statements per request} from the metrics."""
+    snapshot = registry.snapshot()
+    counters, timings = snapshot['counters'], snapshot['timings']
+    summary = {}
+    for name, count in counters.items():
+        if not (name.startswith('http.') and name.endswith('.requests')):
+            continue
+        endpoint = name[len('http.'):-len('.requests')]
+        latency = timings.get(f'http.{endpoint}', {})
+        db_time = timings.get(f'http.{endpoint}.db', {})
+        summary[endpoint] = {
+            'requests': count,
+            'p50_ms': latency.get('p50'),
+            'p95_ms': latency.get('p95'),
+            'db_p95_ms': db_time.get('p95'),
+            'queries_per_request': round(counters.get(f'http.{endpoint}.queries', 0) / count, 2),
+        }
+    return summary
+
+
+def init_app(app):
+    config = app.config
+    with app.app_context():
+        # The primary and every read replica
+        for engine in db_singleton.get_db().engines.values():
+            db_singleton.instrument(engine, slow_ms=config['SLOW_QUERY_MS'])
+    app.extensions['request_log'] = RequestLog()
+    app.extensions['profiler'] = Profiler(config['PROFILE_ENDPOINT'], config['PROFILE_SAMPLE_RATE'],
+                                          config['PROFILE_DIR'])
+    if config['REQUEST_LOG'] and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def get_request_log():
+    return current_app.extensions['request_log']
+
+
+def get_profiler():
+    return current_app.extensions['profiler']
@@ -0,0 +1,220 @@
+"""
+Public Page Cache
+Whole rendered pages for anonymous visitors, keyed by endpoint, URL
+arguments and the write versions of the models the page is built from
+(see cache.py), so a committed change to a doctor, clinic, slot or review
+makes every page that shows it miss on the next hit. Entries carry an
+ETag and a Last-Modified time, so browsers revalidating an unchanged page
+get a 304. A hit is served without touching the database. A miss is
+rendered from the primary: a replica that has not caught up with the
+write behind the new versions would otherwise be cached under them.
+
+The MemoryStore is an LRU per worker; RedisStore (PAGE_CACHE_STORAGE_URL=
+redis://...) shares pages between workers and keeps the model versions
+in Redis as well, so a write in one worker invalidates the others. A
+worker cannot see another's writes through the MemoryStore, so under
+gunicorn with more than one worker the cache is switched off unless the
+store is shared (require_shared_store).
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timezone
+from urllib.parse import urlencode
+
+from flask import Response, current_app, make_response, request, session
+
+from cache import model_versions
+from database_singleton import db_singleton
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# A rendered page: HTML, mimetype, ETag and when it was rendered (a UTC datetime)
+Entry = namedtuple('Entry', ['body', 'mimetype', 'etag', 'built_at'])
+
+
+class MemoryStore:
+    """LRU of entries for one worker; versions are this process's model_versions."""
+
+    def __init__(self, max_entries=512, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, Entry)
+
+    def versions(self, models):
+        return model_versions.get(*models)
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                # Pages keyed by old versions are never asked for again and age out here
+                self._entries.popitem(last=False)
+                registry.inc('page_cache.evictions')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisStore:
+    """Entries and model versions in Redis, shared by every worker."""
+
+    def __init__(self, url, prefix='medibook:pages:'):
+        import redis  # optional dependency, only needed for a shared store
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        model_versions.subscribe(self._bump)
+
+    def _version_key(self, name):
+        return f'{self.prefix}version:{name}'
+
+    def _bump(self, model_names):
+        pipeline = self._redis.pipeline()
+        for name in model_names:
+            pipeline.incr(self._version_key(name))
+        pipeline.execute()
+
+    def versions(self, models):
+        return tuple(int(v or 0) for v in self._redis.mget([self._version_key(m.__name__) for m in models]))
+
+    def get(self, key):
+        raw = self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        body, mimetype, etag, built_at = json.loads(raw)
+        return Entry(body, mimetype, etag, datetime.fromisoformat(built_at))
+
+    def set(self, key, entry, ttl):
+        raw = json.dumps([entry.body, entry.mimetype, entry.etag, entry.built_at.isoformat()])
+        self._redis.set(self.prefix + key, raw, px=int(ttl * 1000))
+
+    def clear(self):
+        for key in self._redis.scan_iter(match=self.prefix + '*'):
+            self._redis.delete(key)
+
+
+def create_store(url, max_entries):
+    if not url or url.startswith('memory://'):
+        return MemoryStore(max_entries)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported page cache storage: {url}")
+
+
+class PageCache:
+    """
+    Looks pages up by (endpoint, arguments, model versions, today's date).
+    The date is part of the key because the pages list slots "from today".
+    `ttl` bounds staleness for writes this process cannot see (other
+    workers with the memory store, or changes made outside the app).
+    """
+
+    def __init__(self, store, ttl=60, enabled=True):
+        self.store = store
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def key(self, models):
+        args = urlencode(sorted(request.args.items(multi=True)))
+        versions = '.'.join(str(v) for v in self.store.versions(models))
+        raw = f'{request.endpoint}|{request.path}?{args}|{versions}|{date.today().isoformat()}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def put(self, key, response):
+        body = response.get_data(as_text=True)
+        entry = Entry(body, response.mimetype, hashlib.sha1(body.encode()).hexdigest(),
+                      datetime.now(timezone.utc).replace(microsecond=0))
+        self.store.set(key, entry, self.ttl)
+        return entry
+
+
+def _cacheable_request():
+    # Signed-in pages show the user's name and menus; flashed messages are shown once
+    return request.method == 'GET' and 'user_id' not in session and '_flashes' not in session
+
+
+def _respond(entry, state):
+    response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.last_modified = entry.built_at
+    # Browsers may keep the page but must revalidate (cheaply, with a 304) before reuse
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Page-Cache'] = state
+    return response.make_conditional(request)
+
+
+def cached_page(*models):
+    """
+    Serve the view from the page cache for anonymous GETs. `models` are the
+    models whose rows the page renders; a committed write to any of them
+    changes the key.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_page_cache()
+            if not cache.enabled or not _cacheable_request():
+                return view(*args, **kwargs)
+            key = cache.key(models)
+            entry = cache.get(key)
+            if entry is not None:
+                registry.inc('page_cache.hits')
+                return _respond(entry, 'HIT')
+            registry.inc('page_cache.misses')
+            # The key holds the versions this process has committed; replicas may still lag behind them
+            with db_singleton.primary():
+                response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.modified:
+                return response
+            return _respond(cache.put(key, response), 'MISS')
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    config = app.config
+    app.extensions['page_cache'] = PageCache(
+        create_store(config['PAGE_CACHE_STORAGE_URL'], config['PAGE_CACHE_SIZE']),
+        ttl=config['PAGE_CACHE_TTL'],
+        enabled=config['PAGE_CACHE_ENABLED'],
+    )
+
+
+def require_shared_store(app, workers):
+    """
+    Switch the page cache off, with a warning, when `workers` processes
+    would each keep their own MemoryStore and serve pages another worker's
+    write has already changed. Called by gunicorn in every worker.
+    """
+    cache = app.extensions['page_cache']
+    if cache.enabled and workers > 1 and isinstance(cache.store, MemoryStore):
+        logger.warning("Page cache disabled: %d workers cannot share the in-process store; "
+                       "set PAGE_CACHE_STORAGE_URL to a redis:// URL to cache pages", workers)
+        cache.enabled = False
+
+
+def get_page_cache():
+    return current_app.extensions['page_cache']
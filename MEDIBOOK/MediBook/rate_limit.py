@@ -0,0 +1,151 @@
+"""
+Token-Bucket Rate Limiting
+Each key (a chat session, a client IP) owns a bucket that refills at a
+steady rate up to a burst capacity. A request spends one token from each
+of its buckets, or, when any of them is empty, from none of them and is
+rejected with the time until they all refill. Buckets live in a store:
+the in-process MemoryStore by default, or RedisStore to share limits
+between workers and hosts (RATELIMIT_STORAGE_URL=redis://...).
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+
+# rate: tokens added per second; burst: bucket capacity
+Limit = namedtuple('Limit', ['rate', 'burst'])
+
+
+def per_minute(count, burst):
+    return Limit(count / 60.0, burst)
+
+
+class _Store:
+    def take(self, key, limit):
+        """Spend a token; returns (allowed, seconds until a token is available)."""
+        wait, = self.take_all([(key, limit)])
+        return wait == 0, wait
+
+
+def _waits(tokens, buckets):
+    return [max(0.0, (1 - t) / limit.rate) for t, (_, limit) in zip(tokens, buckets)]
+
+
+class MemoryStore(_Store):
+    """Buckets in a dict, for a single worker process. Idle buckets are dropped past `max_keys`."""
+
+    def __init__(self, max_keys=10_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+    def take_all(self, buckets):
+        """
+        buckets: [(key, Limit)]. Spends a token from every bucket if each
+        has one, else from none; returns the seconds each bucket needs until
+        it has a token (all 0.0 when the tokens were spent).
+        """
+        now = self._clock()
+        with self._lock:
+            tokens = []
+            for key, limit in buckets:
+                available, updated = self._buckets.pop(key, (limit.burst, now))
+                tokens.append(min(limit.burst, available + (now - updated) * limit.rate))
+            allowed = all(t >= 1 for t in tokens)
+            if allowed:
+                tokens = [t - 1 for t in tokens]
+            for (key, _), available in zip(buckets, tokens):
+                self._buckets[key] = (available, now)
+            while len(self._buckets) > self.max_keys:
+                # Least recently used first; a bucket idle this long has refilled anyway
+                self._buckets.popitem(last=False)
+        return [0.0] * len(buckets) if allowed else _waits(tokens, buckets)
+
+
+class RedisStore(_Store):
+    """Buckets in Redis, updated atomically by a Lua script, shared by every worker."""
+
+    # ARGV: now, then rate and burst for each key in KEYS
+    _SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local tokens, allowed = {}, 1
+    for i, key in ipairs(KEYS) do
+        local rate, burst = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+        local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+        local available = tonumber(bucket[1]) or burst
+        local updated = tonumber(bucket[2]) or now
+        tokens[i] = math.min(burst, available + math.max(0, now - updated) * rate)
+        if tokens[i] < 1 then
+            allowed = 0
+        end
+    end
+    for i, key in ipairs(KEYS) do
+        local rate, burst = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+        tokens[i] = tokens[i] - allowed
+        redis.call('HSET', key, 'tokens', tokens[i], 'updated', now)
+        redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+        tokens[i] = tostring(tokens[i])
+    end
+    return {allowed, tokens}
+    """
+
+    def __init__(self, url, prefix='medibook:ratelimit:'):
+        import redis  # optional dependency, only needed for a shared store
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(self._SCRIPT)
+        self.prefix = prefix
+
+    def take_all(self, buckets):
+        args = [time.time()]
+        for _, limit in buckets:
+            args += [limit.rate, limit.burst]
+        allowed, tokens = self._take(keys=[self.prefix + key for key, _ in buckets], args=args)
+        if allowed:
+            return [0.0] * len(buckets)
+        return _waits([float(t) for t in tokens], buckets)
+
+
+def create_store(url):
+    if not url or url.startswith('memory://'):
+        return MemoryStore()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported rate limit storage: {url}")
+
+
+class RateLimiter:
+    """Checks a request against several (key, limit) buckets; all of them must allow it."""
+
+    def __init__(self, store, enabled=True):
+        self.store = store
+        self.enabled = enabled
+
+    def check(self, buckets):
+        """
+        buckets: [(name, key, Limit)]. Returns (None, 0) when allowed, else
+        (name of the first exhausted bucket, seconds until every bucket has
+        a token). A rejected request spends no tokens, so one exhausted
+        bucket does not drain the others.
+        """
+        if not self.enabled:
+            return None, 0
+        waits = self.store.take_all([(f'{name}:{key}', limit) for name, key, limit in buckets])
+        for (name, _, _), wait in zip(buckets, waits):
+            if wait > 0:
+                return name, max(1, math.ceil(max(waits)))
+        return None, 0
+
+
+def init_app(app):
+    app.extensions['rate_limiter'] = RateLimiter(
+        create_store(app.config['RATELIMIT_STORAGE_URL']),
+        enabled=app.config['RATELIMIT_ENABLED'],
+    )
+
+
+def get_limiter():
+    return current_app.extensions['rate_limiter']
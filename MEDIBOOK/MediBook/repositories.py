@@ -3,9 +3,210 @@ Repository Pattern Implementation
 Isolates all database queries in a dedicated layer
 """
 
+import base64
+import datetime as dt
+import json
+from collections import namedtuple
+
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, tuple_, union, update
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload
 from models.user_model import User, Patient, Doctor
 from models.appointment_model import Clinic, Appointment, DoctorAvailability, Review
+from models.stats_model import StatsSnapshot
 from database_singleton import db_singleton
+import search_index
+from cache import VersionedCache
+
+
+# Named eager-loading profiles for Doctor queries. Each profile lists the
+# loader options a view needs so its template never lazy-loads per row.
+# 'search' relies on the User/Clinic joins the search query already makes.
+# Built lazily because the backrefs only exist once the mappers are configured.
+DOCTOR_LOAD_PROFILES = {
+    'search': lambda: (contains_eager(Doctor.user), contains_eager(Doctor.clinic)),
+    'profile': lambda: (joinedload(Doctor.user), joinedload(Doctor.clinic)),
+    'dashboard': lambda: (joinedload(Doctor.user), joinedload(Doctor.clinic)),
+}
+
+
+# Appointment profiles hydrate exactly what each dashboard renders, using
+# inner joins (every FK is NOT NULL) so a page is one SELECT.
+APPOINTMENT_LOAD_PROFILES = {
+    'doctor_dashboard': lambda: (
+        joinedload(Appointment.patient, innerjoin=True).joinedload(Patient.user, innerjoin=True),
+    ),
+    'patient_dashboard': lambda: (
+        joinedload(Appointment.doctor, innerjoin=True).joinedload(Doctor.user, innerjoin=True),
+        joinedload(Appointment.doctor, innerjoin=True).joinedload(Doctor.clinic, innerjoin=True),
+    ),
+}
+
+
+def _load_options(profiles, profile, kind):
+    """Return the loader options for a named profile (None means lazy loading)."""
+    if profile is None:
+        return ()
+    # The first ORM call of a process may build options before any query has configured the mappers
+    configure_mappers()
+    try:
+        return profiles[profile]()
+    except KeyError:
+        raise ValueError(f"Unknown {kind} load profile: {profile}")
+
+
+def doctor_load_options(profile):
+    return _load_options(DOCTOR_LOAD_PROFILES, profile, 'doctor')
+
+
+def appointment_load_options(profile):
+    return _load_options(APPOINTMENT_LOAD_PROFILES, profile, 'appointment')
+
+
+def row_type(name, columns):
+    """
+    A named tuple type with one field per entry of `columns` (field name ->
+    column), and the labelled columns to select it from as `.columns`.
+    """
+    base = namedtuple(name, list(columns))
+    labelled = tuple(column.label(field) for field, column in columns.items())
+    return type(name, (base,), {'__slots__': (), 'columns': labelled})
+
+
+# Read-only projections for list views: just the columns a page renders, as
+# plain tuples. Nothing enters the session's identity map, so there is no
+# change tracking, no lazy loading and no bio/password_hash/medical_history
+# unless the page shows it. Rows of the same type have the same fields as
+# the template names they replace (doctor.user.name -> doctor.name).
+
+# A search result
+DoctorCard = row_type('DoctorCard', {
+    'doctor_id': Doctor.doctor_id, 'name': User.name, 'profile_picture': User.profile_picture,
+    'specialization': Doctor.specialization, 'price': Doctor.price, 'rating_count': Doctor.rating_count,
+    'average_rating': Doctor.average_rating, 'clinic_name': Clinic.name, 'address': Clinic.address,
+    'city': Clinic.city, 'country': Clinic.country,
+})
+
+# An unverified doctor on the admin dashboard
+UnverifiedDoctorRow = row_type('UnverifiedDoctorRow', {
+    'doctor_id': Doctor.doctor_id, 'name': User.name, 'email': User.email,
+    'specialization': Doctor.specialization, 'clinic_name': Clinic.name,
+})
+
+# A patient's appointment with its doctor and clinic
+PatientAppointmentRow = row_type('PatientAppointmentRow', {
+    'appointment_id': Appointment.appointment_id, 'datetime': Appointment.datetime, 'status': Appointment.status,
+    'doctor_name': User.name, 'clinic_name': Clinic.name,
+})
+
+# A doctor's appointment with its patient (the dashboard shows the medical history)
+DoctorAppointmentRow = row_type('DoctorAppointmentRow', {
+    'appointment_id': Appointment.appointment_id, 'datetime': Appointment.datetime, 'status': Appointment.status,
+    'patient_name': User.name, 'patient_phone': Patient.phone, 'medical_history': Patient.medical_history,
+})
+
+
+def project(query, rows):
+    """Run `query` selecting only `rows`' columns and wrap each result row."""
+    return [rows._make(row) for row in query.with_entities(*rows.columns)]
+
+
+def project_page(page, rows):
+    """Wrap the rows of a keyset Page fetched from a query already projected onto `rows`.columns."""
+    return Page([rows._make(row) for row in page.items], page.next_cursor)
+
+
+DEFAULT_PAGE_SIZE = 20
+
+# Filter facets (specializations, cities) with doctor counts; recomputed only
+# after a committed write to doctors or clinics, or after FACET_TTL seconds
+FACET_TTL = 60
+facet_cache = VersionedCache(ttl=FACET_TTL)
+
+# Time windows accepted by the paginated listings
+WINDOWS = ('upcoming', 'past', 'all')
+
+# Orderings accepted by DoctorRepository.search; 'relevance' is FTS rank when searching text
+SEARCH_SORTS = ('relevance', 'price', 'price_desc', 'rating', 'next_available')
+
+
+class Page:
+    """One page of a keyset-paginated listing; next_cursor is None on the last page."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class OffsetPage:
+    """One numbered page of a ranked listing (orderings that cannot seek on a cursor)."""
+
+    def __init__(self, items, number, has_next):
+        self.items = items
+        self.number = number
+        self.has_next = has_next
+
+    @property
+    def has_prev(self):
+        return self.number > 1
+
+
+def encode_cursor(values):
+    """Pack the sort-key values of the last row into an opaque URL-safe token."""
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Turn a cursor token back into typed key values; raises ValueError if malformed."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError("wrong number of keys")
+        values = []
+        for column, value in zip(columns, raw):
+            python_type = column.type.python_type
+            if hasattr(python_type, 'fromisoformat'):
+                values.append(python_type.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        return values
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Malformed cursor: {cursor!r}") from e
+
+
+def keyset_page(query, columns, cursor=None, per_page=DEFAULT_PAGE_SIZE, descending=False):
+    """
+    Seek to the rows after `cursor` in (columns) order and fetch one page.
+    The row-value comparison lets the database start from the index position
+    instead of skipping OFFSET rows, so page cost does not grow with history.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        boundary = tuple_(*[bindparam(None, v, type_=c.type) for c, v in zip(columns, values)])
+        query = query.filter(key < boundary if descending else key > boundary)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return Page(rows, next_cursor)
+
+
+def _check_window(window):
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window: {window}")
 
 
 class UserRepository:
@@ -59,36 +260,165 @@ class DoctorRepository:
     """Repository for Doctor-related database operations"""
     
     @staticmethod
-    def get_by_id(doctor_id):
-        return Doctor.query.get(doctor_id)
+    def get_by_id(doctor_id, profile=None):
+        if profile is None:
+            return Doctor.query.get(doctor_id)
+        return Doctor.query.options(*doctor_load_options(profile)).filter_by(doctor_id=doctor_id).first()
     
     @staticmethod
-    def get_by_user_id(user_id):
-        return Doctor.query.filter_by(user_id=user_id).first()
+    def get_by_user_id(user_id, profile=None):
+        return Doctor.query.options(*doctor_load_options(profile)).filter_by(user_id=user_id).first()
     
     @staticmethod
     def get_unverified():
-        return Doctor.query.join(User).filter(User.verified == False, User.role == 'doctor').all()
+        return Doctor.query.join(User).options(contains_eager(Doctor.user), joinedload(Doctor.clinic)).filter(
+            User.verified == False, User.role == 'doctor'
+        ).all()
+
+    @staticmethod
+    def get_unverified_rows():
+        """get_unverified() as UnverifiedDoctorRow tuples, oldest sign-up first."""
+        query = Doctor.query.join(User).join(Clinic).filter(User.verified == False, User.role == 'doctor')
+        return project(query.order_by(Doctor.doctor_id), UnverifiedDoctorRow)
     
     @staticmethod
-    def search(specialization=None, city=None, name=None):
-        query = Doctor.query.join(User).join(Clinic)
+    def search(specialization=None, city=None, name=None, q=None, profile='search', limit=None, offset=0,
+               sort='relevance', min_price=None, max_price=None, available_by=None):
+        """
+        Search doctors; `q` matches name, specialization, bio, clinic and city.
+        On SQLite the FTS5 index gives prefix and typo-tolerant matching ranked
+        by relevance; other backends fall back to LIKE filters.
+        `sort` is one of SEARCH_SORTS; `available_by` keeps doctors with a free
+        slot on or before that date. The next free slot comes from one grouped
+        subquery, joined only when sorting or filtering on it.
+        The 'search' profile hydrates user and clinic in the same SELECT.
+        """
+        return DoctorRepository._search_query(
+            specialization, city, name, q, doctor_load_options(profile), limit, offset, sort, min_price, max_price,
+            available_by,
+        ).all()
+
+    @staticmethod
+    def search_cards(specialization=None, city=None, name=None, q=None, limit=None, offset=0, sort='relevance',
+                     min_price=None, max_price=None, available_by=None):
+        """search() as DoctorCard tuples: the same matches and order, only the columns a result card shows."""
+        query = DoctorRepository._search_query(specialization, city, name, q, (), limit, offset, sort, min_price,
+                                               max_price, available_by)
+        return project(query, DoctorCard)
+
+    @staticmethod
+    def _search_query(specialization, city, name, q, options, limit, offset, sort, min_price, max_price,
+                      available_by):
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"Unknown search sort: {sort}")
+        query = Doctor.query.join(User).join(Clinic).options(*options)
+        if min_price is not None:
+            query = query.filter(Doctor.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Doctor.price <= max_price)
+
+        order = []
+        if sort == 'price':
+            order = [Doctor.price]
+        elif sort == 'price_desc':
+            order = [Doctor.price.desc()]
+        elif sort == 'rating':
+            order = [Doctor.average_rating.desc().nulls_last(), Doctor.rating_count.desc()]
+        if sort == 'next_available' or available_by is not None:
+            next_slot = AvailabilityRepository.next_free_slots_query(dt.date.today()).subquery('next_slot')
+            if available_by is not None:
+                query = query.join(next_slot, next_slot.c.doctor_id == Doctor.doctor_id).filter(
+                    next_slot.c.date <= available_by)
+            else:
+                query = query.outerjoin(next_slot, next_slot.c.doctor_id == Doctor.doctor_id)
+            if sort == 'next_available':
+                order = [next_slot.c.date.nulls_last(), next_slot.c.start_time.nulls_last()]
+
+        if any([specialization, city, name, q]):
+            connection = db_singleton.read_connection()
+            if search_index.is_available(connection):
+                match = search_index.build_match(connection, name=name, specialization=specialization, city=city, q=q)
+                if match is not None:
+                    # The top hits can only be picked inside the FTS table when nothing else filters or reorders them
+                    pushdown = limit and sort == 'relevance' and available_by is None \
+                        and min_price is None and max_price is None
+                    fts = search_index.ranked_matches(match, limit=(offset + limit) if pushdown else None)
+                    query = query.join(fts, fts.c.doctor_id == Doctor.doctor_id)
+                    order.append(fts.c.rank)
+            else:
+                query = DoctorRepository._like_filters(query, specialization, city, name, q)
+        query = query.order_by(*order, Doctor.doctor_id)
+        if offset:
+            query = query.offset(offset)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def search_page(page=1, per_page=DEFAULT_PAGE_SIZE, cards=False, **criteria):
+        """
+        One numbered page of search() results, or of search_cards() with
+        `cards`; reads one extra row to know if another page follows.
+        """
+        page = max(1, page)
+        search = DoctorRepository.search_cards if cards else DoctorRepository.search
+        rows = search(limit=per_page + 1, offset=(page - 1) * per_page, **criteria)
+        return OffsetPage(rows[:per_page], page, len(rows) > per_page)
+
+    @staticmethod
+    def _like_filters(query, specialization, city, name, q):
         if specialization:
             query = query.filter(Doctor.specialization.ilike(f'%{specialization}%'))
         if city:
             query = query.filter(Clinic.city.ilike(f'%{city}%'))
         if name:
             query = query.filter(User.name.ilike(f'%{name}%'))
-        return query.all()
+        if q:
+            # One branch per table, so PostgreSQL can answer each from its trigram indexes (revision 0008)
+            pattern = f'%{q}%'
+            matches = union(
+                select(Doctor.doctor_id).join(User).where(User.name.ilike(pattern)),
+                select(Doctor.doctor_id).where(or_(Doctor.specialization.ilike(pattern), Doctor.bio.ilike(pattern))),
+                select(Doctor.doctor_id).join(Clinic).where(or_(Clinic.name.ilike(pattern), Clinic.city.ilike(pattern))),
+            )
+            query = query.filter(Doctor.doctor_id.in_(matches))
+        return query
     
     @staticmethod
     def get_specializations():
-        return [s[0] for s in Doctor.query.with_entities(Doctor.specialization).distinct()]
+        return [name for name, _ in DoctorRepository.get_specialization_facets()]
+
+    @staticmethod
+    def get_specialization_facets():
+        """[(specialization, doctor count)] sorted by name, served from the facet cache."""
+        def compute():
+            rows = db_singleton.session.query(Doctor.specialization, func.count(Doctor.doctor_id)).group_by(
+                Doctor.specialization
+            ).order_by(Doctor.specialization)
+            return [(name, count) for name, count in rows]
+        return facet_cache.get_or_compute(db_singleton.get_db().engine, 'specializations', (Doctor, Clinic), compute)
 
     @staticmethod
     def count():
         return Doctor.query.count()
 
+    @staticmethod
+    def recompute_ratings():
+        """
+        Re-derive rating_count/rating_sum from the reviews table in one
+        UPDATE; returns how many doctors had drifted.
+        """
+        count = select(func.count(Review.review_id)).where(Review.doctor_id == Doctor.doctor_id).scalar_subquery()
+        total = select(func.coalesce(func.sum(Review.rating), 0)).where(
+            Review.doctor_id == Doctor.doctor_id).scalar_subquery()
+        result = db_singleton.session.execute(
+            update(Doctor)
+            .where(or_(Doctor.rating_count != count, Doctor.rating_sum != total))
+            .values(rating_count=count, rating_sum=total)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
 
 class PatientRepository:
     """Repository for Patient-related database operations"""
@@ -110,7 +440,17 @@ class ClinicRepository:
         return Clinic.query.all()
     @staticmethod
     def get_cities():
-        return [c[0] for c in Clinic.query.with_entities(Clinic.city).distinct()]
+        return [city for city, _ in ClinicRepository.get_city_facets()]
+
+    @staticmethod
+    def get_city_facets():
+        """[(city, doctor count)] for every clinic city, served from the facet cache."""
+        def compute():
+            rows = db_singleton.session.query(Clinic.city, func.count(Doctor.doctor_id)).outerjoin(
+                Doctor, Doctor.clinic_id == Clinic.clinic_id
+            ).group_by(Clinic.city).order_by(Clinic.city)
+            return [(city, count) for city, count in rows]
+        return facet_cache.get_or_compute(db_singleton.get_db().engine, 'cities', (Doctor, Clinic), compute)
 
     @staticmethod
     def create(name, address, city, country, phone):
@@ -123,21 +463,64 @@ class AppointmentRepository:
     """Repository for Appointment-related database operations"""
     
     @staticmethod
-    def get_by_patient(patient_id):
-        return Appointment.query.filter_by(patient_id=patient_id).order_by(Appointment.created_at.desc()).all()
+    def get_by_patient(patient_id, profile=None):
+        return Appointment.query.options(*appointment_load_options(profile)).filter_by(
+            patient_id=patient_id
+        ).order_by(Appointment.created_at.desc()).all()
     
     @staticmethod
-    def get_by_doctor(doctor_id):
-        return Appointment.query.filter_by(doctor_id=doctor_id).order_by(Appointment.datetime).all()
+    def get_by_doctor(doctor_id, profile=None):
+        return Appointment.query.options(*appointment_load_options(profile)).filter_by(
+            doctor_id=doctor_id
+        ).order_by(Appointment.datetime).all()
+
+    @staticmethod
+    def _page(query, cursor, per_page, window):
+        """Page over (datetime, appointment_id); past windows read newest first."""
+        _check_window(window)
+        now = dt.datetime.now()
+        if window == 'upcoming':
+            query = query.filter(Appointment.datetime >= now)
+        elif window == 'past':
+            query = query.filter(Appointment.datetime < now)
+        return keyset_page(query, [Appointment.datetime, Appointment.appointment_id],
+                           cursor=cursor, per_page=per_page, descending=(window == 'past'))
+
+    @staticmethod
+    def page_by_doctor(doctor_id, cursor=None, per_page=DEFAULT_PAGE_SIZE, window='upcoming', profile=None):
+        query = Appointment.query.options(*appointment_load_options(profile)).filter_by(doctor_id=doctor_id)
+        return AppointmentRepository._page(query, cursor, per_page, window)
+
+    @staticmethod
+    def page_by_patient(patient_id, cursor=None, per_page=DEFAULT_PAGE_SIZE, window='upcoming', profile=None):
+        query = Appointment.query.options(*appointment_load_options(profile)).filter_by(patient_id=patient_id)
+        return AppointmentRepository._page(query, cursor, per_page, window)
+
+    @staticmethod
+    def page_rows_by_patient(patient_id, cursor=None, per_page=DEFAULT_PAGE_SIZE, window='upcoming'):
+        """page_by_patient() as PatientAppointmentRow tuples for the patient dashboard."""
+        query = Appointment.query.join(Appointment.doctor).join(Doctor.user).join(Doctor.clinic).filter(
+            Appointment.patient_id == patient_id
+        ).with_entities(*PatientAppointmentRow.columns)
+        return project_page(AppointmentRepository._page(query, cursor, per_page, window), PatientAppointmentRow)
+
+    @staticmethod
+    def page_rows_by_doctor(doctor_id, cursor=None, per_page=DEFAULT_PAGE_SIZE, window='upcoming'):
+        """page_by_doctor() as DoctorAppointmentRow tuples for the doctor dashboard."""
+        query = Appointment.query.join(Appointment.patient).join(Patient.user).filter(
+            Appointment.doctor_id == doctor_id
+        ).with_entities(*DoctorAppointmentRow.columns)
+        return project_page(AppointmentRepository._page(query, cursor, per_page, window), DoctorAppointmentRow)
 
     @staticmethod
     def get_by_id(appointment_id):
         return Appointment.query.get(appointment_id)
 
     @staticmethod
-    def create(patient_id, doctor_id, datetime, status='confirmed', payment_method='at_clinic'):
+    def create(patient_id, doctor_id, datetime, status='confirmed', payment_method='at_clinic', availability_id=None):
         """Factory method to create and persist a new Appointment."""
-        appointment = Appointment(patient_id=patient_id, doctor_id=doctor_id, datetime=datetime, status=status, payment_method=payment_method)
+        appointment = Appointment(patient_id=patient_id, doctor_id=doctor_id, datetime=datetime, status=status,
+                                  payment_method=payment_method, availability_id=availability_id)
         db_singleton.session.add(appointment)
         return appointment
 
@@ -155,10 +538,63 @@ class AvailabilityRepository:
             DoctorAvailability.date >= from_date
         ).order_by(DoctorAvailability.date, DoctorAvailability.start_time).all()
 
+    @staticmethod
+    def page_available_slots(doctor_id, from_date, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+        query = DoctorAvailability.query.filter_by(doctor_id=doctor_id, is_booked=False).filter(
+            DoctorAvailability.date >= from_date
+        )
+        return keyset_page(query, AvailabilityRepository._key(), cursor=cursor, per_page=per_page)
+
+    @staticmethod
+    def next_free_slots_query(from_date, doctor_ids=None):
+        """
+        (doctor_id, date, start_time) of each doctor's earliest free slot from
+        `from_date`, as two grouped aggregates the (doctor_id, is_booked, date,
+        start_time) index answers without touching the table.
+        """
+        free = [DoctorAvailability.is_booked == False, DoctorAvailability.date >= from_date]
+        if doctor_ids is not None:
+            free.append(DoctorAvailability.doctor_id.in_(doctor_ids))
+        first_day = select(DoctorAvailability.doctor_id, func.min(DoctorAvailability.date).label('date')).where(
+            *free
+        ).group_by(DoctorAvailability.doctor_id).subquery()
+        return select(
+            DoctorAvailability.doctor_id, DoctorAvailability.date,
+            func.min(DoctorAvailability.start_time).label('start_time')
+        ).join(first_day, and_(first_day.c.doctor_id == DoctorAvailability.doctor_id,
+                               first_day.c.date == DoctorAvailability.date)).where(
+            DoctorAvailability.is_booked == False
+        ).group_by(DoctorAvailability.doctor_id, DoctorAvailability.date)
+
+    @staticmethod
+    def get_next_free_slots(doctor_ids, from_date):
+        """{doctor_id: datetime of the earliest free slot} for the given doctors, in one query."""
+        if not doctor_ids:
+            return {}
+        rows = db_singleton.session.execute(AvailabilityRepository.next_free_slots_query(from_date, doctor_ids))
+        return {doctor_id: dt.datetime.combine(day, start) for doctor_id, day, start in rows}
+
     @staticmethod
     def get_by_doctor(doctor_id):
         return DoctorAvailability.query.filter_by(doctor_id=doctor_id).order_by(DoctorAvailability.date, DoctorAvailability.start_time).all()
 
+    @staticmethod
+    def page_by_doctor(doctor_id, cursor=None, per_page=DEFAULT_PAGE_SIZE, window='upcoming'):
+        """Page over (date, start_time, availability_id); past windows read newest first."""
+        _check_window(window)
+        query = DoctorAvailability.query.filter_by(doctor_id=doctor_id)
+        today = dt.date.today()
+        if window == 'upcoming':
+            query = query.filter(DoctorAvailability.date >= today)
+        elif window == 'past':
+            query = query.filter(DoctorAvailability.date < today)
+        return keyset_page(query, AvailabilityRepository._key(), cursor=cursor, per_page=per_page,
+                           descending=(window == 'past'))
+
+    @staticmethod
+    def _key():
+        return [DoctorAvailability.date, DoctorAvailability.start_time, DoctorAvailability.availability_id]
+
     @staticmethod
     def get_by_id(availability_id):
         return DoctorAvailability.query.get(availability_id)
@@ -180,6 +616,51 @@ class AvailabilityRepository:
         db_singleton.session.add(availability)
         return availability
 
+    @staticmethod
+    def get_in_range(doctor_id, first_date, last_date):
+        """(date, start_time, end_time) of every slot a doctor has between two dates, in one query."""
+        return DoctorAvailability.query.with_entities(
+            DoctorAvailability.date, DoctorAvailability.start_time, DoctorAvailability.end_time
+        ).filter(
+            DoctorAvailability.doctor_id == doctor_id,
+            DoctorAvailability.date.between(first_date, last_date)
+        ).all()
+
+    @staticmethod
+    def bulk_create(doctor_id, slots):
+        """Insert (date, start_time, end_time) slots with one executemany; no ORM objects are built."""
+        if slots:
+            db_singleton.session.execute(insert(DoctorAvailability), [
+                {'doctor_id': doctor_id, 'date': day, 'start_time': start, 'end_time': end, 'is_booked': False}
+                for day, start, end in slots
+            ])
+        return len(slots)
+
+    @staticmethod
+    def claim(availability_id):
+        """
+        Atomically mark a free slot as booked (compare-and-set).
+        Returns False if another transaction booked it first; the row lock
+        taken by the UPDATE serializes concurrent claims on the same slot only.
+        """
+        result = db_singleton.session.execute(
+            update(DoctorAvailability)
+            .where(DoctorAvailability.availability_id == availability_id, DoctorAvailability.is_booked == False)
+            .values(is_booked=True)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def release(availability_id):
+        """Mark a slot as free again by primary key, without loading it."""
+        db_singleton.session.execute(
+            update(DoctorAvailability)
+            .where(DoctorAvailability.availability_id == availability_id)
+            .values(is_booked=False)
+            .execution_options(synchronize_session=False)
+        )
+
     @staticmethod
     def delete(availability):
         db_singleton.session.delete(availability)
@@ -190,10 +671,112 @@ class ReviewRepository:
     
     @staticmethod
     def get_by_doctor(doctor_id):
-        return Review.query.filter_by(doctor_id=doctor_id).order_by(Review.created_at.desc()).all()
+        return Review.query.options(joinedload(Review.patient).joinedload(Patient.user)).filter_by(
+            doctor_id=doctor_id
+        ).order_by(Review.created_at.desc()).all()
+
+    @staticmethod
+    def page_by_doctor(doctor_id, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+        """Newest reviews first, paged over (created_at, review_id)."""
+        query = Review.query.options(joinedload(Review.patient).joinedload(Patient.user)).filter_by(doctor_id=doctor_id)
+        return keyset_page(query, [Review.created_at, Review.review_id], cursor=cursor, per_page=per_page,
+                           descending=True)
 
     @staticmethod
     def create(patient_id, doctor_id, appointment_id, rating, feedback):
+        """
+        Add a review and fold it into the doctor's rating aggregates in the
+        same transaction. The increment happens in SQL, so concurrent reviews
+        cannot overwrite each other's counts.
+        """
         review = Review(patient_id=patient_id, doctor_id=doctor_id, appointment_id=appointment_id, rating=rating, feedback=feedback)
         db_singleton.session.add(review)
+        db_singleton.session.execute(
+            update(Doctor)
+            .where(Doctor.doctor_id == doctor_id)
+            .values(rating_count=Doctor.rating_count + 1, rating_sum=Doctor.rating_sum + rating)
+            .execution_options(synchronize_session=False)
+        )
         return review
+
+
+class StatsRepository:
+    """Aggregates behind the admin statistics, and the snapshots they are stored in"""
+
+    @staticmethod
+    def totals():
+        """Every headline counter in one SELECT (one scalar subquery each) as a dict."""
+        def count(column, *where):
+            return select(func.count(column)).where(*where).scalar_subquery()
+        row = db_singleton.session.execute(select(
+            count(Patient.patient_id).label('patients'),
+            count(Doctor.doctor_id).label('doctors'),
+            select(func.count(Doctor.doctor_id)).join(User, User.user_id == Doctor.user_id).where(
+                User.verified == False).scalar_subquery().label('unverified_doctors'),
+            count(Appointment.appointment_id).label('appointments'),
+            count(Appointment.appointment_id, Appointment.status == 'cancelled').label('cancelled'),
+            count(Review.review_id).label('reviews'),
+        )).one()
+        return dict(row._mapping)
+
+    @staticmethod
+    def appointments_per_day(since, until):
+        """[(day as 'YYYY-MM-DD', status, count)] for appointments dated in [since, until), by day."""
+        day = func.date(Appointment.datetime)
+        rows = db_singleton.session.execute(
+            select(day, Appointment.status, func.count(Appointment.appointment_id))
+            .where(Appointment.datetime >= since, Appointment.datetime < until)
+            .group_by(day, Appointment.status)
+            .order_by(day, Appointment.status)
+        )
+        return [(str(d), status, n) for d, status, n in rows]
+
+    @staticmethod
+    def top_specializations(since, until, limit=5):
+        """[(specialization, appointments)] with the most non-cancelled appointments in [since, until)."""
+        total = func.count(Appointment.appointment_id)
+        rows = db_singleton.session.execute(
+            select(Doctor.specialization, total)
+            .join(Appointment, Appointment.doctor_id == Doctor.doctor_id)
+            .where(Appointment.datetime >= since, Appointment.datetime < until, Appointment.status != 'cancelled')
+            .group_by(Doctor.specialization)
+            .order_by(total.desc(), Doctor.specialization)
+            .limit(limit)
+        )
+        return [tuple(row) for row in rows]
+
+    @staticmethod
+    def busiest_clinics(since, until, limit=5):
+        """[(clinic name, city, appointments)] with the most non-cancelled appointments in [since, until)."""
+        total = func.count(Appointment.appointment_id)
+        rows = db_singleton.session.execute(
+            select(Clinic.name, Clinic.city, total)
+            .join(Doctor, Doctor.clinic_id == Clinic.clinic_id)
+            .join(Appointment, Appointment.doctor_id == Doctor.doctor_id)
+            .where(Appointment.datetime >= since, Appointment.datetime < until, Appointment.status != 'cancelled')
+            .group_by(Clinic.clinic_id, Clinic.name, Clinic.city)
+            .order_by(total.desc(), Clinic.name)
+            .limit(limit)
+        )
+        return [tuple(row) for row in rows]
+
+    @staticmethod
+    def latest_snapshot():
+        return StatsSnapshot.query.order_by(StatsSnapshot.taken_at.desc(), StatsSnapshot.snapshot_id.desc()).first()
+
+    @staticmethod
+    def add_snapshot(taken_at, data, keep=24):
+        """Store a snapshot and drop all but the newest `keep`."""
+        snapshot = StatsSnapshot(taken_at=taken_at, data=data)
+        db_singleton.session.add(snapshot)
+        db_singleton.session.flush()
+        # Two statements: MySQL cannot DELETE with a LIMIT subquery on the same table
+        oldest_kept = db_singleton.session.execute(
+            select(StatsSnapshot.taken_at).order_by(StatsSnapshot.taken_at.desc()).offset(keep - 1).limit(1)
+        ).scalar()
+        if oldest_kept is not None:
+            db_singleton.session.execute(
+                delete(StatsSnapshot).where(StatsSnapshot.taken_at < oldest_kept)
+                .execution_options(synchronize_session=False)
+            )
+        return snapshot
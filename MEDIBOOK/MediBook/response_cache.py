@@ -0,0 +1,135 @@
+"""
+Chat Response Cache
+Answers repeated chat questions without calling the LLM. Questions are
+normalized (case, punctuation, spacing) for exact hits; near-duplicates
+("Back pain!" vs "back pains") are found by character-trigram Jaccard
+similarity through an inverted index. Entries expire after a TTL
+and the least recently used ones are evicted first. Keys are scoped by
+model, system prompt and generation settings, so changing any of them
+never serves an answer produced under the old ones.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from flask import current_app
+
+from metrics import registry
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def trigrams(normalized):
+    padded = f'  {normalized} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def namespace(model, system_prompt, params=None):
+    """Stable id for everything besides the question that shapes an answer."""
+    raw = json.dumps([model, system_prompt, params or {}], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL + LRU cache of answers. `similarity` is the trigram
+    Jaccard score a near-duplicate needs to count as a hit (0 disables it).
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, similarity=0.85, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()       # (namespace, normalized) -> (expires_at, grams, answer)
+        self._index = defaultdict(set)      # (namespace, trigram) -> {keys}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, scope, question):
+        key = (scope, normalize(question))
+        if not key[1]:
+            return None
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                registry.inc('chat.cache.hits')
+                return entry[2]
+            if entry:
+                self._remove(key)
+            answer = self._similar(key, now) if self.similarity else None
+        registry.inc('chat.cache.similar_hits' if answer is not None else 'chat.cache.misses')
+        return answer
+
+    def put(self, scope, question, answer):
+        key = (scope, normalize(question))
+        if not key[1] or not answer:
+            return
+        grams = trigrams(key[1])
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl, grams, answer)
+            for gram in grams:
+                self._index[(scope, gram)].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                registry.inc('chat.cache.evictions')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def _remove(self, key):
+        _, grams, _ = self._entries.pop(key)
+        for gram in grams:
+            keys = self._index.get((key[0], gram))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(key[0], gram)]
+
+    def _similar(self, key, now):
+        """Best live entry whose trigram Jaccard similarity reaches the threshold."""
+        grams = trigrams(key[1])
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self._index.get((key[0], gram), ()))
+        best, best_score = None, self.similarity
+        for candidate, shared in overlap.items():
+            expires_at, other, _ = self._entries[candidate]
+            if expires_at <= now:
+                continue
+            score = shared / (len(grams) + len(other) - shared)
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        return self._entries[best][2]
+
+
+def init_app(app):
+    config = app.config
+    app.extensions['chat_cache'] = ResponseCache(
+        max_entries=config['CHAT_CACHE_SIZE'],
+        ttl=config['CHAT_CACHE_TTL'],
+        similarity=config['CHAT_CACHE_SIMILARITY'],
+    )
+
+
+def get_cache():
+    return current_app.extensions['chat_cache']
@@ -11,5 +11,10 @@ if exist instance\medibook.db (
     echo No database file found.
 )
 
+echo Creating schema and demo data...
+set FLASK_APP=app.py
+python -m flask init-db
+python -m flask seed
+
 echo Starting Flask server...
 python app.py
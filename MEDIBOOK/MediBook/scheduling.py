@@ -0,0 +1,115 @@
+"""
+Recurring Availability
+Expands a weekly schedule (weekdays, daily time window, slot length and
+breaks over a date range) into concrete slots, and drops the ones that
+overlap slots a doctor already has. Doctors publish months of slots in a
+single request instead of one POST per slot.
+"""
+
+import datetime as dt
+from collections import defaultdict
+
+# Upper bound on slots generated by one schedule (about a year of
+# 30 minute slots, seven days a week)
+MAX_SLOTS = 20_000
+# Longest date range one schedule may cover, in days
+MAX_DAYS = 366
+
+# Checkbox labels on the dashboard's schedule form, indexed like date.weekday()
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minutes):
+    return dt.time(minutes // 60, minutes % 60)
+
+
+def parse_breaks(value):
+    """
+    Parse "12:00-13:00, 15:30-15:45" into [(time, time), ...].
+    Raises ValueError on malformed input or an empty/reversed range.
+    """
+    breaks = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition('-')
+        if not sep:
+            raise ValueError(f"Break '{part}' must look like HH:MM-HH:MM")
+        start = dt.datetime.strptime(start.strip(), '%H:%M').time()
+        end = dt.datetime.strptime(end.strip(), '%H:%M').time()
+        if start >= end:
+            raise ValueError(f"Break '{part}' ends before it starts")
+        breaks.append((start, end))
+    return breaks
+
+
+def check_range(start_date, end_date):
+    """Raise ValueError unless start_date..end_date is a forward range of at most MAX_DAYS days."""
+    if end_date < start_date:
+        raise ValueError('The end date is before the start date.')
+    if (end_date - start_date).days >= MAX_DAYS:
+        raise ValueError(f'A schedule may cover at most {MAX_DAYS} days.')
+
+
+def expand(start_date, end_date, weekdays, start_time, end_time, slot_minutes, breaks=()):
+    """
+    Return the (date, start_time, end_time) slots of a weekly schedule, in
+    calendar order. `weekdays` uses date.weekday() numbering (Monday = 0).
+    A slot that would run into a break starts again when the break ends.
+    """
+    check_range(start_date, end_date)
+    if start_time >= end_time:
+        raise ValueError('End time must be after start time.')
+    if slot_minutes <= 0:
+        raise ValueError('Slot length must be positive.')
+    weekdays = set(weekdays)
+    if not weekdays or not weekdays <= set(range(7)):
+        raise ValueError('Pick at least one weekday.')
+
+    # The same day template is reused for every matching date
+    pauses = sorted((_minutes(s), _minutes(e)) for s, e in breaks)
+    day, close = [], _minutes(end_time)
+    minute = _minutes(start_time)
+    while minute + slot_minutes <= close:
+        end = minute + slot_minutes
+        overlap = next((e for s, e in pauses if s < end and minute < e), None)
+        if overlap is not None:
+            minute = overlap
+            continue
+        day.append((_time(minute), _time(end)))
+        minute = end
+    if not day:
+        raise ValueError('No slot fits between the start and end time outside the breaks.')
+
+    slots = []
+    current = start_date
+    while current <= end_date:
+        if current.weekday() in weekdays:
+            slots.extend((current, start, end) for start, end in day)
+            if len(slots) > MAX_SLOTS:
+                raise ValueError(f'A schedule may generate at most {MAX_SLOTS:,} slots.')
+        current += dt.timedelta(days=1)
+    return slots
+
+
+def without_conflicts(slots, existing):
+    """
+    Split generated slots into (free, conflicting) against `existing`
+    (date, start_time, end_time) rows; touching slots do not conflict.
+    """
+    taken = defaultdict(list)
+    for day, start, end in existing:
+        taken[day].append((start, end))
+    free, conflicting = [], []
+    for slot in slots:
+        day, start, end = slot
+        if any(s < end and start < e for s, e in taken.get(day, ())):
+            conflicting.append(slot)
+        else:
+            free.append(slot)
+    return free, conflicting
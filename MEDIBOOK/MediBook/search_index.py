@@ -0,0 +1,219 @@
+"""
+Full-Text Search Index for Doctors
+Mirrors doctor name, specialization, bio, clinic name and city into an
+SQLite FTS5 table that DoctorRepository.search ranks with bm25().
+The index is refreshed inside the ORM flush that writes a Doctor, User or
+Clinic row, so it commits or rolls back together with that write.
+
+FTS5 exists only on SQLite. Elsewhere DoctorRepository.search falls back
+to ILIKE '%...%' filters: PostgreSQL serves them from the pg_trgm GIN
+indexes of migration 0008, MySQL has no equivalent index here (FULLTEXT
+cannot answer substring matches) and still scans.
+"""
+
+import bisect
+import difflib
+import itertools
+import re
+import time
+import weakref
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import db
+from models.user_model import User, Doctor
+from models.appointment_model import Clinic
+
+FTS_TABLE = 'doctor_search'
+VOCAB_TABLE = 'doctor_search_vocab'
+
+# bm25() weights in column order: a hit in the name outranks one in the bio
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 3.0, 3.0)
+
+# Tokens shorter than this are only prefix-matched, never typo-corrected
+MIN_FUZZY_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, specialization, bio, clinic_name, city, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, 'row')",
+)
+
+_SOURCE_SQL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, specialization, bio, clinic_name, city) "
+    "SELECT d.doctor_id, u.name, d.specialization, COALESCE(d.bio, ''), c.name, c.city "
+    "FROM doctors d JOIN users u ON u.user_id = d.user_id JOIN clinics c ON c.clinic_id = d.clinic_id"
+)
+
+_AFFECTED = ("d.doctor_id IN :doctor_ids OR d.user_id IN :user_ids OR d.clinic_id IN :clinic_ids")
+
+_REFRESH_DELETE = text(
+    f"DELETE FROM {FTS_TABLE} WHERE rowid IN :doctor_ids OR rowid IN "
+    f"(SELECT d.doctor_id FROM doctors d WHERE {_AFFECTED})"
+).bindparams(*(bindparam(n, expanding=True) for n in ('doctor_ids', 'user_ids', 'clinic_ids')))
+
+_REFRESH_INSERT = text(f"{_SOURCE_SQL} WHERE {_AFFECTED}").bindparams(
+    *(bindparam(n, expanding=True) for n in ('doctor_ids', 'user_ids', 'clinic_ids'))
+)
+
+_VOCABULARY = text(f"SELECT term FROM {VOCAB_TABLE} ORDER BY term")
+
+# engine -> whether the FTS table exists on it. A missing table is not
+# remembered (a migration or `flask rebuild-search-index` may create it
+# later), so until then every search asks sqlite_master again.
+_available = weakref.WeakKeyDictionary()
+
+# engine -> (loaded_at, sorted index terms). Reading fts5vocab walks every
+# doclist, so the term list is cached and reloaded after VOCABULARY_TTL
+# seconds. A stale list can only add or miss typo corrections: the literal
+# prefix is always part of the query.
+_vocabularies = weakref.WeakKeyDictionary()
+VOCABULARY_TTL = 300
+
+
+def is_available(connection):
+    """True when the connection is SQLite and the FTS table has been created."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    engine = connection.engine
+    if engine not in _available:
+        found = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': FTS_TABLE}
+        ).first()
+        if found is None:
+            return False
+        _available[engine] = True
+    return _available[engine]
+
+
+def create_index(connection):
+    """Create the FTS tables (if missing) and fill them from the current rows."""
+    try:
+        for statement in _CREATE_SQL:
+            connection.execute(text(statement))
+    except OperationalError:
+        # SQLite build without FTS5: search keeps using LIKE filters
+        _available[connection.engine] = False
+        return
+    rebuild(connection)
+    _available[connection.engine] = True
+
+
+def drop_index(connection):
+    connection.execute(text(f"DROP TABLE IF EXISTS {VOCAB_TABLE}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    _available.pop(connection.engine, None)
+    _vocabularies.pop(connection.engine, None)
+
+
+def rebuild(connection):
+    """Re-derive every index row from doctors/users/clinics."""
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    connection.execute(text(_SOURCE_SQL))
+    _vocabularies.pop(connection.engine, None)
+
+
+def refresh(connection, doctor_ids=(), user_ids=(), clinic_ids=()):
+    """Re-index the doctors touched by a write, in two set-based statements."""
+    params = {'doctor_ids': list(doctor_ids), 'user_ids': list(user_ids), 'clinic_ids': list(clinic_ids)}
+    connection.execute(_REFRESH_DELETE, params)
+    connection.execute(_REFRESH_INSERT, params)
+
+
+def tokenize(value):
+    return [t.lower() for t in _TOKEN_RE.findall(value or '')]
+
+
+def _vocabulary(connection):
+    cached = _vocabularies.get(connection.engine)
+    if cached is None or time.monotonic() - cached[0] > VOCABULARY_TTL:
+        cached = (time.monotonic(), [row[0] for row in connection.execute(_VOCABULARY)])
+        _vocabularies[connection.engine] = cached
+    return cached[1]
+
+
+def _expand(connection, token):
+    """
+    Prefix-match a token; if the index holds no term with that prefix, OR in
+    the closest vocabulary terms as well (typo tolerance). Candidates share
+    the first letter and are within two characters of the token's length.
+    """
+    prefix = f'"{token}"*'
+    terms = _vocabulary(connection)
+    i = bisect.bisect_left(terms, token)
+    if (i < len(terms) and terms[i].startswith(token)) or len(token) < MIN_FUZZY_LENGTH:
+        return prefix
+    lo = bisect.bisect_left(terms, token[0])
+    hi = bisect.bisect_left(terms, token[0] + '\uffff')
+    candidates = [t for t in terms[lo:hi] if abs(len(t) - len(token)) <= 2]
+    close = difflib.get_close_matches(token, candidates, n=3, cutoff=FUZZY_CUTOFF)
+    if not close:
+        return prefix
+    return '(' + ' OR '.join([prefix] + [f'"{term}"' for term in close]) + ')'
+
+
+def build_match(connection, name=None, specialization=None, city=None, q=None):
+    """
+    Translate search fields into an FTS5 MATCH expression; field values are
+    reduced to word tokens, so user input can never inject query syntax.
+    Returns None when no field contains a searchable token.
+    """
+    clauses = []
+    for column, value in (('name', name), ('specialization', specialization), ('city', city)):
+        terms = [_expand(connection, t) for t in tokenize(value)]
+        if terms:
+            clauses.append(f"{column} : ({' AND '.join(terms)})")
+    clauses.extend(_expand(connection, t) for t in tokenize(q))
+    return ' AND '.join(clauses) or None
+
+
+def ranked_matches(match, limit=None):
+    """
+    Subquery of (doctor_id, rank) for a MATCH expression; lower rank is better.
+    With `limit` the top hits are picked inside the FTS table, so only that
+    many rows reach the joins with doctors, users and clinics; bm25() is
+    still scored for every hit, which is what keeps broad queries in
+    relevance order.
+    """
+    rank = f"bm25({FTS_TABLE}, {', '.join(str(w) for w in COLUMN_WEIGHTS)})"
+    sql = f"SELECT rowid AS doctor_id, {rank} AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    params = {'match': match}
+    if limit:
+        sql += " ORDER BY rank, rowid LIMIT :limit"
+        params['limit'] = limit
+    return text(sql).bindparams(**params).columns(doctor_id=db.Integer, rank=db.Float).subquery('fts')
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_with_schema(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_with_schema(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_index(connection)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_after_flush(session, flush_context):
+    doctor_ids, user_ids, clinic_ids = set(), set(), set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Doctor):
+            doctor_ids.add(obj.doctor_id)
+        elif isinstance(obj, User):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, Clinic):
+            clinic_ids.add(obj.clinic_id)
+    if not (doctor_ids or user_ids or clinic_ids):
+        return
+    connection = session.connection()
+    if is_available(connection):
+        refresh(connection, doctor_ids, user_ids, clinic_ids)
@@ -0,0 +1,93 @@
+"""
+Admin Statistics
+The admin dashboard's numbers come from a snapshot. refresh() runs the
+aggregates: the headline totals in one SELECT, then appointments per day
+and status, the cancellation rate, top specializations and busiest
+clinics over the last STATS_WINDOW_DAYS days. The result is stored as one
+JSON row in stats_snapshots, so showing the dashboard is a single indexed
+read of the newest row however large the appointments table grows.
+
+current() never recomputes an existing snapshot, however old: a page
+load must not run the aggregates, and concurrent loads must not each add
+a snapshot. It marks one older than STATS_MAX_AGE seconds as stale, and
+only computes inline when there is no snapshot at all.
+`flask refresh-stats` run from cron keeps it fresh; the dashboard also
+has a button to refresh on demand.
+"""
+
+import datetime as dt
+import json
+
+from flask import current_app
+
+from database_singleton import db_singleton
+from models.appointment_model import Appointment
+from repositories import StatsRepository
+
+# Snapshots kept in the table; older ones are deleted on refresh
+KEEP_SNAPSHOTS = 24
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def compute(window_days=30, today=None):
+    """All dashboard statistics as a JSON-serialisable dict."""
+    today = today or dt.date.today()
+    first_day = today - dt.timedelta(days=window_days - 1)
+    since = dt.datetime.combine(first_day, dt.time.min)
+    until = dt.datetime.combine(today + dt.timedelta(days=1), dt.time.min)
+
+    totals = StatsRepository.totals()
+    statuses = Appointment.status.type.enums
+    per_day = {(first_day + dt.timedelta(days=n)).isoformat(): dict.fromkeys(statuses, 0)
+               for n in range(window_days)}
+    for day, status, count in StatsRepository.appointments_per_day(since, until):
+        per_day[day][status] = count
+    in_window = sum(sum(counts.values()) for counts in per_day.values())
+    cancelled_in_window = sum(counts['cancelled'] for counts in per_day.values())
+    return {
+        'totals': totals,
+        'cancellation_rate': _rate(totals['cancelled'], totals['appointments']),
+        'window': {
+            'days': window_days,
+            'since': first_day.isoformat(),
+            'until': today.isoformat(),
+            'appointments': in_window,
+            'cancellation_rate': _rate(cancelled_in_window, in_window),
+        },
+        'per_day': [{'day': day, **counts} for day, counts in per_day.items()],
+        'top_specializations': [list(row) for row in StatsRepository.top_specializations(since, until)],
+        'busiest_clinics': [list(row) for row in StatsRepository.busiest_clinics(since, until)],
+    }
+
+
+def _load(snapshot, max_age):
+    stats = json.loads(snapshot.data)
+    stats['taken_at'] = snapshot.taken_at
+    stats['stale'] = (dt.datetime.now() - snapshot.taken_at).total_seconds() > max_age
+    return stats
+
+
+def refresh():
+    """Recompute the statistics, store them as the newest snapshot and commit; returns them."""
+    taken_at = dt.datetime.now()
+    data = json.dumps(compute(window_days=current_app.config['STATS_WINDOW_DAYS']))
+    snapshot = StatsRepository.add_snapshot(taken_at, data, keep=KEEP_SNAPSHOTS)
+    db_singleton.session.commit()
+    return _load(snapshot, current_app.config['STATS_MAX_AGE'])
+
+
+def current(max_age=None):
+    """
+    The newest snapshot's statistics with its `taken_at`, and `stale` when
+    it is older than `max_age` seconds (STATS_MAX_AGE). Computed inline
+    only when no snapshot exists yet.
+    """
+    if max_age is None:
+        max_age = current_app.config['STATS_MAX_AGE']
+    snapshot = StatsRepository.latest_snapshot()
+    if snapshot is None:
+        return refresh()
+    return _load(snapshot, max_age)
@@ -5,8 +5,10 @@ And Architectural Patterns (Singleton, Repository)
 """
 import sys
 import os
+import threading
+import time
 import pytest
-from datetime import date
+from datetime import date, datetime, timedelta, time as time_of_day
 
 # Ensure the parent directory (MediBook) is in the path so we can import app
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -14,10 +16,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app import create_app, db
 from config import Config
 from models.user_model import User, Doctor, Patient
-from models.appointment_model import Clinic, DoctorAvailability, Review
-from repositories import UserRepository, DoctorRepository, ClinicRepository, AvailabilityRepository, ReviewRepository
+from models.appointment_model import Clinic, Appointment, DoctorAvailability, Review
+from models.stats_model import StatsSnapshot
+from repositories import UserRepository, DoctorRepository, ClinicRepository, AvailabilityRepository, ReviewRepository, AppointmentRepository, StatsRepository
 from database_singleton import DatabaseSingleton, db_singleton
+import scheduling
+import search_index
+import stats_service
 from werkzeug.security import generate_password_hash
+from sqlalchemy import event, select, text, update
 
 @pytest.fixture
 def app():
@@ -38,6 +45,50 @@ def app():
         db.session.remove()
         db.drop_all()
 
+@pytest.fixture
+def query_counter(app):
+    """Collect every SQL statement the engine executes while the test runs."""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', _record)
+
+def _seed_doctors(count, start=0, city="Cairo", specialization="Cardio"):
+    """Insert `count` verified doctors, each with its own user and clinic."""
+    for i in range(start, start + count):
+        clinic = Clinic(name=f"Clinic {i}", address=f"{i} Nile St", city=city, country="Egypt", phone=f"0100{i}")
+        user = User(name=f"Dr. {i}", email=f"doc{i}@test.com", password_hash="pass", role="doctor", verified=True)
+        db.session.add_all([clinic, user])
+        db.session.flush()
+        db.session.add(Doctor(user_id=user.user_id, clinic_id=clinic.clinic_id,
+                              specialization=specialization, bio="B", price=100 + i))
+    db.session.commit()
+
+def _seed_appointments(doctor, count, start=0, base=datetime(2030, 1, 1, 9, 0)):
+    """Give `doctor` `count` confirmed appointments, each with its own patient."""
+    for i in range(start, start + count):
+        user = User(name=f"Patient {i}", email=f"pat{i}@test.com", password_hash="pass", role="patient")
+        db.session.add(user)
+        db.session.flush()
+        patient = Patient(user_id=user.user_id, dob=date(1990, 1, 1), phone=f"0120{i}", medical_history=f"History {i}")
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Appointment(patient_id=patient.patient_id, doctor_id=doctor.doctor_id,
+                                   datetime=base + timedelta(hours=i), status='confirmed',
+                                   payment_method='at_clinic'))
+    db.session.commit()
+
+def _login_as(client, user, role):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.user_id
+        sess['role'] = role
+        sess['name'] = user.name
+
 @pytest.fixture
 def client(app):
     """Test client."""
@@ -200,3 +251,1361 @@ def test_chat_medical_fallback(client):
     response = client.post('/chat/message', json={'message': 'headache'}, content_type='application/json')
     data = response.get_json()
     assert 'Acetaminophen' in data['response'] or 'quiet, dark room' in data['response']
+
+# ============================================
+# QUERY PROFILE TESTS (N+1 guards)
+# ============================================
+
+def test_load_profiles_work_as_the_first_orm_call(tmp_path):
+    """search(profile=...) in a fresh process, before any query has configured the mappers."""
+    import subprocess
+    script = (
+        "from app import create_app, db\n"
+        "from config import Config\n"
+        "from repositories import DoctorRepository\n"
+        "class C(Config):\n"
+        "    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'\n"
+        "    REQUEST_LOG = False\n"
+        "with create_app(C).app_context():\n"
+        "    db.create_all()\n"
+        "    print(DoctorRepository.search(profile='search', q='cardio'))\n"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '[]'
+
+def test_search_profile_hydrates_user_and_clinic(app, query_counter):
+    """DoctorRepository.search loads user and clinic in the same round trip."""
+    with app.app_context():
+        _seed_doctors(5)
+        db.session.expunge_all()
+
+        doctors = DoctorRepository.search(city="Cairo")
+        query_counter.clear()
+        names = [(d.user.name, d.clinic.city) for d in doctors]
+
+        assert len(names) == 5
+        assert query_counter == []
+
+def test_home_page_query_count_is_constant(app, client, query_counter):
+    """The home page issues the same number of statements for 2 or 12 doctors."""
+    with app.app_context():
+        _seed_doctors(2)
+        query_counter.clear()
+        client.get('/')
+        few = len(query_counter)
+
+        _seed_doctors(10, start=2)
+        query_counter.clear()
+        response = client.get('/')
+        assert response.status_code == 200
+        assert b"Dr. 11" in response.data
+        assert len(query_counter) == few
+
+def test_unknown_load_profile_rejected(app):
+    """Asking for an undefined loading profile is a programming error."""
+    with app.app_context():
+        with pytest.raises(ValueError):
+            DoctorRepository.search(profile='nope')
+
+def test_doctor_dashboard_query_count_is_constant(app, client, query_counter):
+    """The doctor dashboard does not issue a query per appointment."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _login_as(client, doctor.user, 'doctor')
+        _seed_appointments(doctor, 2)
+        query_counter.clear()
+        client.get('/booking/dashboard')
+        few = len(query_counter)
+
+        _seed_appointments(doctor, 10, start=2)
+        query_counter.clear()
+        response = client.get('/booking/dashboard')
+        assert response.status_code == 200
+        assert b"History 11" in response.data
+        assert len(query_counter) == few
+
+def test_patient_dashboard_hydrates_doctor_and_clinic(app, query_counter):
+    """get_by_patient with the dashboard profile is a single SELECT."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _seed_appointments(doctor, 1)
+        patient = Patient.query.first()
+        db.session.expunge_all()
+        query_counter.clear()
+
+        appointments = AppointmentRepository.get_by_patient(patient.patient_id, profile='patient_dashboard')
+        assert [(a.doctor.user.name, a.doctor.clinic.name) for a in appointments] == [("Dr. 0", "Clinic 0")]
+        assert len(query_counter) == 1
+
+# ============================================
+# KEYSET PAGINATION TESTS
+# ============================================
+
+def test_appointment_keyset_pages_cover_everything_once(app):
+    """Walking next_cursor visits every upcoming appointment once, in order."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _seed_appointments(doctor, 12)
+
+        seen, cursor = [], None
+        while True:
+            page = AppointmentRepository.page_by_doctor(doctor.doctor_id, cursor=cursor, per_page=5)
+            seen.extend(a.appointment_id for a in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        expected = [a.appointment_id for a in AppointmentRepository.get_by_doctor(doctor.doctor_id)]
+        assert seen == expected
+        assert len(seen) == 12
+
+def test_appointment_windows_split_past_and_upcoming(app):
+    """'past' lists history newest first and 'upcoming' only future visits."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _seed_appointments(doctor, 3, base=datetime(2020, 1, 1, 9, 0))
+        _seed_appointments(doctor, 2, start=3)
+
+        past = AppointmentRepository.page_by_doctor(doctor.doctor_id, window='past')
+        upcoming = AppointmentRepository.page_by_doctor(doctor.doctor_id, window='upcoming')
+
+        assert [a.datetime.year for a in past] == [2020] * 3
+        assert past.items[0].datetime > past.items[-1].datetime
+        assert [a.datetime.year for a in upcoming] == [2030] * 2
+
+def test_slot_and_review_pages(app):
+    """Availability and review listings page on their composite keys."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        for hour in range(9, 16):
+            AvailabilityRepository.create(doctor.doctor_id, date(2030, 1, 1), datetime(2030, 1, 1, hour).time(),
+                                          datetime(2030, 1, 1, hour, 30).time())
+        db.session.commit()
+
+        first = AvailabilityRepository.page_by_doctor(doctor.doctor_id, per_page=4)
+        second = AvailabilityRepository.page_by_doctor(doctor.doctor_id, cursor=first.next_cursor, per_page=4)
+        assert [s.start_time.hour for s in first] == [9, 10, 11, 12]
+        assert [s.start_time.hour for s in second] == [13, 14, 15]
+        assert second.next_cursor is None
+
+        assert len(ReviewRepository.page_by_doctor(doctor.doctor_id)) == 0
+
+def test_malformed_cursor_is_bad_request(app, client):
+    """Tampered cursors are rejected instead of raising a server error."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        with pytest.raises(ValueError):
+            AppointmentRepository.page_by_doctor(doctor.doctor_id, cursor='not-a-cursor')
+        response = client.get(f'/doctor/{doctor.doctor_id}?review_cursor=garbage')
+        assert response.status_code == 400
+
+# ============================================
+# STARTUP / CLI TESTS
+# ============================================
+
+def _file_app(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'medibook.db'}"
+    return create_app(FileConfig)
+
+def test_create_app_does_not_touch_schema(tmp_path):
+    """Creating an app must never drop or create tables."""
+    app = _file_app(tmp_path)
+    with app.app_context():
+        assert db.inspect(db.engine).get_table_names() == []
+        db.engine.dispose()
+
+def test_init_db_and_seed_are_idempotent(tmp_path):
+    """init-db upgrades to the latest revision and seed can be re-run safely."""
+    app = _file_app(tmp_path)
+    runner = app.test_cli_runner()
+    for _ in range(2):
+        assert runner.invoke(args=['init-db']).exit_code == 0
+        assert runner.invoke(args=['seed']).exit_code == 0
+    with app.app_context():
+        assert User.query.filter_by(role='admin').count() == 1
+        assert 'alembic_version' in db.inspect(db.engine).get_table_names()
+        db.session.remove()
+        db.engine.dispose()
+
+def test_init_db_adopts_create_all_database(tmp_path):
+    """A database built by create_all() without Alembic is stamped and upgraded."""
+    app = _file_app(tmp_path)
+    with app.app_context():
+        db.create_all()
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        db.engine.dispose()
+
+def test_migrations_leave_the_search_index_alone(tmp_path):
+    """Autogenerate ignores the FTS tables, so `flask db migrate` never drops the search index."""
+    app = _file_app(tmp_path)
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['init-db']).exit_code == 0
+    result = runner.invoke(args=['db', 'check'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        db.engine.dispose()
+
+# ============================================
+# FULL-TEXT SEARCH TESTS
+# ============================================
+
+def test_fulltext_search_prefix_and_ranking(app):
+    """Free-text search prefix-matches every field and ranks name hits first."""
+    with app.app_context():
+        _seed_doctors(3, specialization="Dermatologist")
+        doctor = Doctor.query.first()
+        doctor.user.name = "Dr. Samir Haddad"
+        other = Doctor.query.filter(Doctor.doctor_id != doctor.doctor_id).first()
+        other.bio = "Trained with Samir for years."
+        db.session.commit()
+
+        results = DoctorRepository.search(q="sam")
+        assert [d.doctor_id for d in results] == [doctor.doctor_id, other.doctor_id]
+        assert len(DoctorRepository.search(q="derma cairo")) == 3
+
+def test_fulltext_search_tolerates_typos(app):
+    """A misspelt specialization still finds the doctor."""
+    with app.app_context():
+        _seed_doctors(1, specialization="Cardiologist")
+        _seed_doctors(1, start=1, specialization="Dermatologist")
+        results = DoctorRepository.search(q="cardiolgist")
+        assert [d.specialization for d in results] == ["Cardiologist"]
+
+def test_search_index_follows_writes(app):
+    """Renaming a user, editing a clinic or deleting a doctor updates the index."""
+    with app.app_context():
+        _seed_doctors(2)
+        doctor = Doctor.query.first()
+        doctor.user.name = "Dr. Zeinab"
+        doctor.clinic.city = "Alexandria"
+        db.session.commit()
+        assert [d.doctor_id for d in DoctorRepository.search(q="zeinab alexandria")] == [doctor.doctor_id]
+
+        db.session.delete(doctor)
+        db.session.commit()
+        assert DoctorRepository.search(q="zeinab") == []
+
+        db.session.rollback()
+        second = Doctor.query.first()
+        second.specialization = "Neurologist"
+        db.session.flush()
+        db.session.rollback()
+        assert DoctorRepository.search(specialization="Neurologist") == []
+
+def test_broad_fulltext_search_stays_ranked(app, query_counter):
+    """A query every doctor matches is still ordered by bm25, without a count query first."""
+    with app.app_context():
+        _seed_doctors(600)
+        best = Doctor.query.order_by(Doctor.doctor_id.desc()).first()
+        best.user.name = "Dr. Cairo"
+        db.session.commit()
+        del query_counter[:]
+
+        results = DoctorRepository.search(q="cairo", limit=5)
+        assert results[0].doctor_id == best.doctor_id
+        assert not [s for s in query_counter if 'count(' in s.lower()]
+
+def test_search_index_found_once_created(app):
+    """A missing FTS table is re-checked, so one created later is picked up."""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE {search_index.VOCAB_TABLE}"))
+            connection.execute(text(f"DROP TABLE {search_index.FTS_TABLE}"))
+            search_index._available.pop(db.engine, None)
+            assert not search_index.is_available(connection)
+            assert not search_index.is_available(connection)
+
+            for statement in search_index._CREATE_SQL:
+                connection.execute(text(statement))
+            assert search_index.is_available(connection)
+
+def test_search_without_fts_matches_every_field(app):
+    """The ILIKE fallback (PostgreSQL, MySQL) finds free text in the name, bio, clinic and city."""
+    _seed_doctors(3)
+    first, second, third = Doctor.query.order_by(Doctor.doctor_id).all()
+    first.user.name = "Dr. Karim"
+    second.bio = "Studied with Karim"
+    third.clinic.city = "Karima"
+    db.session.commit()
+    search_index._available[db.engine] = False
+    try:
+        assert _ids(DoctorRepository.search(q="karim")) == [first.doctor_id, second.doctor_id, third.doctor_id]
+        assert _ids(DoctorRepository.search(q="cairo", name="karim")) == [first.doctor_id]
+        assert DoctorRepository.search(q="zzz") == []
+    finally:
+        search_index._available.pop(db.engine, None)
+
+# ============================================
+# FACET CACHE TESTS
+# ============================================
+
+def test_facets_are_cached_until_doctors_change(app, query_counter):
+    """Facet counts are served from memory and refreshed after a doctor is added."""
+    with app.app_context():
+        _seed_doctors(2, specialization="Cardiologist")
+        assert DoctorRepository.get_specialization_facets() == [("Cardiologist", 2)]
+        assert ClinicRepository.get_city_facets() == [("Cairo", 2)]
+
+        query_counter.clear()
+        DoctorRepository.get_specialization_facets()
+        ClinicRepository.get_cities()
+        assert query_counter == []
+
+        _seed_doctors(1, start=2, city="Giza", specialization="Dermatologist")
+        assert DoctorRepository.get_specialization_facets() == [("Cardiologist", 2), ("Dermatologist", 1)]
+        assert ClinicRepository.get_city_facets() == [("Cairo", 2), ("Giza", 1)]
+
+def test_home_page_shows_facet_counts(app, client):
+    """Filter dropdowns show how many doctors each option has."""
+    with app.app_context():
+        _seed_doctors(3, specialization="Cardiologist")
+        response = client.get('/')
+        assert b"Cardiologist (3)" in response.data
+
+# ============================================
+# CONCURRENT BOOKING TESTS
+# ============================================
+
+def _flashes(client):
+    with client.session_transaction() as sess:
+        return [message for _, message in sess.get('_flashes', [])]
+
+def test_concurrent_bookings_of_one_slot(tmp_path):
+    """N patients booking the same slot at once: exactly one wins, the rest see 'no longer available'."""
+    bookers = 8
+    app = _file_app(tmp_path)
+    with app.app_context():
+        db.create_all()
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _seed_appointments(doctor, bookers)
+        slot = AvailabilityRepository.create(doctor.doctor_id, date(2030, 6, 1), datetime(2030, 6, 1, 9).time(),
+                                             datetime(2030, 6, 1, 9, 30).time())
+        db.session.commit()
+        slot_id, doctor_id = slot.availability_id, doctor.doctor_id
+        clients = []
+        for patient in Patient.query.all():
+            client = app.test_client()
+            _login_as(client, patient.user, 'patient')
+            clients.append(client)
+        before = Appointment.query.count()
+
+    barrier = threading.Barrier(bookers)
+    errors = []
+
+    def book(client):
+        try:
+            barrier.wait()
+            client.post(f'/booking/book/{doctor_id}', data={'availability_id': slot_id})
+        except Exception as e:  # surfaced below so a crash fails the test
+            errors.append(e)
+
+    threads = [threading.Thread(target=book, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    messages = [m for c in clients for m in _flashes(c)]
+    assert messages.count('Appointment booked successfully!') == 1
+    assert messages.count('This time slot is no longer available.') == bookers - 1
+    with app.app_context():
+        assert Appointment.query.count() == before + 1
+        assert db.session.get(DoctorAvailability, slot_id).is_booked
+        db.session.remove()
+        db.engine.dispose()
+
+def test_booking_rejects_slot_of_another_doctor(app, client):
+    """A slot id from a different doctor cannot be booked through this doctor's form."""
+    with app.app_context():
+        _seed_doctors(2)
+        first, second = Doctor.query.order_by(Doctor.doctor_id).all()
+        _seed_appointments(first, 1)
+        patient = Patient.query.first()
+        slot = AvailabilityRepository.create(second.doctor_id, date(2030, 6, 1), datetime(2030, 6, 1, 9).time(),
+                                             datetime(2030, 6, 1, 9, 30).time())
+        db.session.commit()
+        _login_as(client, patient.user, 'patient')
+        client.post(f'/booking/book/{first.doctor_id}', data={'availability_id': slot.availability_id})
+        assert not db.session.get(DoctorAvailability, slot.availability_id).is_booked
+
+# ============================================
+# APPOINTMENT / SLOT LINK TESTS
+# ============================================
+
+def test_cancel_frees_the_booked_slot_by_id(app, client):
+    """Booking records the slot id; cancelling frees exactly that slot even if another starts at the same time."""
+    with app.app_context():
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _seed_appointments(doctor, 1)
+        patient = Patient.query.first()
+        start, end = datetime(2030, 6, 1, 9).time(), datetime(2030, 6, 1, 10).time()
+        overlapping = AvailabilityRepository.create(doctor.doctor_id, date(2030, 6, 1), start, end, is_booked=True)
+        slot = AvailabilityRepository.create(doctor.doctor_id, date(2030, 6, 1), start, datetime(2030, 6, 1, 9, 30).time())
+        db.session.commit()
+        _login_as(client, patient.user, 'patient')
+
+        client.post(f'/booking/book/{doctor.doctor_id}', data={'availability_id': slot.availability_id})
+        appointment = Appointment.query.filter_by(availability_id=slot.availability_id).one()
+        assert appointment.availability is slot
+
+        client.post(f'/booking/cancel/{appointment.appointment_id}')
+        db.session.expire_all()
+        assert not slot.is_booked
+        assert overlapping.is_booked
+        assert appointment.status == 'cancelled'
+
+        # Cancelling again must not free the slot once someone else has taken it
+        AvailabilityRepository.claim(slot.availability_id)
+        db.session.commit()
+        client.post(f'/booking/cancel/{appointment.appointment_id}')
+        db.session.expire_all()
+        assert slot.is_booked
+
+def test_migration_backfills_appointment_slots(tmp_path):
+    """Upgrading to 0004 links existing appointments to their slot by doctor, date and start time."""
+    from flask_migrate import upgrade
+    app = _file_app(tmp_path)
+    with app.app_context():
+        upgrade(revision='0003')
+        db.session.execute(db.text(
+            "INSERT INTO users (user_id, name, email, password_hash, role, verified, profile_picture) VALUES "
+            "(1, 'Dr. A', 'a@test.com', 'x', 'doctor', 1, 'default.png'), "
+            "(2, 'P', 'p@test.com', 'x', 'patient', 0, 'default.png')"))
+        db.session.execute(db.text("INSERT INTO clinics (clinic_id, name, address, city, country) "
+                                   "VALUES (1, 'C', 'A', 'Cairo', 'Egypt')"))
+        db.session.execute(db.text("INSERT INTO doctors (doctor_id, user_id, clinic_id, specialization, price) "
+                                   "VALUES (1, 1, 1, 'Cardio', 100)"))
+        db.session.execute(db.text("INSERT INTO patients (patient_id, user_id, dob, phone) "
+                                   "VALUES (1, 2, '1990-01-01', '1')"))
+        db.session.add_all([
+            DoctorAvailability(availability_id=7, doctor_id=1, date=date(2030, 6, 1),
+                               start_time=datetime(2030, 6, 1, 9).time(), end_time=datetime(2030, 6, 1, 10).time()),
+        ])
+        db.session.execute(db.text(
+            "INSERT INTO appointments (appointment_id, patient_id, doctor_id, datetime, status, payment_method, created_at) "
+            "VALUES (1, 1, 1, '2030-06-01 09:00:00.000000', 'confirmed', 'at_clinic', '2030-01-01 00:00:00'), "
+            "(2, 1, 1, '2030-06-02 09:00:00.000000', 'confirmed', 'at_clinic', '2030-01-01 00:00:00')"))
+        db.session.commit()
+
+        upgrade()
+        linked = dict(db.session.execute(db.text("SELECT appointment_id, availability_id FROM appointments")).all())
+        assert linked == {1: 7, 2: None}
+        db.session.remove()
+        db.engine.dispose()
+
+# ============================================
+# RECURRING AVAILABILITY TESTS
+# ============================================
+
+def test_schedule_expansion_respects_weekdays_and_breaks():
+    t = lambda h, m=0: datetime(2030, 1, 1, h, m).time()
+    # 2030-01-07 is a Monday; Mondays and Wednesdays for one week, lunch 11:30-13:00
+    slots = scheduling.expand(date(2030, 1, 7), date(2030, 1, 13), [0, 2], t(9), t(14), 45,
+                              breaks=scheduling.parse_breaks('11:30-13:00'))
+    assert {s[0] for s in slots} == {date(2030, 1, 7), date(2030, 1, 9)}
+    assert [(s[1], s[2]) for s in slots if s[0] == date(2030, 1, 7)] == [
+        (t(9), t(9, 45)), (t(9, 45), t(10, 30)), (t(10, 30), t(11, 15)), (t(13), t(13, 45))]
+    with pytest.raises(ValueError):
+        scheduling.parse_breaks('12:00')
+    with pytest.raises(ValueError, match='slots'):
+        scheduling.expand(date(2030, 1, 1), date(2030, 12, 31), range(7), t(0), t(23), 5)
+
+def test_schedule_expansion_rejects_empty_days_and_long_ranges():
+    """A day with no slot, or a range past MAX_DAYS, fails before any date is walked."""
+    t = lambda h, m=0: datetime(2030, 1, 1, h, m).time()
+    started = time.perf_counter()
+    with pytest.raises(ValueError, match='No slot fits'):
+        scheduling.expand(date(2030, 1, 1), date(2030, 12, 31), range(7), t(9), t(10), 90)
+    with pytest.raises(ValueError, match='No slot fits'):
+        scheduling.expand(date(2030, 1, 1), date(2030, 1, 2), range(7), t(9), t(10), 30,
+                          breaks=scheduling.parse_breaks('09:00-10:00'))
+    with pytest.raises(ValueError, match=f'at most {scheduling.MAX_DAYS} days'):
+        scheduling.expand(date(2030, 1, 1), date(9999, 12, 31), range(7), t(9), t(10), 90)
+    assert time.perf_counter() - started < 0.1
+    assert len(scheduling.expand(date(2030, 1, 1), date(2030, 12, 31), [0], t(9), t(10), 30)) == 2 * 52
+
+def test_recurring_availability_caps_the_date_range(app, client):
+    _seed_doctors(1)
+    _login_as(client, Doctor.query.first().user, 'doctor')
+    client.post('/booking/add_recurring_availability', data={
+        'start_date': '2030-01-07', 'end_date': '9999-12-31', 'weekdays': ['0'],
+        'start_time': '09:00', 'end_time': '10:00', 'slot_minutes': '30',
+    })
+    with client.session_transaction() as sess:
+        assert f'at most {scheduling.MAX_DAYS} days' in sess['_flashes'][-1][1]
+    assert DoctorAvailability.query.count() == 0
+
+def test_recurring_availability_skips_conflicts_in_one_insert(app, client, query_counter):
+    """Generated slots are written with a single executemany; overlaps with existing slots are skipped."""
+    _seed_doctors(1)
+    doctor = Doctor.query.first()
+    AvailabilityRepository.create(doctor.doctor_id, date(2030, 1, 7), datetime(2030, 1, 7, 9, 15).time(),
+                                  datetime(2030, 1, 7, 9, 45).time())
+    db.session.commit()
+    _login_as(client, doctor.user, 'doctor')
+    query_counter.clear()
+    client.post('/booking/add_recurring_availability', data={
+        'start_date': '2030-01-07', 'end_date': '2030-01-20', 'weekdays': ['0', '1', '2', '3', '4'],
+        'start_time': '09:00', 'end_time': '12:00', 'slot_minutes': '30', 'breaks': '10:30-11:00',
+    })
+    inserts = [s for s in query_counter if s.lstrip().upper().startswith('INSERT INTO DOCTOR_AVAILABILITY')]
+    assert len(inserts) == 1
+    # 10 weekdays x 5 slots, minus the two overlapping the 09:15 slot
+    assert DoctorAvailability.query.filter_by(doctor_id=doctor.doctor_id).count() == 1 + 50 - 2
+    with client.session_transaction() as sess:
+        assert 'Added 48 availability slots. Skipped 2' in sess['_flashes'][-1][1]
+
+def test_schedule_form_lists_every_weekday(app, client):
+    """The doctor dashboard's schedule form offers one checkbox per scheduling.WEEKDAY_NAMES entry."""
+    _seed_doctors(1)
+    doctor = Doctor.query.first()
+    _login_as(client, doctor.user, 'doctor')
+    html = client.get('/booking/dashboard').data.decode()
+    for index, name in enumerate(scheduling.WEEKDAY_NAMES):
+        assert f'for="weekday{index}">{name}</label>' in html
+
+# ============================================
+# STREAMING CHAT TESTS
+# ============================================
+
+@pytest.fixture
+def llm_stub(app):
+    """
+    Local OpenAI-compatible endpoint standing in for Groq. Tokens in
+    `stub.tokens` are streamed one SSE frame each (or returned as one
+    completion); `stub.status` and `stub.delay` simulate outages and latency.
+    """
+    import json
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from llm_client import LLMClient, CircuitBreaker
+    import chat_backends
+
+    class Stub:
+        tokens = ['Rest ', 'and ', 'drink ', 'water.']
+        status = 200
+        delay = 0.0
+        requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            Stub.requests.append((body, self.client_address[1]))
+            time.sleep(Stub.delay)
+            if Stub.status != 200:
+                payload = b'{"error": "unavailable"}'
+                self.send_response(Stub.status)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            if body.get('stream'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for token in Stub.tokens:
+                    chunk = {'choices': [{'delta': {'content': token}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+                return
+            payload = json.dumps({'choices': [{'message': {'content': ''.join(Stub.tokens)}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Stub.url = f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+    Stub.requests = []
+    Stub.client = LLMClient(Stub.url, 'test-key', 'test-model', max_concurrency=2, acquire_timeout=0.2,
+                            read_timeout=1, breaker=CircuitBreaker(failures=3, cooldown=60))
+    app.extensions['llm_client'] = Stub.client
+    chat_backends.init_app(app)
+    yield Stub
+    Stub.client.close()
+    server.shutdown()
+    server.server_close()
+
+def _sse_frames(body):
+    import json
+    frames = []
+    for raw in body.decode().split('\n\n'):
+        if not raw.strip():
+            continue
+        event, data = 'message', ''
+        for line in raw.split('\n'):
+            if line.startswith('event:'):
+                event = line[6:].strip()
+            elif line.startswith('data:'):
+                data += line[5:].strip()
+        frames.append((event, json.loads(data)))
+    return frames
+
+def test_chat_stream_relays_upstream_tokens(client, llm_stub):
+    """Each upstream delta becomes one SSE frame, followed by a done event."""
+    from metrics import registry
+    registry.reset()
+    response = client.post('/chat/stream', json={'message': 'I feel dizzy'})
+    assert response.mimetype == 'text/event-stream'
+    frames = _sse_frames(response.get_data())
+    assert [data['token'] for event, data in frames if event == 'message'] == llm_stub.tokens
+    assert frames[-1][0] == 'done'
+    assert llm_stub.requests[0][0]['stream'] is True
+    snapshot = registry.snapshot()
+    assert snapshot['gauges']['chat.stream.active'] == 0
+    assert snapshot['timings']['chat.stream.ttft_ms']['count'] == 1
+
+def test_chat_stream_falls_back_when_upstream_fails(client, llm_stub):
+    llm_stub.status = 503
+    frames = _sse_frames(client.post('/chat/stream', json={'message': 'back pain'}).get_data())
+    assert frames[0][0] == 'message' and 'Orthopedist' in frames[0][1]['token']
+    assert frames[-1][0] == 'done'
+
+def test_chat_metrics_are_admin_only(app, client):
+    assert client.get('/chat/metrics').status_code == 403
+    with client.session_transaction() as sess:
+        sess['user_id'], sess['role'] = 1, 'admin'
+    assert 'gauges' in client.get('/chat/metrics').get_json()
+
+# ============================================
+# LLM CLIENT TESTS
+# ============================================
+
+def test_llm_client_reuses_connections(llm_stub):
+    """Sequential calls share one kept-alive connection (one client port at the server)."""
+    for _ in range(3):
+        assert llm_stub.client.complete([{'role': 'user', 'content': 'hi'}]) == 'Rest and drink water.'
+    assert len({port for _, port in llm_stub.requests}) == 1
+    assert llm_stub.requests[0][0]['model'] == 'test-model'
+
+def test_llm_client_circuit_breaker_fails_fast(llm_stub):
+    """After `failures` upstream errors calls short-circuit without touching the network."""
+    from llm_client import LLMError, CircuitOpen
+    llm_stub.status = 503
+    for _ in range(3):
+        with pytest.raises(LLMError):
+            llm_stub.client.complete([])
+    with pytest.raises(CircuitOpen):
+        llm_stub.client.complete([])
+    assert len(llm_stub.requests) == 3
+    assert llm_stub.client.breaker.state == 'open'
+
+def test_circuit_breaker_half_open_trial():
+    from llm_client import CircuitBreaker
+    now = [0.0]
+    breaker = CircuitBreaker(failures=1, cooldown=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 11
+    assert breaker.allow() and not breaker.allow()  # a single trial call
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    now[0] = 22
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+def test_abandoned_stream_does_not_close_the_breaker(llm_stub):
+    """A half-open trial stream the client walks away from frees its slot but proves nothing."""
+    now = [0.0]
+    breaker = llm_stub.client.breaker
+    breaker._clock = lambda: now[0]
+    for _ in range(3):
+        breaker.record_failure()
+    now[0] = 61
+    assert breaker.state == 'half_open'
+    chunks = llm_stub.client.stream([])
+    assert next(chunks) == 'Rest '
+    chunks.close()
+    assert breaker.state == 'half_open'
+    assert breaker.allow()  # the trial slot was given back
+    breaker.cancel_trial()
+    # Both concurrency slots are free again
+    slots = llm_stub.client._slots
+    assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
+    slots.release()
+    slots.release()
+
+def test_llm_client_read_timeout_and_concurrency_limit(llm_stub):
+    """Slow upstreams hit the read timeout; callers beyond max_concurrency are turned away."""
+    from llm_client import LLMError, UpstreamBusy
+    llm_stub.delay = 1.5
+    with pytest.raises(LLMError):
+        llm_stub.client.complete([])
+
+    llm_stub.delay = 0.5
+    errors = []
+
+    def call():
+        try:
+            llm_stub.client.complete([])
+        except LLMError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [type(e) for e in errors] == [UpstreamBusy]
+
+def test_llm_client_async_and_chat_route(client, llm_stub):
+    import asyncio
+    assert asyncio.run(llm_stub.client.acomplete([])) == 'Rest and drink water.'
+    response = client.post('/chat/message', json={'message': 'I feel dizzy'})
+    assert response.get_json()['response'] == 'Rest and drink water.'
+
+# ============================================
+# CHAT RESPONSE CACHE TESTS
+# ============================================
+
+def test_response_cache_exact_similar_ttl_and_lru():
+    from response_cache import ResponseCache, namespace
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl=10, similarity=0.6, clock=lambda: now[0])
+    scope = namespace('model-a', 'prompt', {'temperature': 0.7})
+    cache.put(scope, 'Back pain?', 'stretch')
+    assert cache.get(scope, '  back   PAIN ') == 'stretch'
+    assert cache.get(scope, 'back pains') == 'stretch'
+    assert cache.get(scope, 'chest pain') is None
+    # A different model or system prompt never shares answers
+    assert cache.get(namespace('model-b', 'prompt', {'temperature': 0.7}), 'back pain') is None
+    assert cache.get(namespace('model-a', 'other prompt', {'temperature': 0.7}), 'back pain') is None
+
+    cache.put(scope, 'headache', 'rest')
+    cache.get(scope, 'back pain')           # back pain is now the most recently used
+    cache.put(scope, 'fever', 'fluids')     # evicts headache
+    assert cache.get(scope, 'headache') is None and len(cache) == 2
+    now[0] = 11
+    assert cache.get(scope, 'fever') is None
+
+def test_chat_answers_are_cached(client, llm_stub):
+    from metrics import registry
+    registry.reset()
+    first = client.post('/chat/message', json={'message': 'I have a headache'}).get_json()
+    second = client.post('/chat/message', json={'message': 'i have a HEADACHE!'}).get_json()
+    streamed = _sse_frames(client.post('/chat/stream', json={'message': 'I have a headache.'}).get_data())
+    assert first == second
+    assert streamed[0][1]['token'] == first['response']
+    assert len(llm_stub.requests) == 1
+    assert registry.counter('chat.cache.hits') == 2
+
+# ============================================
+# LOCAL CHAT BACKEND TESTS
+# ============================================
+
+def test_local_backend_recommends_registered_specializations(app, client):
+    """Symptoms map to specializations; only ones with registered doctors get a search link."""
+    _seed_doctors(1, specialization='Orthopedist')
+    data = client.post('/chat/message', json={'message': 'My lower back hurts, bad back pain'}).get_json()
+    assert 'Orthopedist' in data['response']
+    assert data['links'] == [{'label': 'Find an Orthopedist', 'url': '/?specialization=Orthopedist'}]
+
+    data = client.post('/chat/message', json={'message': 'crushing chest pain and palpitations'}).get_json()
+    assert 'Cardiologist' in data['response']
+    assert data['links'][0]['url'] == '/'
+
+def test_local_backend_greetings_use_whole_words(app, client):
+    """'this' and 'chills' used to be answered as greetings because they contain 'hi'."""
+    greeting = client.post('/chat/message', json={'message': 'Hi there'}).get_json()['response']
+    assert greeting.startswith('Hello!')
+    for message in ('is this serious?', 'I have chills'):
+        assert not client.post('/chat/message', json={'message': message}).get_json()['response'].startswith('Hello!')
+
+def test_local_backend_is_fast(app):
+    import time
+    from chat_backends import get_backends
+    app.config['CHAT_BACKEND'] = 'local'
+    with app.test_request_context():
+        backend, = get_backends()
+        backend.reply('warm up')
+        started = time.perf_counter()
+        for _ in range(100):
+            backend.reply('sore throat and a blocked nose with fever')
+        assert (time.perf_counter() - started) / 100 < 0.005
+
+# ============================================
+# CHAT THROTTLING TESTS
+# ============================================
+
+def test_token_bucket_refills_over_time():
+    from rate_limit import MemoryStore, Limit
+    now = [0.0]
+    store = MemoryStore(clock=lambda: now[0])
+    limit = Limit(rate=1.0, burst=2)
+    assert store.take('k', limit)[0] and store.take('k', limit)[0]
+    allowed, retry_after = store.take('k', limit)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    now[0] = 1.0
+    assert store.take('k', limit)[0]
+
+def test_chat_is_throttled_per_session_and_per_ip(app):
+    """A session gets its burst, then 429s; other sessions from the same IP share the IP bucket."""
+    app.config.update(CHAT_SESSION_BURST=2, CHAT_IP_BURST=3)
+    first, second = app.test_client(), app.test_client()
+    statuses = [first.post('/chat/message', json={'message': 'hi'}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert second.post('/chat/message', json={'message': 'hi'}).status_code == 200
+    limited = second.post('/chat/stream', json={'message': 'hi'})
+    assert limited.status_code == 429 and int(limited.headers['Retry-After']) >= 1
+
+    from metrics import registry
+    assert registry.counter('chat.rate_limited.ip') >= 1
+
+def test_rejected_request_spends_no_tokens():
+    """When one bucket is empty the others keep their tokens."""
+    from rate_limit import MemoryStore, Limit, RateLimiter
+    store = MemoryStore(clock=lambda: 0.0)
+    limiter = RateLimiter(store)
+    buckets = [('session', 's', Limit(rate=1.0, burst=1)), ('ip', 'a', Limit(rate=1.0, burst=3))]
+    assert limiter.check(buckets) == (None, 0)
+    assert limiter.check(buckets) == ('session', 1)
+    assert limiter.check(buckets) == ('session', 1)
+    assert store.take('ip:a', buckets[1][2])[0] and store.take('ip:a', buckets[1][2])[0]
+    assert not store.take('ip:a', buckets[1][2])[0]
+
+def test_cookieless_chat_clients_share_a_new_session_bucket(app):
+    """Dropping the session cookie does not buy a fresh session bucket on every request."""
+    app.config.update(CHAT_SESSION_BURST=2, CHAT_IP_BURST=100)
+    statuses = [app.test_client().post('/chat/message', json={'message': 'hi'}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    from metrics import registry
+    assert registry.counter('chat.rate_limited.new_session') >= 1
+
+def test_chat_ip_limit_uses_forwarded_client_address():
+    """With PROXY_FIX_HOPS the per-IP bucket is keyed on X-Forwarded-For, not the proxy's address."""
+    class ProxiedConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        PROXY_FIX_HOPS = 1
+        CHAT_IP_BURST = 1
+
+    app = create_app(ProxiedConfig)
+
+    def ask(client_ip):
+        return app.test_client().post('/chat/message', json={'message': 'hi'},
+                                      headers={'X-Forwarded-For': client_ip}).status_code
+
+    assert [ask('203.0.113.7'), ask('198.51.100.4'), ask('203.0.113.7')] == [200, 200, 429]
+
+def test_llm_queue_overflow_returns_503(client, llm_stub):
+    """With every upstream slot busy and no queue room, callers get a 503 instead of waiting."""
+    from llm_client import LLMClient
+    import chat_backends
+    llm_stub.delay = 0.5
+    client.application.extensions['llm_client'] = LLMClient(llm_stub.url, 'test-key', 'test-model',
+                                                            max_concurrency=1, max_waiting=0)
+    chat_backends.init_app(client.application)
+    results = []
+
+    def ask(message):
+        results.append(client.application.test_client().post('/chat/stream', json={'message': message}).status_code)
+
+    busy = threading.Thread(target=ask, args=('first question',))
+    busy.start()
+    time.sleep(0.2)
+    response = client.post('/chat/message', json={'message': 'second question'})
+    busy.join()
+    assert response.status_code == 503 and response.headers['Retry-After']
+    assert results == [200]
+
+# ============================================
+# RATING AGGREGATE TESTS
+# ============================================
+
+def _review(doctor, rating, i):
+    appointment = Appointment.query.filter_by(doctor_id=doctor.doctor_id).order_by(Appointment.appointment_id).all()[i]
+    return ReviewRepository.create(appointment.patient_id, doctor.doctor_id, appointment.appointment_id, rating, 'ok')
+
+def test_review_updates_rating_aggregates(app, client):
+    _seed_doctors(1)
+    doctor = Doctor.query.first()
+    _seed_appointments(doctor, 3)
+    for i, rating in enumerate((5, 4, 2)):
+        _review(doctor, rating, i)
+    db.session.commit()
+    db.session.refresh(doctor)
+    assert (doctor.rating_count, doctor.rating_sum) == (3, 11)
+    assert doctor.average_rating == pytest.approx(11 / 3)
+    assert '3.7 (3)' in client.get('/').get_data(as_text=True)
+
+def test_recompute_ratings_repairs_drift(app):
+    _seed_doctors(2)
+    first, second = Doctor.query.order_by(Doctor.doctor_id).all()
+    _seed_appointments(first, 1)
+    _review(first, 4, 0)
+    second.rating_count, second.rating_sum = 7, 30  # no reviews behind these
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['recompute-ratings'])
+    assert '1 doctor(s) corrected' in result.output
+    db.session.expire_all()
+    assert (first.rating_count, first.rating_sum) == (1, 4)
+    assert (second.rating_count, second.rating_sum) == (0, 0)
+
+def test_submit_review_rejects_out_of_range_rating(app, client):
+    _seed_doctors(1)
+    doctor = Doctor.query.first()
+    _seed_appointments(doctor, 1)
+    appointment = Appointment.query.first()
+    _login_as(client, appointment.patient.user, 'patient')
+    client.post(f'/booking/submit_review/{appointment.appointment_id}', data={'rating': '50'})
+    assert Review.query.count() == 0
+    client.post(f'/booking/submit_review/{appointment.appointment_id}', data={'rating': '5'})
+    db.session.expire_all()
+    assert doctor.rating_count == 1
+
+# ============================================
+# SEARCH SORTING & PAGINATION TESTS
+# ============================================
+
+def _ids(doctors):
+    return [d.doctor_id for d in doctors]
+
+def _free_slot(doctor_id, day, hour, booked=False):
+    db.session.add(DoctorAvailability(doctor_id=doctor_id, date=day, start_time=time_of_day(hour, 0),
+                                      end_time=time_of_day(hour, 30), is_booked=booked))
+
+def test_search_sorts_by_price_and_rating(app):
+    _seed_doctors(3)  # prices 100, 101, 102
+    first, second, third = Doctor.query.order_by(Doctor.doctor_id).all()
+    second.rating_count, second.rating_sum = 2, 10
+    third.rating_count, third.rating_sum = 4, 12
+    db.session.commit()
+    assert _ids(DoctorRepository.search(sort='price_desc')) == [third.doctor_id, second.doctor_id, first.doctor_id]
+    assert _ids(DoctorRepository.search(sort='price', min_price=101)) == [second.doctor_id, third.doctor_id]
+    assert _ids(DoctorRepository.search(max_price=100.5)) == [first.doctor_id]
+    # Unrated doctors go last
+    assert _ids(DoctorRepository.search(sort='rating')) == [second.doctor_id, third.doctor_id, first.doctor_id]
+    assert _ids(DoctorRepository.search(q='cardio', sort='price_desc')) == [third.doctor_id, second.doctor_id, first.doctor_id]
+    with pytest.raises(ValueError):
+        DoctorRepository.search(sort='nope')
+
+def test_search_by_next_free_slot(app):
+    _seed_doctors(4)
+    first, second, third, fourth = _ids(Doctor.query.order_by(Doctor.doctor_id))
+    today = date.today()
+    _free_slot(first, today + timedelta(days=10), 9)
+    _free_slot(second, today + timedelta(days=2), 15)
+    _free_slot(second, today + timedelta(days=2), 11)
+    _free_slot(third, today + timedelta(days=1), 9, booked=True)
+    _free_slot(third, today - timedelta(days=1), 9)
+    _free_slot(fourth, today + timedelta(days=2), 10)
+    db.session.commit()
+    assert _ids(DoctorRepository.search(sort='next_available')) == [fourth, second, first, third]
+    assert _ids(DoctorRepository.search(available_by=today + timedelta(days=6))) == [second, fourth]
+    assert AvailabilityRepository.get_next_free_slots([second, third], today) == {
+        second: datetime.combine(today + timedelta(days=2), time_of_day(11, 0))}
+
+def test_home_page_is_paginated(app, client):
+    _seed_doctors(25)
+    page_one = client.get('/?sort=price_desc').get_data(as_text=True)
+    assert 'Dr. 24' in page_one and 'Dr. 4<' not in page_one
+    assert 'sort=price_desc' in page_one and 'page=2' in page_one
+    page_two = client.get('/?sort=price_desc&page=2').get_data(as_text=True)
+    assert 'Dr. 4<' in page_two and 'Dr. 0<' in page_two and 'Dr. 24' not in page_two
+    assert DoctorRepository.search_page(page=2).has_prev
+    assert not DoctorRepository.search_page(page=2).has_next
+    assert client.get('/?sort=bogus').status_code == 400
+
+# ============================================
+# PAGE CACHE TESTS
+# ============================================
+
+def test_public_pages_served_from_cache(app, client, query_counter):
+    _seed_doctors(2)
+    doctor = Doctor.query.first()
+    url = f'/doctor/{doctor.doctor_id}'
+    first = client.get(url)
+    assert first.headers['X-Page-Cache'] == 'MISS'
+    query_counter.clear()
+    second = client.get(url)
+    assert second.headers['X-Page-Cache'] == 'HIT'
+    assert second.data == first.data and query_counter == []
+    # Same arguments in another order hit the same entry
+    client.get('/?sort=price&location=Cairo')
+    assert client.get('/?location=Cairo&sort=price').headers['X-Page-Cache'] == 'HIT'
+
+    doctor.bio = "Updated bio"
+    db.session.commit()
+    third = client.get(url)
+    assert third.headers['X-Page-Cache'] == 'MISS' and b"Updated bio" in third.data
+
+def test_page_cache_conditional_requests(app, client):
+    _seed_doctors(1)
+    response = client.get('/')
+    etag, modified = response.headers['ETag'], response.headers['Last-Modified']
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/', headers={'If-Modified-Since': modified}).status_code == 304
+    _seed_doctors(1, start=1)
+    fresh = client.get('/', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and b"Dr. 1" in fresh.data
+
+def test_page_cache_skips_signed_in_users_and_flashes(app, client):
+    _seed_doctors(1)
+    client.get('/')
+    with client.session_transaction() as sess:
+        sess['_flashes'] = [('info', 'Welcome back')]
+    response = client.get('/')
+    assert 'X-Page-Cache' not in response.headers and b"Welcome back" in response.data
+    _login_as(client, User.query.first(), 'doctor')
+    assert 'X-Page-Cache' not in client.get('/').headers
+
+def test_page_cache_memory_store_is_bounded():
+    from page_cache import MemoryStore, Entry
+    now = [0.0]
+    store = MemoryStore(max_entries=2, clock=lambda: now[0])
+    entry = Entry('<p>', 'text/html', 'e', datetime(2030, 1, 1))
+    store.set('a', entry, ttl=10)
+    store.set('b', entry, ttl=10)
+    store.get('a')
+    store.set('c', entry, ttl=10)
+    assert store.get('b') is None and store.get('a') == entry
+    now[0] = 11
+    assert store.get('a') is None
+
+def test_page_cache_needs_a_shared_store_with_several_workers(app, caplog):
+    """Per-worker memory stores would serve pages other workers' writes changed, so the cache turns off."""
+    import page_cache
+    page_cache.require_shared_store(app, workers=1)
+    assert page_cache.get_page_cache().enabled
+    page_cache.require_shared_store(app, workers=4)
+    assert not page_cache.get_page_cache().enabled
+    assert 'PAGE_CACHE_STORAGE_URL' in caplog.text
+
+def test_failing_version_listener_does_not_fail_the_commit(app, caplog):
+    """A listener error (e.g. Redis unreachable) is logged; the commit and the local bump stand."""
+    from cache import model_versions
+
+    def unreachable(model_names):
+        raise ConnectionError("redis is down")
+
+    before, = model_versions.get(Doctor)
+    model_versions.subscribe(unreachable)
+    try:
+        _seed_doctors(1)
+    finally:
+        model_versions._listeners.remove(unreachable)
+    assert Doctor.query.count() == 1 and model_versions.get(Doctor) == (before + 1,)
+    assert 'Model version listener failed' in caplog.text
+
+# ============================================
+# REQUEST INSTRUMENTATION TESTS
+# ============================================
+
+def test_server_timing_reports_statements(app, client, query_counter):
+    _seed_doctors(1)
+    doctor = Doctor.query.first()
+    query_counter.clear()
+    response = client.get(f'/doctor/{doctor.doctor_id}')
+    timing = response.headers['Server-Timing']
+    assert f'desc="{len(query_counter)} queries"' in timing and timing.startswith('app;dur=')
+    # A page cache hit runs no SQL at all
+    assert 'desc="0 queries"' in client.get(f'/doctor/{doctor.doctor_id}').headers['Server-Timing']
+
+def test_query_stats_keep_slow_statements():
+    from database_singleton import QueryStats
+    stats = QueryStats()
+    stats.record("SELECT 1", 5.0, slow_ms=100)
+    stats.record("SELECT 2", 250.0, slow_ms=100)
+    assert (stats.count, stats.duration_ms, stats.slow) == (2, 255.0, [(250.0, "SELECT 2")])
+
+def test_debug_endpoint_is_admin_only(app, client):
+    assert client.get('/admin/debug').status_code == 403
+    _seed_doctors(1)
+    client.get('/')
+    _login_as(client, User.query.first(), 'admin')
+    data = client.get('/admin/debug').get_json()
+    assert data['endpoints']['doctor.search']['requests'] >= 1
+    assert any(r['endpoint'] == 'doctor.search' and 'queries' in r for r in data['recent_requests'])
+
+def test_profiler_samples_one_endpoint(app, client):
+    _seed_doctors(1)
+    _login_as(client, User.query.first(), 'admin')
+    assert client.post('/admin/debug/profile', data={'sample_rate': '2'}).status_code == 400
+    assert client.post('/admin/debug/profile', data={'endpoint': 'doctor.search'}).get_json()['endpoint'] == 'doctor.search'
+    client.get('/')
+    client.get('/booking/dashboard')
+    profiles = client.get('/admin/debug').get_json()['profiler']['profiles']
+    assert [p['endpoint'] for p in profiles] == ['doctor.search']
+    assert 'cumulative' in profiles[0]['top']
+    client.post('/admin/debug/profile', data={'endpoint': ''})
+    client.get('/')
+    assert len(client.get('/admin/debug').get_json()['profiler']['profiles']) == 1
+
+# ============================================
+# SERVING TESTS
+# ============================================
+
+def test_healthz_does_not_touch_the_database(app, client, query_counter):
+    response = client.get('/healthz')
+    assert response.status_code == 200 and response.get_json() == {'status': 'ok'}
+    assert query_counter == []
+
+# ============================================
+# CONNECTION TUNING TESTS
+# ============================================
+
+def test_sqlite_file_connections_get_pragmas_and_a_pool(tmp_path):
+    app = _file_app(tmp_path)
+    with app.app_context():
+        assert db.engine.pool.size() == Config.SQLITE_POOL_SIZE
+        with db.engine.connect() as connection:
+            pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1  # NORMAL
+            assert pragma('busy_timeout') == 5000
+            assert pragma('cache_size') == -int(Config.SQLITE_CACHE_SIZE_KB)
+        db.engine.dispose()
+
+def test_engine_options_follow_the_database(app):
+    options = db_singleton.engine_options
+    assert options(app.config) == {}  # in-memory SQLite keeps its single connection
+    server = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://db/medibook', DB_POOL_SIZE=3)
+    assert options(server)['pool_size'] == 3 and options(server)['pool_pre_ping'] is True
+    sqlite_file = options(dict(app.config, SQLALCHEMY_DATABASE_URI='sqlite:////tmp/x.db'))
+    assert sqlite_file == {'pool_size': Config.SQLITE_POOL_SIZE, 'max_overflow': Config.SQLITE_MAX_OVERFLOW,
+                           'pool_timeout': Config.DB_POOL_TIMEOUT}
+
+def test_empty_sqlite_settings_keep_the_defaults(app):
+    config = dict(app.config, SQLITE_JOURNAL_MODE='', SQLITE_MMAP_SIZE=None)
+    assert [p for p, _ in db_singleton.sqlite_pragmas(config)] == ['synchronous', 'busy_timeout', 'cache_size']
+
+# ============================================
+# READ REPLICA TESTS
+# ============================================
+
+def _replica_app(tmp_path):
+    class ReplicaConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        PAGE_CACHE_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_REPLICA_URIS = [f"sqlite:///{tmp_path / 'replica.db'}"]
+    return create_app(ReplicaConfig)
+
+def _replicate(tmp_path):
+    """Copy the primary into the replica, standing in for replication."""
+    import sqlite3
+    source, target = sqlite3.connect(tmp_path / 'primary.db'), sqlite3.connect(tmp_path / 'replica.db')
+    source.backup(target)
+    source.close()
+    target.close()
+
+def test_session_routes_reads_to_the_replica_until_it_writes(tmp_path):
+    app = _replica_app(tmp_path)
+    with app.test_request_context():
+        replica = db_singleton.replica_engines()[0]
+        assert db.session.get_bind(clause=select(Doctor)) is replica
+        with db_singleton.primary():
+            assert db.session.get_bind(clause=select(Doctor)) is db.engine
+        assert db.session.get_bind(clause=update(Doctor)) is db.engine
+        assert db.session.get_bind(clause=select(Doctor)) is db.engine
+        db.session.remove()
+    with app.app_context():
+        # CLI commands and scripts always use the primary
+        assert db.session.get_bind(clause=select(Doctor)) is db.engine
+        for engine in db.engines.values():
+            engine.dispose()
+
+def test_booking_is_read_back_from_the_primary(tmp_path):
+    app = _replica_app(tmp_path)
+    with app.app_context():
+        db.create_all()
+        _seed_doctors(1)
+        doctor = Doctor.query.first()
+        _free_slot(doctor.doctor_id, date.today() + timedelta(days=1), 10)
+        user = User(name="Pat", email="pat@test.com", password_hash="pass", role="patient")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Patient(user_id=user.user_id, dob=date(1990, 1, 1), phone="0120"))
+        db.session.commit()
+        doctor_id, user_id, slot_id = doctor.doctor_id, user.user_id, DoctorAvailability.query.first().availability_id
+        _replicate(tmp_path)
+        doctor.user.name = "Dr. Renamed"  # on the primary only: the replica lags behind
+        db.session.commit()
+        db.session.remove()
+
+    client, other = app.test_client(), app.test_client()
+    for c in (client, other):
+        with c.session_transaction() as sess:
+            sess['user_id'], sess['role'], sess['name'] = user_id, 'patient', 'Pat'
+    assert b'Dr. 0' in client.get(f'/doctor/{doctor_id}').data
+    response = client.post(f'/booking/book/{doctor_id}', data={'availability_id': slot_id})
+    assert response.headers['Location'].endswith('/booking/dashboard')
+    # The booking browser reads its write back from the primary; another one still sees the replica
+    assert b'Dr. Renamed' in client.get('/booking/dashboard').data
+    assert b'Dr. Renamed' not in other.get('/booking/dashboard').data
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+def test_page_cache_misses_render_from_the_primary(tmp_path):
+    """A page re-rendered after a write is never built from a replica that has not caught up."""
+    app = _replica_app(tmp_path)
+    app.extensions['page_cache'].enabled = True
+    with app.app_context():
+        db.create_all()
+        _seed_doctors(1)
+        doctor_id = Doctor.query.first().doctor_id
+        _replicate(tmp_path)
+
+    assert b'Dr. 0' in app.test_client().get(f'/doctor/{doctor_id}').data
+    with app.app_context():
+        db.session.get(Doctor, doctor_id).user.name = "Dr. Renamed"  # bumps the versions; the replica lags
+        db.session.commit()
+        db.session.remove()
+    response = app.test_client().get(f'/doctor/{doctor_id}')
+    assert response.headers['X-Page-Cache'] == 'MISS' and b'Dr. Renamed' in response.data
+    assert b'Dr. Renamed' in app.test_client().get(f'/doctor/{doctor_id}').data
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+# ============================================
+# PROJECTION TESTS
+# ============================================
+
+def test_search_cards_match_search_without_tracking(app, query_counter):
+    _seed_doctors(3)
+    doctor = Doctor.query.order_by(Doctor.doctor_id).first()
+    doctor.rating_count, doctor.rating_sum = 2, 9
+    db.session.commit()
+    doctor_id = doctor.doctor_id
+    db.session.expunge_all()
+    query_counter.clear()
+    cards = DoctorRepository.search_cards(sort='price_desc', limit=2)
+    assert len(query_counter) == 1 and len(db.session.identity_map) == 0
+    assert _ids(cards) == _ids(DoctorRepository.search(sort='price_desc', limit=2))
+    assert not hasattr(cards[0], 'bio') and not hasattr(cards[0], '__dict__')
+    assert DoctorRepository.search_cards(sort='rating', limit=1)[0][:2] == (doctor_id, "Dr. 0")
+    assert DoctorRepository.search_cards(sort='rating', limit=1)[0].average_rating == 4.5
+    # The card's SQL average is Doctor.average_rating's, None without reviews
+    assert [c.average_rating for c in DoctorRepository.search_cards(sort='price')] == \
+        [d.average_rating for d in DoctorRepository.search(sort='price')] == [4.5, None, None]
+
+def test_appointment_row_pages_follow_the_cursor(app):
+    _seed_doctors(1)
+    doctor = Doctor.query.first()
+    _seed_appointments(doctor, 7)
+    rows, cursor = [], None
+    while True:
+        page = AppointmentRepository.page_rows_by_doctor(doctor.doctor_id, cursor=cursor, per_page=3)
+        rows.extend(page)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+    assert [r.patient_name for r in rows] == [f"Patient {i}" for i in range(7)]
+    assert rows[0].medical_history == "History 0"
+    patient_id = Patient.query.filter_by(phone="01200").one().patient_id
+    (row,) = AppointmentRepository.page_rows_by_patient(patient_id).items
+    assert (row.doctor_name, row.clinic_name, row.status) == ("Dr. 0", "Clinic 0", 'confirmed')
+
+def test_admin_dashboard_lists_unverified_doctor_rows(app, client):
+    _seed_doctors(1)
+    db.session.add(User(name="Admin", email="admin@test.com", password_hash="pass", role="admin"))
+    pending = Doctor.query.first()
+    pending.user.verified = False
+    db.session.commit()
+    assert [(r.name, r.email, r.clinic_name) for r in DoctorRepository.get_unverified_rows()] == \
+        [("Dr. 0", "doc0@test.com", "Clinic 0")]
+    _login_as(client, User.query.filter_by(role='admin').one(), 'admin')
+    assert b"doc0@test.com" in client.get('/admin/dashboard').data
+
+# ============================================
+# ADMIN STATISTICS TESTS
+# ============================================
+
+def _admin(client):
+    admin = User(name="Admin", email="admin@test.com", password_hash="pass", role="admin")
+    db.session.add(admin)
+    db.session.commit()
+    _login_as(client, admin, 'admin')
+
+def test_stat_totals_are_one_select(app, query_counter):
+    _seed_doctors(2)
+    doctor = Doctor.query.first()
+    _seed_appointments(doctor, 3)
+    Appointment.query.first().status = 'cancelled'
+    doctor.user.verified = False
+    db.session.commit()
+    query_counter.clear()
+    totals = StatsRepository.totals()
+    assert len(query_counter) == 1
+    assert totals == {'patients': 3, 'doctors': 2, 'unverified_doctors': 1, 'appointments': 3, 'cancelled': 1,
+                      'reviews': 0}
+
+def test_stats_window_breakdowns(app):
+    _seed_doctors(2, specialization="Cardio")
+    _seed_doctors(1, start=2, specialization="Derma")
+    first, second, third = Doctor.query.order_by(Doctor.doctor_id).all()
+    today = datetime.combine(date.today(), time_of_day(9, 0))
+    _seed_appointments(first, 2, base=today - timedelta(days=1))
+    _seed_appointments(third, 1, start=2, base=today)
+    _seed_appointments(second, 1, start=3, base=today - timedelta(days=60))  # outside the window
+    Appointment.query.filter_by(doctor_id=third.doctor_id).one().status = 'cancelled'
+    db.session.commit()
+
+    stats = stats_service.compute(window_days=30)
+    assert len(stats['per_day']) == 30 and stats['window']['appointments'] == 3
+    assert stats['per_day'][-1] == {'day': date.today().isoformat(), 'pending': 0, 'confirmed': 0, 'cancelled': 1}
+    assert stats['window']['cancellation_rate'] == round(1 / 3, 4) and stats['cancellation_rate'] == 0.25
+    assert stats['top_specializations'] == [["Cardio", 2]]
+    assert stats['busiest_clinics'] == [["Clinic 0", "Cairo", 2]]
+
+def test_admin_dashboard_reads_a_snapshot(app, client, query_counter):
+    _admin(client)
+    _seed_doctors(1)
+    client.get('/admin/dashboard')  # builds the first snapshot
+    _seed_appointments(Doctor.query.first(), 5)
+    query_counter.clear()
+    response = client.get('/admin/dashboard')
+    assert b'Total Appointments' in response.data
+    # Fresh snapshot: the page reads it instead of counting rows
+    assert not any('count(' in q.lower() for q in query_counter)
+    assert stats_service.current()['totals']['appointments'] == 0
+
+    client.post('/admin/stats/refresh')
+    assert stats_service.current()['totals']['appointments'] == 5
+    assert StatsSnapshot.query.count() == 2
+
+def test_stale_snapshot_is_served_not_recomputed(app, client, query_counter):
+    """An old snapshot is shown flagged as stale; only a missing one is computed on the request."""
+    first = stats_service.current()
+    assert StatsSnapshot.query.count() == 1 and not first['stale']
+    _seed_doctors(1)
+    query_counter.clear()
+    stale = stats_service.current(max_age=-1)
+    assert stale['stale'] and stale['totals']['doctors'] == 0 and stale['taken_at'] == first['taken_at']
+    assert len(query_counter) == 1 and StatsSnapshot.query.count() == 1
+
+    _admin(client)
+    app.config['STATS_MAX_AGE'] = -1
+    assert b'Out of date' in client.get('/admin/dashboard').data
+    assert StatsSnapshot.query.count() == 1
@@ -0,0 +1,12 @@
+"""
+WSGI Entry Point
+The application object production servers import:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Run `flask init-db` before starting; creating the app never touches the schema.
+"""
+
+from app import create_app
+
+app = create_app()